@@ -66,6 +66,7 @@ export default function OrdersPage() {
     Array<{ id: string; code: string; name: string }>
   >([]);
   const itemsPerPage = 10;
+  const [liveUpdates, setLiveUpdates] = useState(0);
 
   // Load available statuses on component mount
   useEffect(() => {
@@ -102,15 +103,59 @@ export default function OrdersPage() {
     loadOrders();
   }, [currentPage, debouncedSearchQuery, statusFilter]);
 
+  // Refresh the list when orders are created or change status, at most every 2 seconds
+  useEffect(() => {
+    const controller = new AbortController();
+    let refreshTimer: ReturnType<typeof setTimeout> | undefined;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const onEvent = () => {
+      if (refreshTimer === undefined) {
+        refreshTimer = setTimeout(() => {
+          refreshTimer = undefined;
+          setLiveUpdates((count) => count + 1);
+        }, 2000);
+      }
+    };
+    const subscribe = () => {
+      OrderService.subscribeToOrderEvents(onEvent, controller.signal)
+        .catch((err) => {
+          if (!controller.signal.aborted) {
+            console.error("Order event stream failed:", err);
+          }
+        })
+        .finally(() => {
+          if (!controller.signal.aborted) {
+            retryTimer = setTimeout(subscribe, 5000);
+          }
+        });
+    };
+    subscribe();
+
+    return () => {
+      controller.abort();
+      clearTimeout(refreshTimer);
+      clearTimeout(retryTimer);
+    };
+  }, []);
+
+  useEffect(() => {
+    if (liveUpdates > 0) {
+      loadOrders(false);
+    }
+  }, [liveUpdates]);
+
   // Reset to first page when search or filter changes
   useEffect(() => {
     if (currentPage !== 1) {
       setCurrentPage(1);
     }
   }, [debouncedSearchQuery, statusFilter]);
-  const loadOrders = async () => {
+  const loadOrders = async (showSpinner = true) => {
     try {
-      setLoading(true);
+      if (showSpinner) {
+        setLoading(true);
+      }
       setError(null);
 
       const skip = (currentPage - 1) * itemsPerPage;
@@ -230,7 +275,7 @@ export default function OrdersPage() {
           <Alert.Title>Ошибка!</Alert.Title>
           <Alert.Description>{error}</Alert.Description>
         </Alert.Root>
-        <Button mt={4} onClick={loadOrders}>
+        <Button mt={4} onClick={() => loadOrders()}>
           Повторить попытку
         </Button>
       </Box>
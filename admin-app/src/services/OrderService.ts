@@ -78,6 +78,14 @@ export interface OrderDetails {
   }
 }
 
+export interface OrderEvent {
+  id: number
+  type: 'order.created' | 'order.status_changed'
+  order_id: string
+  created_at: string
+  payload: Record<string, unknown>
+}
+
 export interface OrderStatusUpdateRequest {
   status_id: string
   actor_details?: string
@@ -195,4 +203,55 @@ export class OrderService {
       limit: params?.limit || 10
     }
   }
+
+  // EventSource cannot send the Authorization header, so the stream is read with fetch.
+  // Resolves when the server ends the stream, rejects on errors and when signal aborts.
+  static async subscribeToOrderEvents(
+    onEvent: (event: OrderEvent) => void,
+    signal: AbortSignal
+  ): Promise<void> {
+    const tokens = AuthService.getTokens()
+    if (!tokens) {
+      throw new Error('Not authenticated')
+    }
+
+    const response = await fetch(`${ADMIN_API_BASE_URL}/admin/orders/events`, {
+      headers: {
+        'Accept': 'text/event-stream',
+        'Authorization': `Bearer ${tokens.accessToken}`,
+      },
+      signal,
+    })
+    if (!response.ok || !response.body) {
+      if (response.status === 401) {
+        AuthService.clearTokens()
+      }
+      throw new Error(`Order event stream failed with status ${response.status}`)
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+    let buffer = ''
+    for (;;) {
+      const { value, done } = await reader.read()
+      if (done) {
+        return
+      }
+      buffer += value
+      let end = buffer.indexOf('\n\n')
+      while (end !== -1) {
+        // Only data lines carry events, comments keep the connection alive
+        const data = buffer
+          .slice(0, end)
+          .split('\n')
+          .filter((line) => line.startsWith('data:'))
+          .map((line) => line.slice(5).trimStart())
+          .join('\n')
+        if (data) {
+          onEvent(JSON.parse(data))
+        }
+        buffer = buffer.slice(end + 2)
+        end = buffer.indexOf('\n\n')
+      }
+    }
+  }
 }
\ No newline at end of file
@@ -1,6 +1,8 @@
 import httpx
 from typing import Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from ..core.config import settings
 from ..database import get_db
@@ -42,6 +44,49 @@ async def make_service_request(
             )
 
 
+async def stream_service_request(
+    service_url: str,
+    endpoint: str,
+    **kwargs
+) -> StreamingResponse:
+    """Relay a GET response of another microservice as it arrives, without buffering it."""
+    client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+    try:
+        response = await client.send(
+            client.build_request("GET", f"{service_url}{endpoint}", **kwargs),
+            stream=True
+        )
+    except httpx.RequestError as e:
+        await client.aclose()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Service unavailable: {str(e)}"
+        )
+    if response.is_error:
+        await response.aread()
+        await client.aclose()
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Service request failed: {response.text}"
+        )
+
+    async def close():
+        await response.aclose()
+        await client.aclose()
+
+    # Content-Type is copied as is, media_type would append a second charset to text/ types
+    headers = {
+        name: response.headers[name]
+        for name in ("content-type", "cache-control", "content-disposition")
+        if name in response.headers
+    }
+    return StreamingResponse(
+        response.aiter_raw(),
+        headers=headers,
+        background=BackgroundTask(close)
+    )
+
+
 # Product management endpoints
 @router.get("/products")
 async def get_products(
@@ -134,11 +179,17 @@ async def update_product(
     current_user: models.AdminUser = Depends(get_current_active_user)
 ):
     """Update product."""
+    # Forward If-Match so concurrent edits get 412 from the product service
+    headers = {}
+    if request.headers.get("if-match"):
+        headers["If-Match"] = request.headers["if-match"]
+    
     product = await make_service_request(
         "PUT",
         settings.product_service_url,
         f"/api/v1/products/{product_id}",
-        json=product_data
+        json=product_data,
+        headers=headers
     )
     
     await log_user_action(
@@ -154,6 +205,37 @@ async def update_product(
     return product
 
 
+@router.post("/products/bulk-update")
+async def bulk_update_products(
+    bulk_data: dict,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """Bulk update product prices and stock."""
+    result = await make_service_request(
+        "POST",
+        settings.product_service_url,
+        "/api/v1/products/bulk-update",
+        json=bulk_data
+    )
+    
+    await log_user_action(
+        action="products_bulk_updated",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Product",
+        details={
+            "filter": bulk_data.get("filter"),
+            "operations": bulk_data.get("operations"),
+            "updated_count": result.get("updated_count")
+        }
+    )
+    
+    return result
+
+
 @router.delete("/products/{product_id}")
 async def delete_product(
     product_id: str,
@@ -259,11 +341,17 @@ async def get_orders(
     search: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     status_id: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    count_mode: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: models.AdminUser = Depends(get_current_active_user)
 ):
     """Get orders from order service."""
     params = {"skip": skip, "limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    if count_mode:
+        params["count_mode"] = count_mode
     if search:
         params["search"] = search
     if status_id:
@@ -291,6 +379,112 @@ async def get_orders(
     return orders
 
 
+@router.get("/orders/by-customer")
+async def get_orders_by_customer(
+    request: Request,
+    email: Optional[str] = Query(None),
+    phone: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """Get the orders of one customer by email or phone from order service."""
+    params = {"limit": limit}
+    if email is not None:
+        params["email"] = email
+    if phone is not None:
+        params["phone"] = phone
+    if cursor:
+        params["cursor"] = cursor
+
+    orders = await make_service_request(
+        "GET",
+        settings.order_service_url,
+        "/api/v1/orders/by-customer",
+        params=params
+    )
+
+    # Customer contact details go to the audit log, it records whose orders were looked at
+    await log_user_action(
+        action="customer_orders_viewed",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Order",
+        details={"email": email, "phone": phone}
+    )
+
+    return orders
+
+
+@router.get("/orders/export")
+async def export_orders(
+    request: Request,
+    export_format: str = Query("csv", alias="format"),
+    search: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    status_id: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """Stream an order export from order service without buffering it."""
+    params = {"format": export_format}
+    for name, value in (("search", search), ("status", status), ("status_id", status_id),
+                        ("date_from", date_from), ("date_to", date_to)):
+        if value:
+            params[name] = value
+
+    response = await stream_service_request(
+        settings.order_service_url,
+        "/api/v1/orders/export",
+        params=params
+    )
+
+    await log_user_action(
+        action="orders_exported",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Order",
+        details=params
+    )
+
+    return response
+
+
+@router.get("/orders/events")
+async def stream_order_events(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """
+    Relay the live order event stream of order service.
+
+    Authenticated with the bearer token like every admin route. Browsers read
+    it with fetch, see OrderService.subscribeToOrderEvents in admin-app;
+    EventSource cannot send the Authorization header.
+    """
+    response = await stream_service_request(
+        settings.order_service_url,
+        "/api/v1/orders/events"
+    )
+    response.headers["X-Accel-Buffering"] = "no"
+
+    await log_user_action(
+        action="order_feed_opened",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Order"
+    )
+
+    return response
+
+
 @router.get("/orders/{order_id}")
 async def get_order(
     order_id: str,
@@ -346,6 +540,37 @@ async def update_order_status(
     return order
 
 
+@router.post("/orders/bulk/status")
+async def bulk_update_order_status(
+    bulk_data: dict,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """Move many orders to one status in a single transaction."""
+    result = await make_service_request(
+        "POST",
+        settings.order_service_url,
+        "/api/v1/orders/bulk/status",
+        json=bulk_data
+    )
+
+    await log_user_action(
+        action="order_status_bulk_changed",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Order",
+        details={
+            "new_status": result.get("status"),
+            "requested_count": len(bulk_data.get("order_ids") or []),
+            "updated_count": result.get("updated")
+        }
+    )
+
+    return result
+
+
 @router.get("/orders/stats")
 async def get_order_stats(
     request: Request,
@@ -370,6 +595,72 @@ async def get_order_stats(
     return stats
 
 
+@router.get("/orders/analytics/timeseries")
+async def get_order_timeseries(
+    request: Request,
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    granularity: Optional[str] = Query(None),
+    group_by: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """Get order count and revenue time series from order service."""
+    params = {}
+    if date_from:
+        params["date_from"] = date_from
+    if date_to:
+        params["date_to"] = date_to
+    if granularity:
+        params["granularity"] = granularity
+    if group_by:
+        params["group_by"] = group_by
+
+    timeseries = await make_service_request(
+        "GET",
+        settings.order_service_url,
+        "/api/v1/orders/analytics/timeseries",
+        params=params
+    )
+
+    await log_user_action(
+        action="order_analytics_viewed",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Order"
+    )
+
+    return timeseries
+
+
+@router.get("/orders/analytics/top-products")
+async def get_top_products(
+    request: Request,
+    days: int = Query(7),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """Get the best selling products over the last 7 or 30 days from order service."""
+    top_products = await make_service_request(
+        "GET",
+        settings.order_service_url,
+        "/api/v1/orders/analytics/top-products",
+        params={"days": days, "limit": limit}
+    )
+
+    await log_user_action(
+        action="order_analytics_viewed",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Order"
+    )
+
+    return top_products
+
+
 @router.get("/order-statuses")
 async def get_order_statuses(
     request: Request,
@@ -417,4 +708,31 @@ async def get_order_status_history(
         target_resource_id=order_id
     )
     
-    return history
\ No newline at end of file
+    return history
+
+
+@router.post("/orders/history/batch")
+async def get_order_status_histories(
+    batch_data: dict,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.AdminUser = Depends(get_current_active_user)
+):
+    """Get status histories of many orders for the timeline view."""
+    histories = await make_service_request(
+        "POST",
+        settings.order_service_url,
+        "/api/v1/orders/history/batch",
+        json=batch_data
+    )
+
+    await log_user_action(
+        action="order_status_history_viewed",
+        request=request,
+        db=db,
+        user=current_user,
+        target_resource_type="Order",
+        details={"order_count": len(batch_data.get("order_ids") or [])}
+    )
+
+    return histories
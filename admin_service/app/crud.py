@@ -31,7 +31,6 @@ class AdminUserCRUD:
         )
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
         return db_obj
     
     def update(self, db: Session, db_obj: models.AdminUser, obj_in: schemas.AdminUserUpdate) -> models.AdminUser:
@@ -45,7 +44,6 @@ class AdminUserCRUD:
         
         db_obj.updated_at = datetime.utcnow()
         db.commit()
-        db.refresh(db_obj)
         return db_obj
     
     def authenticate(self, db: Session, username: str, password: str) -> Optional[models.AdminUser]:
@@ -59,7 +57,6 @@ class AdminUserCRUD:
     def update_last_login(self, db: Session, user: models.AdminUser) -> None:
         user.last_login_at = datetime.utcnow()
         db.commit()
-        db.refresh(user)
     
     def delete(self, db: Session, user_id: str) -> Optional[models.AdminUser]:
         obj = db.query(models.AdminUser).filter(models.AdminUser.id == user_id).first()
@@ -74,7 +71,6 @@ class AuditLogCRUD:
         db_obj = models.AuditLog(**obj_in.model_dump())
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
         return db_obj
     
     def get_multi(
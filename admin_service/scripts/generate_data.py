@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Generate deterministic synthetic admin users and audit logs for scale testing.
+
+Postgres is loaded with COPY, any other database (SQLite) with
+executemany. The same seed and arguments always produce the same rows.
+All synthetic admins share the password "synthetic123".
+
+    python scripts/generate_data.py --audit-logs 1000000
+
+generate_audit_logs() takes an engine and can be called from pytest fixtures.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import Engine
+
+from app import models
+from app.core.security import get_password_hash
+from app.database import Base
+
+# Shared with the product and order service generators, so audit targets resolve
+SYNTHETIC_NAMESPACE = uuid.UUID("6f1c8a52-3f0e-4d59-9d0a-3c8e2b7a5f10")
+
+ADMINS = [
+    ("Анна", "Смирнова"), ("Дмитрий", "Кузнецов"), ("Елена", "Попова"), ("Сергей", "Васильев"),
+    ("Ольга", "Новикова"), ("Павел", "Морозов"), ("Мария", "Волкова"), ("Игорь", "Лебедев"),
+]
+# (action, target_resource_type, relative weight)
+ACTIONS = [
+    ("orders_list_viewed", "Order", 30),
+    ("order_viewed", "Order", 25),
+    ("order_status_changed", "Order", 15),
+    ("order_status_history_viewed", "Order", 5),
+    ("order_stats_viewed", "Order", 8),
+    ("products_list_viewed", "Product", 8),
+    ("product_viewed", "Product", 4),
+    ("product_updated", "Product", 3),
+    ("product_created", "Product", 1),
+    ("login_success", None, 2),
+    ("login_failed", None, 1),
+    ("users_list_viewed", "AdminUser", 1),
+]
+ACTION_WEIGHTS = [weight for _, _, weight in ACTIONS]
+STATUSES = ["PROCESSING", "SHIPPED", "DELIVERED", "CANCELLED"]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_2) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "YaBrowser/24.1 (Windows NT 10.0; Win64; x64)",
+]
+
+
+# _to_csv_value and bulk_insert are repeated in each service's generate_data.py on
+# purpose: every service is built into its own image from its own directory, and
+# there is no package shared between them to hold one copy.
+def _to_csv_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+def bulk_insert(conn, table, rows: List[dict]) -> None:
+    """Insert rows with COPY on Postgres and executemany elsewhere."""
+    if not rows:
+        return
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.insert(), rows)
+        return
+
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_to_csv_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def ensure_admin_users(engine: Engine, now: datetime) -> List[uuid.UUID]:
+    """Create the synthetic admin users if missing and return their ids."""
+    table = models.AdminUser.__table__
+    user_ids = [uuid.uuid5(SYNTHETIC_NAMESPACE, f"admin-{index}") for index in range(len(ADMINS))]
+    with engine.begin() as conn:
+        existing = set(conn.execute(select(table.c.id).where(table.c.id.in_(user_ids))).scalars())
+        password_hash = get_password_hash("synthetic123")
+        rows = [
+            {
+                "id": user_id,
+                "username": f"synthetic_admin_{index}",
+                "email": f"synthetic_admin_{index}@lightbulbstore.com",
+                "password_hash": password_hash,
+                "first_name": first_name,
+                "last_name": last_name,
+                "is_active": True,
+                "last_login_at": None,
+                "created_at": now - timedelta(days=730),
+                "updated_at": now - timedelta(days=730),
+            }
+            for index, ((first_name, last_name), user_id) in enumerate(zip(ADMINS, user_ids))
+            if user_id not in existing
+        ]
+        bulk_insert(conn, table, rows)
+    return user_ids
+
+
+def audit_log_row(index: int, rng: random.Random, user_ids: List[uuid.UUID], seed: int,
+                  orders: int, products: int, days: int, now: datetime) -> dict:
+    action, target_type, _ = rng.choices(ACTIONS, weights=ACTION_WEIGHTS)[0]
+    details = None
+    target_id = None
+    if target_type == "Order":
+        target_id = str(uuid.uuid5(SYNTHETIC_NAMESPACE, f"order-{seed}-{rng.randrange(orders)}"))
+        if action == "order_status_changed":
+            details = {"new_status": rng.choice(STATUSES)}
+    elif target_type == "Product":
+        target_id = str(uuid.uuid5(SYNTHETIC_NAMESPACE, f"product-{rng.randrange(products)}"))
+        if action == "product_updated":
+            details = {"updated_fields": rng.sample(["current_price", "stock_quantity", "description", "name"], 2)}
+    return {
+        "id": uuid.uuid5(SYNTHETIC_NAMESPACE, f"audit-{index}"),
+        "user_id": rng.choice(user_ids),
+        "action": action,
+        "target_resource_type": target_type,
+        "target_resource_id": target_id,
+        "details": details,
+        "ip_address": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+        "user_agent": rng.choice(USER_AGENTS),
+        "timestamp": now - timedelta(seconds=rng.randrange(days * 86400)),
+    }
+
+
+def generate_audit_logs(
+    engine: Engine,
+    audit_logs: int,
+    seed: int = 42,
+    start: int = 0,
+    orders: int = 10000,
+    products: int = 1000,
+    days: int = 365,
+    batch_size: int = 10000,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Load `audit_logs` synthetic audit log entries numbered from `start`.
+
+    Targets point at the ids produced by the order and product generators
+    for the same seed, `orders` and `products` bound which ones are used.
+    Each batch is committed separately. Returns the number of entries written.
+    """
+    # Fixed default clock keeps output identical between runs
+    now = now or datetime(2026, 1, 1)
+    user_ids = ensure_admin_users(engine, now)
+    rng = random.Random(seed + start)
+    table = models.AuditLog.__table__
+
+    for batch_start in range(start, start + audit_logs, batch_size):
+        rows = [
+            audit_log_row(index, rng, user_ids, seed, orders, products, days, now)
+            for index in range(batch_start, min(batch_start + batch_size, start + audit_logs))
+        ]
+        with engine.begin() as conn:
+            bulk_insert(conn, table, rows)
+    return audit_logs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--audit-logs", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=int, default=0,
+                        help="first audit log index, use to append to an existing data set")
+    parser.add_argument("--orders", type=int, default=10000, help="number of generated orders to reference")
+    parser.add_argument("--products", type=int, default=1000, help="number of generated products to reference")
+    parser.add_argument("--days", type=int, default=365, help="spread timestamps over this many days")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+
+    started = time.perf_counter()
+    generate_audit_logs(engine, args.audit_logs, seed=args.seed, start=args.start,
+                        orders=args.orders, products=args.products, days=args.days, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Generated {args.audit_logs} audit logs in {elapsed:.1f}s ({args.audit_logs / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -38,8 +38,15 @@ export const ProductProvider: React.FC<{ children: ReactNode }> = ({
       setLoading(true);
       setError(null);
 
-      // Try to fetch from API first
-      const apiProducts = await apiService.getProducts();
+      // The static catalog snapshot first; the API only while none is published
+      // (or under `vite dev`, where nginx does not serve /assets/catalog)
+      let apiProducts: ApiProduct[];
+      try {
+        apiProducts = await apiService.getCatalog();
+      } catch (catalogErr) {
+        console.warn("Catalog snapshot unavailable, fetching from API:", catalogErr);
+        apiProducts = await apiService.getProducts();
+      }
       const transformedProducts = apiProducts.map(transformApiProduct);
       setProducts(transformedProducts);
     } catch (err) {
@@ -53,19 +60,8 @@ export const ProductProvider: React.FC<{ children: ReactNode }> = ({
   };
 
   useEffect(() => {
-    // Check if API is available on mount
-    const checkApiAndFetch = async () => {
-      try {
-        await apiService.healthCheck();
-        await fetchProducts();
-      } catch (err) {
-        console.warn("API not available, using static data");
-        setProducts(staticProducts);
-        setError(null); // Don't show error for initial load with static data
-      }
-    };
-
-    checkApiAndFetch();
+    // No API health check first: catalog reads should not reach uvicorn at all
+    fetchProducts();
   }, []);
 
   const getProductById = (id: string): Product | undefined => {
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useRef, useState } from "react";
 import { Link, useNavigate } from "react-router";
 import { useForm, Controller } from "react-hook-form";
 import { yupResolver } from "@hookform/resolvers/yup";
@@ -83,6 +83,7 @@ const CheckoutPage: React.FC = () => {
   const navigate = useNavigate();
   const { cartItems, setCartItems } = useCartContext();
   const [isSubmitting, setIsSubmitting] = useState(false);
+  const idempotencyRef = useRef<{ body: string; key: string } | null>(null);
   
   const {
     register,
@@ -145,8 +146,14 @@ const CheckoutPage: React.FC = () => {
         shipping_address: shippingAddress
 
       };
-      // Submit order to API
-      const createdOrder = await apiService.createOrder(orderRequest);
+      // Submit order to API. Resubmitting the same order after a failed attempt
+      // reuses the key, so a lost response does not turn into a duplicate order.
+      const requestBody = JSON.stringify(orderRequest);
+      if (idempotencyRef.current?.body !== requestBody) {
+        idempotencyRef.current = { body: requestBody, key: crypto.randomUUID() };
+      }
+      const createdOrder = await apiService.createOrder(orderRequest, idempotencyRef.current.key);
+      idempotencyRef.current = null;
       setCartItems([]);
       localStorage.removeItem('shoppingCart');
       localStorage.setItem('orderData', JSON.stringify(createdOrder));
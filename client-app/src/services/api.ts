@@ -2,6 +2,8 @@
 const API_BASE_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 const ORDER_API_BASE_URL =
   import.meta.env.VITE_ORDER_API_URL || "http://localhost:8001";
+// Static catalog snapshot published by product-api, served by this app's nginx
+const CATALOG_BASE_URL = import.meta.env.VITE_CATALOG_URL || "/assets/catalog";
 
 // API Product type (matches the backend schema)
 export interface ApiProduct {
@@ -29,6 +31,17 @@ export interface ApiProduct {
   updated_at: string;
 }
 
+// Catalog snapshot manifest: one entry per shard file (see product_service/app/catalog_snapshot.py)
+export interface CatalogManifest {
+  generated_at: string;
+  shards: Record<string, { file: string; count: number; etag: string }>;
+}
+
+export interface CatalogShard {
+  shard: string;
+  products: ApiProduct[];
+}
+
 export interface CreateProductRequest {
   name: string;
   sku: string;
@@ -163,13 +176,16 @@ export interface Product {
 class ApiService {
   private baseUrl: string;
   private orderBaseUrl: string;
+  private catalogBaseUrl: string;
 
   constructor(
     baseUrl: string = API_BASE_URL,
-    orderBaseUrl: string = ORDER_API_BASE_URL
+    orderBaseUrl: string = ORDER_API_BASE_URL,
+    catalogBaseUrl: string = CATALOG_BASE_URL
   ) {
     this.baseUrl = baseUrl;
     this.orderBaseUrl = orderBaseUrl;
+    this.catalogBaseUrl = catalogBaseUrl;
   }
 
   private async request<T>(
@@ -237,16 +253,41 @@ class ApiService {
     );
   }
 
+  // Whole catalog from the static snapshot: the manifest, then every shard in parallel.
+  // nginx answers these from files (revalidated by ETag), so uvicorn and Postgres are not hit.
+  async getCatalog(): Promise<ApiProduct[]> {
+    const manifest = await this.request<CatalogManifest>(
+      "/manifest.json",
+      {},
+      this.catalogBaseUrl
+    );
+    const shards = await Promise.all(
+      Object.values(manifest.shards).map((shard) =>
+        this.request<CatalogShard>(`/${shard.file}`, {}, this.catalogBaseUrl)
+      )
+    );
+    return shards.flatMap((shard) => shard.products);
+  }
+
   async getProduct(id: string): Promise<ApiProduct> {
     return this.request<ApiProduct>(`/api/v1/products/${id}`);
   }
 
-  async createOrder(order: CreateOrderRequest): Promise<Order> {
+  async createOrder(
+    order: CreateOrderRequest,
+    idempotencyKey?: string
+  ): Promise<Order> {
     console.log("Creating order:", order);
     return this.request<Order>(
       "/api/v1/orders/",
       {
         method: "POST",
+        // options.headers replaces the defaults in request(), so repeat them here
+        headers: {
+          "Content-Type": "application/json",
+          Accept: "application/json",
+          ...(idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {}),
+        },
         body: JSON.stringify(order),
       },
       this.orderBaseUrl
@@ -1,46 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Literal, Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
+import asyncio
+import hashlib
 
-from .. import crud, schemas
+from .. import crud, export, live_feed, models, product_prices, schemas, reference_cache, top_products
 from ..database import get_db
 router = APIRouter()
 
 
 # Reference data endpoints
+# Reloads reach every service process at once, clients revalidate their copy with the ETag
+REFERENCE_CACHE_CONTROL = "public, max-age=300"
+
+
+def _reference_response(request: Request, db: Session, name: str) -> Response:
+    """Serve a precomputed reference-data body, or 304 when the client's copy is current"""
+    body, etag = reference_cache.response(db, name)
+    headers = {"ETag": etag, "Cache-Control": REFERENCE_CACHE_CONTROL}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/statuses", response_model=List[schemas.OrderStatusResponse])
-def get_order_statuses(db: Session = Depends(get_db)):
+def get_order_statuses(request: Request, db: Session = Depends(get_db)):
     """Get all order statuses"""
-    return crud.get_all_order_statuses(db)
+    return _reference_response(request, db, "statuses")
 
 
 @router.get("/delivery-methods", response_model=List[schemas.DeliveryMethodResponse])
-def get_delivery_methods(db: Session = Depends(get_db)):
+def get_delivery_methods(request: Request, db: Session = Depends(get_db)):
     """Get all delivery methods"""
-    return crud.get_all_delivery_methods(db)
+    return _reference_response(request, db, "delivery_methods")
 
 
 @router.get("/payment-methods", response_model=List[schemas.PaymentMethodResponse])
-def get_payment_methods(db: Session = Depends(get_db)):
+def get_payment_methods(request: Request, db: Session = Depends(get_db)):
     """Get all payment methods"""
-    return crud.get_all_payment_methods(db)
+    return _reference_response(request, db, "payment_methods")
+
+
+@router.post("/reference-data/reload", status_code=status.HTTP_204_NO_CONTENT)
+def reload_reference_data(db: Session = Depends(get_db)):
+    """Reload statuses, delivery and payment methods in every service process after they were changed in the database"""
+    reference_cache.reload_everywhere(db)
+
+
+def _replay_idempotent_response(record, request_hash: str) -> JSONResponse:
+    """Return the stored response of an earlier request that used the same Idempotency-Key"""
+    if record.request_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request body"
+        )
+    if record.response_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed"
+        )
+    return JSONResponse(
+        status_code=record.response_status,
+        content=record.response_body,
+        headers={"Idempotent-Replayed": "true"}
+    )
+
 
 @router.post("/", response_model=schemas.OrderResponse, status_code=status.HTTP_201_CREATED)
 def create_order(
     order_request: schemas.OrderCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: Session = Depends(get_db)
 ):
-    """Create a new order using backend schema"""
+    """
+    Create a new order using backend schema.
+
+    Retries that send the same Idempotency-Key header get the original
+    response back instead of creating another order.
+    """
     try:
-        db_order = crud.create_order(db=db, order_data=order_request)
+        request_hash = None
+        if idempotency_key:
+            request_hash = hashlib.sha256(order_request.model_dump_json().encode()).hexdigest()
+            # Retries of a finished request are answered without another price check
+            existing_key = crud.get_idempotency_key(db, idempotency_key)
+            if existing_key is not None:
+                return _replay_idempotent_response(existing_key, request_hash)
+            # Ends the lookup's transaction and returns its connection to the pool
+            # for the length of the product service call
+            db.rollback()
+        # Before the key is claimed, so concurrent retries do not wait on its row lock
+        # for the product service
+        product_prices.verify_order_items(order_request.order_items)
+        claimed_key = None
+        if idempotency_key:
+            claimed_key, claimed = crud.claim_idempotency_key(db, idempotency_key, request_hash)
+            if not claimed:
+                return _replay_idempotent_response(claimed_key, request_hash)
+        db_order = crud.create_order(
+            db=db, order_data=order_request, idempotency_key=claimed_key, verify_prices=False
+        )
         return schemas.OrderResponse.from_orm(db_order)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         ) from e
+    except product_prices.ProductServiceUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Product prices cannot be verified right now, please retry"
+        ) from e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -57,6 +132,12 @@ def get_orders(
     status: Optional[str] = Query(None),
     date_from: Optional[datetime] = Query(None),
     date_to: Optional[datetime] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page, replaces skip"),
+    count_mode: Literal["window", "exact", "estimate", "cached"] = Query(
+        "window",
+        description="How `total` is computed: count(*) OVER() in the page query, a separate COUNT, "
+                    "the planner estimate for unfiltered lists, or an exact count cached for a few seconds"
+    ),
     db: Session = Depends(get_db)
 ):
     """Get list of orders with filters and pagination"""
@@ -64,35 +145,156 @@ def get_orders(
     # If status code is provided, resolve it to status_id
     resolved_status_id = status_id
     if status and not status_id:
-        status_obj = crud.get_order_status_by_code(db, status)
+        status_obj = reference_cache.order_status_by_code(db, status)
         if status_obj:
             resolved_status_id = status_obj.id
     
-    orders = crud.get_orders(
-        db=db,
-        skip=skip,
-        limit=limit,
+    filters = dict(
         search=search,
         status_id=resolved_status_id,
         date_from=date_from,
         date_to=date_to
     )
+    total_count = None
+    total_is_estimate = False
     
-    # Get total count for pagination
-    total_count = crud.get_orders_count(
-        db=db,
-        search=search,
-        status_id=resolved_status_id,
-        date_from=date_from,
-        date_to=date_to
-    )
+    # Fetch one extra row to know whether there is a next page
+    try:
+        if count_mode == "window" and not cursor:
+            orders, total_count = crud.get_orders_with_total(db=db, skip=skip, limit=limit + 1, **filters)
+            if total_count is None and skip == 0:
+                total_count = 0
+        else:
+            orders = crud.get_orders(db=db, skip=skip, limit=limit + 1, cursor=cursor, **filters)
+    except ValueError as e:
+        # The `status` query parameter shadows fastapi.status in this handler
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    
+    if count_mode == "exact":
+        total_count = crud.get_orders_count(db=db, **filters)
+    elif count_mode == "estimate" and not any(filters.values()):
+        total_count = crud.estimate_orders_count(db)
+        total_is_estimate = total_count is not None
+    
+    # Keyset pages, empty window pages and filtered estimates fall back to the cached exact count
+    if total_count is None:
+        total_count = crud.get_orders_count_cached(db=db, **filters)
     
     # Convert to summary format
     return schemas.PaginatedOrdersResponse(
         data=[schemas.OrderSummaryResponse.from_orm(order) for order in orders],
         total=total_count,
-        skip=skip,
-        limit=limit
+        skip=0 if cursor else skip,
+        limit=limit,
+        next_cursor=crud.encode_order_cursor(orders[-1]) if has_more else None,
+        total_is_estimate=total_is_estimate
+    )
+
+
+@router.get("/by-customer", response_model=schemas.PaginatedOrdersResponse)
+def get_orders_by_customer(
+    email: Optional[str] = Query(None, max_length=255),
+    phone: Optional[str] = Query(None, max_length=50),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the orders of one customer by email or phone, newest first.
+
+    Email is matched case-insensitively, phone by its digits, so
+    "8 (900) 123-45-67" finds orders placed as "+79001234567".
+    """
+    if (email is None) == (phone is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass exactly one of email or phone")
+    if phone is not None and not models.normalize_customer_phone(phone):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Phone must contain digits")
+
+    try:
+        orders = crud.get_orders_by_customer(db, email=email, phone=phone, limit=limit + 1, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    return schemas.PaginatedOrdersResponse(
+        data=[schemas.OrderSummaryResponse.from_orm(order) for order in orders],
+        total=crud.get_orders_by_customer_count(db, email=email, phone=phone),
+        skip=0,
+        limit=limit,
+        next_cursor=crud.encode_order_cursor(orders[-1]) if has_more else None
+    )
+
+
+@router.get("/export")
+def export_orders(
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    search: Optional[str] = Query(None),
+    status_id: Optional[UUID] = Query(None),
+    status: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream all matching orders with items and payments, oldest first.
+
+    Takes the same filters as the order list. Rows are read in batches
+    through a server-side cursor while the response is being sent.
+    """
+    resolved_status_id = status_id
+    if status and not status_id:
+        status_obj = reference_cache.order_status_by_code(db, status)
+        if status_obj:
+            resolved_status_id = status_obj.id
+
+    batches = crud.stream_orders(
+        db,
+        search=search,
+        status_id=resolved_status_id,
+        date_from=date_from,
+        date_to=date_to
+    )
+    filename = f"orders-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{export_format}"
+    # The db session from get_db is closed only after the response has been sent
+    return StreamingResponse(
+        export.ORDER_EXPORT_WRITERS[export_format](db, batches),
+        media_type=export.ORDER_EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/events")
+async def stream_order_events():
+    """
+    Server-Sent Events stream of order.created and order.status_changed events.
+
+    Events are pushed as their transactions commit. A comment line is sent
+    when nothing happened for a while, so idle connections stay open.
+    """
+    queue = live_feed.order_feed.subscribe()
+
+    async def messages():
+        try:
+            yield f"retry: {live_feed.ORDER_FEED_RECONNECT_DELAY * 1000}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), live_feed.ORDER_FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            live_feed.order_feed.unsubscribe(queue)
+
+    return StreamingResponse(
+        messages(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -109,6 +311,98 @@ def get_order_statistics(db: Session = Depends(get_db)):
         ) from e
 
 
+@router.get("/analytics/timeseries", response_model=schemas.OrderTimeseriesResponse)
+def get_order_timeseries(
+    date_from: Optional[datetime] = Query(None, description="Defaults to 30 days before date_to"),
+    date_to: Optional[datetime] = Query(None, description="Exclusive, defaults to now"),
+    granularity: Literal["hour", "day"] = Query("day"),
+    group_by: Optional[Literal["status", "delivery_method", "payment_method"]] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Get order count and revenue per UTC hour or day, served from the order rollups"""
+    date_to = date_to or datetime.now(timezone.utc)
+    date_from = date_from or date_to - timedelta(days=30)
+    span = crud.to_utc(date_to) - crud.to_utc(date_from)
+    if span <= timedelta(0):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_to must be after date_from")
+    if span > crud.ORDER_TIMESERIES_MAX_RANGE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range is limited to {crud.ORDER_TIMESERIES_MAX_RANGE.days} days"
+        )
+
+    points = crud.get_order_timeseries(db, date_from, date_to, granularity=granularity, group_by=group_by)
+    return schemas.OrderTimeseriesResponse(
+        granularity=granularity,
+        group_by=group_by,
+        date_from=crud.truncate_to_bucket(date_from, granularity),
+        date_to=crud.to_utc(date_to),
+        points=points
+    )
+
+
+@router.get("/analytics/top-products", response_model=schemas.TopProductsResponse)
+def get_top_products(
+    response: Response,
+    days: int = Query(7, description=f"One of {', '.join(map(str, top_products.TOP_PRODUCTS_WINDOWS))}"),
+    limit: int = Query(10, ge=1, le=top_products.TOP_PRODUCTS_MAX_LIMIT),
+    db: Session = Depends(get_db)
+):
+    """Get the best selling products by units over the last days, served from the periodically refreshed cache"""
+    if days not in top_products.TOP_PRODUCTS_WINDOWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"days must be one of {', '.join(map(str, top_products.TOP_PRODUCTS_WINDOWS))}"
+        )
+    snapshot = top_products.get(db)
+    response.headers["Cache-Control"] = f"public, max-age={int(top_products.TOP_PRODUCTS_REFRESH_INTERVAL)}"
+    return schemas.TopProductsResponse(
+        days=days,
+        refreshed_at=snapshot.refreshed_at,
+        products=snapshot.rankings[days][:limit]
+    )
+
+
+@router.post("/bulk/status", response_model=schemas.BulkOrderStatusResponse)
+def bulk_update_order_status(
+    bulk_update: schemas.BulkOrderStatusUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Move up to 1000 orders to one status in a single transaction.
+
+    Orders whose current status does not allow the transition are left as
+    they are; the outcome of every order is reported in `results`.
+    """
+    try:
+        results = crud.bulk_update_order_status(db, bulk_update)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return schemas.BulkOrderStatusResponse(
+        status=reference_cache.order_status_by_id(db, bulk_update.status_id).code,
+        updated=sum(1 for result in results if result["outcome"] == "updated"),
+        results=results
+    )
+
+
+@router.post("/history/batch", response_model=List[schemas.OrderStatusHistoryBatchItem])
+def get_order_status_histories(
+    batch: schemas.OrderStatusHistoryBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """Get the status histories of up to 500 orders in one query, unknown orders are left out"""
+    order_ids = list(dict.fromkeys(batch.order_ids))
+    histories = crud.get_order_status_histories(db, order_ids)
+    return [
+        schemas.OrderStatusHistoryBatchItem(
+            order_id=order_id,
+            history=[schemas.OrderStatusHistoryResponse.from_orm(h) for h in histories[order_id]]
+        )
+        for order_id in order_ids
+        if order_id in histories
+    ]
+
+
 @router.get("/{order_id}", response_model=schemas.OrderResponse)
 def get_order(order_id: UUID, db: Session = Depends(get_db)):
     """Get order by ID with full details"""
@@ -154,12 +448,11 @@ def update_order_status(
 @router.get("/{order_id}/history", response_model=List[schemas.OrderStatusHistoryResponse])
 def get_order_status_history(order_id: UUID, db: Session = Depends(get_db)):
     """Get order status history"""
-    db_order = crud.get_order(db, order_id=order_id)
-    if db_order is None:
+    history = crud.get_order_status_history(db, order_id)
+    # Every order has at least its creation entry, only an empty history needs the existence check
+    if not history and not crud.order_exists(db, order_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
-    
-    history = crud.get_order_status_history(db, order_id)
     return [schemas.OrderStatusHistoryResponse.from_orm(h) for h in history]
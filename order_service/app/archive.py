@@ -0,0 +1,316 @@
+"""
+Cold archive of old delivered and cancelled orders.
+
+Orders older than ORDER_ARCHIVE_AFTER_DAYS in a final status are never
+edited again. archive_orders() moves them, with their items, shipping
+address, payment and status history, out of the database into segment
+files in ORDER_ARCHIVE_DIR and keeps one archived_orders row per order.
+ORDER_ARCHIVE_DIR must be an absolute path on storage that outlives the
+container and that every service instance mounts; archiving is off while
+it is unset, and reading an archived order then raises ArchiveUnavailable.
+
+A segment is written as <segment>.<xid>.partial and renamed once the
+transaction that indexes it and deletes its orders has committed. Partial
+files left by a crash are renamed or removed by the next archive run,
+depending on whether that transaction committed.
+
+A segment is gzip-compressed NDJSON, one line per order. Every
+ORDER_ARCHIVE_BLOCK_SIZE lines form a separate gzip member, so the file
+is still readable with zcat, while load_order() reads and decompresses
+only the block its index row points at.
+
+Loaded orders are transient ORM objects with all relationships set. They
+are never added to a session.
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, Numeric, select, func, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import models, reference_cache
+
+logger = logging.getLogger(__name__)
+
+ORDER_ARCHIVE_DIR = os.getenv("ORDER_ARCHIVE_DIR", "")
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "548"))  # 18 months
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "5000"))
+ORDER_ARCHIVE_BLOCK_SIZE = 256
+ORDER_ARCHIVE_STATUSES = ("DELIVERED", "CANCELLED")
+PARTIAL_SUFFIX = ".partial"
+
+
+class ArchiveUnavailable(Exception):
+    """An order is archived but its segment cannot be read"""
+
+
+def _archive_dir() -> str:
+    if not os.path.isabs(ORDER_ARCHIVE_DIR):
+        raise ValueError(f"ORDER_ARCHIVE_DIR must be an absolute path, got {ORDER_ARCHIVE_DIR!r}")
+    return ORDER_ARCHIVE_DIR
+
+
+def validate_config() -> None:
+    """Raise ValueError when ORDER_ARCHIVE_DIR is set but not absolute, checked once at startup"""
+    if ORDER_ARCHIVE_DIR:
+        _archive_dir()
+
+
+def _json_default(value):
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+
+def _encode_row(obj) -> Dict[str, Any]:
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def _decode_row(model, data: Dict[str, Any]):
+    values = {}
+    for column in model.__table__.columns:
+        value = data.get(column.key)
+        if value is not None:
+            if isinstance(column.type, UUID):
+                value = uuid.UUID(value)
+            elif isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Numeric):
+                value = Decimal(value)
+        values[column.key] = value
+    return model(**values)
+
+
+def _encode_order(order: models.Order) -> bytes:
+    record = {
+        "order": _encode_row(order),
+        "items": [_encode_row(item) for item in order.items],
+        "shipping_address": _encode_row(order.shipping_address) if order.shipping_address else None,
+        "payment_detail": _encode_row(order.payment_detail) if order.payment_detail else None,
+        "status_history": [_encode_row(entry) for entry in order.status_history],
+    }
+    return json.dumps(record, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def _decode_order(db: Session, record: Dict[str, Any]) -> models.Order:
+    order = _decode_row(models.Order, record["order"])
+    items = [_decode_row(models.OrderItem, item) for item in record["items"]]
+    history = [_decode_row(models.OrderStatusHistory, entry) for entry in record["status_history"]]
+    address = payment = None
+    if record["shipping_address"]:
+        address = _decode_row(models.ShippingAddress, record["shipping_address"])
+    if record["payment_detail"]:
+        payment = _decode_row(models.PaymentDetail, record["payment_detail"])
+        set_committed_value(payment, "payment_method_ref",
+                            reference_cache.payment_method_by_id(db, payment.payment_method_id))
+    for entry in history:
+        set_committed_value(entry, "status_ref", reference_cache.order_status_by_id(db, entry.status_id))
+    # Segments written before the children carried order_created_at
+    for child in [*items, *history, payment]:
+        if child is not None and child.order_created_at is None:
+            child.order_created_at = order.created_at
+
+    # set_committed_value skips backref events, the cached reference rows are left untouched
+    set_committed_value(order, "items", items)
+    set_committed_value(order, "status_history", history)
+    set_committed_value(order, "shipping_address", address)
+    set_committed_value(order, "payment_detail", payment)
+    set_committed_value(order, "status_ref", reference_cache.order_status_by_id(db, order.status_id))
+    set_committed_value(order, "delivery_method_ref",
+                        reference_cache.delivery_method_by_id(db, order.delivery_method_id))
+    return order
+
+
+def _write_segment(orders: List[models.Order], segment: str, path: str) -> List[Dict[str, Any]]:
+    """Write orders to path, durably, and return their archived_orders rows for segment"""
+    rows = []
+    with open(path, "wb") as segment_file:
+        for start in range(0, len(orders), ORDER_ARCHIVE_BLOCK_SIZE):
+            block_orders = orders[start:start + ORDER_ARCHIVE_BLOCK_SIZE]
+            block = gzip.compress(b"".join(_encode_order(order) for order in block_orders))
+            offset = segment_file.tell()
+            segment_file.write(block)
+            rows.extend(
+                {
+                    "order_id": order.id,
+                    "order_number": order.order_number,
+                    "created_at": order.created_at,
+                    "status_id": order.status_id,
+                    "delivery_method_id": order.delivery_method_id,
+                    "payment_method_id": order.payment_method_id,
+                    "total_amount": order.total_amount,
+                    "segment": segment,
+                    "block_offset": offset,
+                    "block_length": len(block),
+                }
+                for order in block_orders
+            )
+        segment_file.flush()
+        os.fsync(segment_file.fileno())
+    return rows
+
+
+def _finish_segment(partial_path: str, path: str) -> bool:
+    """Give a committed segment its final name, False when another process already did"""
+    try:
+        os.replace(partial_path, path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _recover_segments(db: Session) -> None:
+    """Rename the partial segments of committed batches and remove those of failed ones"""
+    archive_dir = _archive_dir()
+    os.makedirs(archive_dir, exist_ok=True)
+    for name in os.listdir(archive_dir):
+        if not name.endswith(PARTIAL_SUFFIX):
+            continue
+        segment, _, xid = name[:-len(PARTIAL_SUFFIX)].rpartition(".")
+        if not segment:
+            continue
+        if db.get_bind().dialect.name == "postgresql":
+            state = db.execute(text("SELECT pg_xact_status(CAST(:xid AS xid8))"), {"xid": xid}).scalar()
+            if state == "in progress":
+                continue
+        indexed = db.query(models.ArchivedOrder.order_id).filter(
+            models.ArchivedOrder.segment == segment
+        ).first() is not None
+        db.rollback()
+        path = os.path.join(archive_dir, name)
+        if indexed:
+            if _finish_segment(path, os.path.join(archive_dir, segment)):
+                logger.warning("Recovered archive segment %s", segment)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            logger.warning("Removed archive segment %s of a failed batch", name)
+
+
+def _archive_batch(db: Session, status_ids: List[uuid.UUID], cutoff: datetime, batch_size: int) -> int:
+    orders = db.query(models.Order).options(
+        selectinload(models.Order.items),
+        selectinload(models.Order.shipping_address),
+        selectinload(models.Order.payment_detail),
+        selectinload(models.Order.status_history)
+    ).filter(
+        models.Order.status_id.in_(status_ids),
+        models.Order.created_at < cutoff
+    ).order_by(models.Order.created_at, models.Order.id).limit(batch_size).with_for_update(
+        of=models.Order, skip_locked=True
+    ).all()
+    if not orders:
+        return 0
+
+    is_postgresql = db.get_bind().dialect.name == "postgresql"
+    # The transaction id tells a later _recover_segments whether this batch committed
+    xid = db.execute(select(func.pg_current_xact_id())).scalar() if is_postgresql else 0
+    segment = f"orders-{orders[0].created_at:%Y%m}-{uuid.uuid4().hex[:12]}.ndjson.gz"
+    path = os.path.join(_archive_dir(), segment)
+    partial_path = f"{path}.{xid}{PARTIAL_SUFFIX}"
+    # A failed commit may still have committed, the partial file is left to _recover_segments
+    db.execute(models.ArchivedOrder.__table__.insert(), _write_segment(orders, segment, partial_path))
+    if is_postgresql:
+        # Keeps the delete triggers from uncounting the orders in stats and rollups
+        db.execute(select(func.set_config(models.ORDER_ARCHIVING_SETTING, "on", True)))
+    _delete_orders(db, orders, cutoff)
+    db.commit()
+    _finish_segment(partial_path, path)
+    db.expunge_all()
+    return len(orders)
+
+
+def _delete_orders(db: Session, orders: List[models.Order], cutoff: datetime) -> None:
+    order_ids = [order.id for order in orders]
+    address_ids = [order.shipping_address_id for order in orders if order.shipping_address_id]
+    for model in (models.OrderItem, models.PaymentDetail, models.OrderStatusHistory):
+        db.execute(model.__table__.delete().where(model.order_id.in_(order_ids)))
+    db.execute(models.Order.__table__.delete().where(
+        models.Order.id.in_(order_ids),
+        models.Order.created_at < cutoff
+    ))
+    if address_ids:
+        db.execute(models.ShippingAddress.__table__.delete().where(models.ShippingAddress.id.in_(address_ids)))
+
+
+def archive_orders(
+    db: Session,
+    older_than: Optional[datetime] = None,
+    batch_size: int = ORDER_ARCHIVE_BATCH_SIZE
+) -> int:
+    """
+    Move delivered and cancelled orders created before older_than to the archive.
+
+    Defaults to ORDER_ARCHIVE_AFTER_DAYS ago. Every batch is one segment file
+    and one transaction. Expunges everything from db. Returns the number of
+    orders archived.
+    """
+    _recover_segments(db)
+    cutoff = older_than or datetime.now(timezone.utc) - timedelta(days=ORDER_ARCHIVE_AFTER_DAYS)
+    status_ids = []
+    for code in ORDER_ARCHIVE_STATUSES:
+        order_status = reference_cache.order_status_by_code(db, code)
+        if order_status:
+            status_ids.append(order_status.id)
+    archived = 0
+    while True:
+        count = _archive_batch(db, status_ids, cutoff, batch_size)
+        archived += count
+        if count < batch_size:
+            break
+    if archived:
+        logger.info("Archived %d orders created before %s", archived, cutoff.date())
+    return archived
+
+
+def load_order(
+    db: Session,
+    order_id: Optional[uuid.UUID] = None,
+    order_number: Optional[str] = None
+) -> Optional[models.Order]:
+    """
+    Read an archived order by id or number, None when it was never archived.
+
+    Raises ArchiveUnavailable when the order is archived but ORDER_ARCHIVE_DIR
+    is unset or its segment file cannot be read.
+    """
+    query = db.query(models.ArchivedOrder)
+    if order_id is not None:
+        entry = query.filter(models.ArchivedOrder.order_id == order_id).first()
+    else:
+        entry = query.filter(models.ArchivedOrder.order_number == order_number).first()
+    if entry is None:
+        return None
+
+    if not ORDER_ARCHIVE_DIR:
+        raise ArchiveUnavailable(f"Order {entry.order_id} is archived but ORDER_ARCHIVE_DIR is not set")
+    path = os.path.join(_archive_dir(), entry.segment)
+    if not os.path.exists(path):
+        # Committed, but the archive run stopped before the rename; the next one renames it
+        path = next(iter(glob.glob(f"{glob.escape(path)}.*{PARTIAL_SUFFIX}")), path)
+    try:
+        with open(path, "rb") as segment_file:
+            segment_file.seek(entry.block_offset)
+            block = gzip.decompress(segment_file.read(entry.block_length))
+    except OSError as e:
+        raise ArchiveUnavailable(f"Archive segment {entry.segment} cannot be read: {e}") from e
+    key = str(entry.order_id)
+    for line in block.splitlines():
+        record = json.loads(line)
+        if record["order"]["id"] == key:
+            return _decode_order(db, record)
+    logger.error("Archived order %s is missing from segment %s", key, entry.segment)
+    return None
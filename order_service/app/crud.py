@@ -1,11 +1,20 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func, and_, or_
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import desc, func, and_, or_, text, update, insert, select, values, column, cast, literal, literal_column, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Iterator, List, Optional, Dict, Any, Tuple
+from datetime import date, datetime, timedelta, timezone
+import base64
+import binascii
+import json
+import os
+import threading
+import time
 import uuid
 from decimal import Decimal
 
-from . import models, schemas
+from . import models, schemas, reference_cache, archive, product_prices
 import logging
 logger = logging.getLogger(__name__)
 
@@ -41,11 +50,110 @@ def get_payment_method_by_code(db: Session, code: str) -> Optional[models.Paymen
 
 
 # Order CRUD operations
-def create_order(db: Session, order_data: schemas.CreateOrderRequest) -> models.Order:
-    """Create a new order with all related entities"""
+def _column_values(obj) -> Dict[str, Any]:
+    """
+    Column values for inserting obj with Core.
+
+    Python-side defaults are applied to the object so it matches the row, columns
+    left to a server default are omitted.
+    """
+    row = {}
+    for table_column in obj.__table__.columns:
+        value = getattr(obj, table_column.key)
+        if value is None and table_column.default is not None:
+            default = table_column.default
+            value = default.arg(None) if default.is_callable else default.arg
+        if value is None and table_column.server_default is not None:
+            continue
+        # Set every column, even to None, so nothing lazy-loads once the object is persistent
+        setattr(obj, table_column.key, value)
+        row[table_column.name] = value
+    return row
+
+
+def _insert_cte(table, rows: List[Dict[str, Any]]):
+    """INSERT ... SELECT FROM (VALUES ...) as a CTE, so several tables can be written by one statement"""
+    columns = list(rows[0])
+    rows_values = values(
+        *[column(name, table.c[name].type) for name in columns], name=f"{table.name}_rows"
+    ).data([tuple(row[name] for name in columns) for row in rows])
+    # VALUES infers text for quoted parameters, cast back to the column types
+    return insert(table).from_select(
+        columns,
+        select(*[cast(rows_values.c[name], table.c[name].type) for name in columns])
+    ).cte(f"insert_{table.name}")
+
+
+def _insert_order_graph(
+    db: Session,
+    db_order: models.Order,
+    events: List[Dict[str, Any]] = ()
+) -> None:
+    """
+    Insert an order with its address, items, payment, history and outbox events in one statement.
+
+    All rows are written by data-modifying CTEs of a single query, so checkout
+    costs one round trip plus COMMIT. Foreign keys are checked at the end of
+    the statement, which is why parents and children can go in together.
+    The children's order_created_at is left to its CURRENT_TIMESTAMP default,
+    the same value the order's created_at gets in this statement. The
+    objects are then attached to the session as already persistent.
+    """
+    objects = [db_order.shipping_address, db_order, *db_order.items,
+               db_order.payment_detail, *db_order.status_history]
+    objects = [obj for obj in objects if obj is not None]
+
+    rows_by_table: Dict[Any, List[Dict[str, Any]]] = {}
+    for obj in objects:
+        rows_by_table.setdefault(obj.__table__, []).append(_column_values(obj))
+    if events:
+        rows_by_table[models.OrderOutboxEvent.__table__] = list(events)
+
+    statement = select(func.current_timestamp()).add_cte(
+        *[_insert_cte(table, rows) for table, rows in rows_by_table.items()]
+    )
+    created_at = db.execute(statement).scalar()
+
+    # Server defaults all evaluate CURRENT_TIMESTAMP, the transaction start time
+    for obj in objects:
+        for table_column in obj.__table__.columns:
+            if table_column.server_default is not None and getattr(obj, table_column.key) is None:
+                setattr(obj, table_column.key, created_at)
+        make_transient_to_detached(obj)
+    db.add(db_order)
+
+
+def _order_event(event_type: str, order_id: uuid.UUID, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """An order_outbox row, inserted in the transaction of the change it reports"""
+    return {"event_type": event_type, "order_id": order_id, "payload": payload}
+
+
+def _insert_order_events(db: Session, events: List[Dict[str, Any]]) -> None:
+    if events:
+        db.execute(insert(models.OrderOutboxEvent), events)
+
+
+def create_order(
+    db: Session,
+    order_data: schemas.CreateOrderRequest,
+    idempotency_key: Optional[models.IdempotencyKey] = None,
+    verify_prices: bool = True
+) -> models.Order:
+    """
+    Create a new order with all related entities.
+
+    When a claimed idempotency key is given, the order response is stored on
+    it in the same transaction, so a retry never sees the order without it.
+    Pass verify_prices=False only when the caller already ran
+    product_prices.verify_order_items on these items.
+    """
+    
+    # Names and prices come from the client, they must match the product catalog
+    if verify_prices:
+        product_prices.verify_order_items(order_data.order_items)
     
     # Get default "NEW" status
-    new_status = get_order_status_by_code(db, "NEW")
+    new_status = reference_cache.order_status_by_code(db, "NEW")
     if not new_status:
         raise ValueError("Order status 'NEW' not found")
     
@@ -57,8 +165,12 @@ def create_order(db: Session, order_data: schemas.CreateOrderRequest) -> models.
     # Generate unique order number
     order_number = f"ORD-{datetime.now().strftime('%Y-%m')}-{str(uuid.uuid4())[:8].upper()}"
     
-    # Create main order
+    # IDs and foreign keys are assigned client-side so every row is known before
+    # anything is sent. Related rows are also attached through relationships, so
+    # the response can be serialized without re-SELECTing what was just written.
+    order_id = uuid.uuid4()
     db_order = models.Order(
+        id=order_id,
         order_number=order_number,
         status_id=new_status.id,
         total_amount=total_amount,
@@ -66,29 +178,38 @@ def create_order(db: Session, order_data: schemas.CreateOrderRequest) -> models.
         customer_name=order_data.customer_name,
         customer_phone=order_data.customer_phone,
         customer_email=order_data.customer_email,
+        # Set here, _column_values cannot evaluate their context-sensitive column defaults
+        customer_phone_normalized=models.normalize_customer_phone(order_data.customer_phone),
+        customer_email_normalized=models.normalize_customer_email(order_data.customer_email),
         delivery_method_id=order_data.delivery_method_id,
+        payment_method_id=order_data.payment_method_id,
         customer_notes=order_data.customer_notes
     )
-    
-    db.add(db_order)
-    db.flush()  # Get the order ID
+    db_order.status_ref = db.merge(new_status, load=False)
+    delivery_method = reference_cache.delivery_method_by_id(db, order_data.delivery_method_id)
+    if delivery_method:
+        db_order.delivery_method_ref = db.merge(delivery_method, load=False)
     
     # Create order items
-    for item_data in order_data.order_items:
-        subtotal = item_data.product_snapshot_price * item_data.quantity
-        db_item = models.OrderItem(
-            order_id=db_order.id,
+    db_order.items = [
+        models.OrderItem(
+            id=uuid.uuid4(),
+            order_id=order_id,
             product_id=item_data.product_id,
             product_snapshot_name=item_data.product_snapshot_name,
             product_snapshot_price=item_data.product_snapshot_price,
             quantity=item_data.quantity,
-            subtotal_amount=subtotal
+            subtotal_amount=item_data.product_snapshot_price * item_data.quantity
         )
-        db.add(db_item)
+        for item_data in order_data.order_items
+    ]
     
     # Create shipping address if provided
     if order_data.shipping_address:
-        db_address = models.ShippingAddress(
+        address_id = uuid.uuid4()
+        db_order.shipping_address_id = address_id
+        db_order.shipping_address = models.ShippingAddress(
+            id=address_id,
             recipient_name=order_data.shipping_address.recipient_name or order_data.customer_name,
             recipient_phone=order_data.shipping_address.recipient_phone or order_data.customer_phone,
             country=order_data.shipping_address.country,
@@ -98,75 +219,177 @@ def create_order(db: Session, order_data: schemas.CreateOrderRequest) -> models.
             postal_code=order_data.shipping_address.postal_code,
             address_notes=order_data.shipping_address.address_notes
         )
-        db.add(db_address)
-        db.flush()
-        db_order.shipping_address_id = db_address.id
-      # Create payment details
-    db_payment = models.PaymentDetail(
-        order_id=db_order.id,
+    
+    # Create payment details
+    db_order.payment_detail = models.PaymentDetail(
+        id=uuid.uuid4(),
+        order_id=order_id,
         payment_method_id=order_data.payment_method_id,
         amount=total_amount,
         currency="RUB",
         payment_status_code="PENDING",
         payment_details_snapshot=order_data.payment_details_client
     )
-    db.add(db_payment)
+    payment_method = reference_cache.payment_method_by_id(db, order_data.payment_method_id)
+    if payment_method:
+        db_order.payment_detail.payment_method_ref = db.merge(payment_method, load=False)
     
     # Create initial status history
-    db_status_history = models.OrderStatusHistory(
-        order_id=db_order.id,
-        status_id=new_status.id,
-        actor_details="System: Order created",
-        notes="Order created automatically"
-    )
-    db.add(db_status_history)
+    db_order.status_history = [
+        models.OrderStatusHistory(
+            id=uuid.uuid4(),
+            order_id=order_id,
+            status_id=new_status.id,
+            actor_details="System: Order created",
+            notes="Order created automatically"
+        )
+    ]
+    
+    created_event = _order_event("order.created", order_id, {
+        "order_number": order_number,
+        "status": new_status.code,
+        "total_amount": str(total_amount),
+        "currency": db_order.currency,
+        "item_count": len(db_order.items),
+    })
+    if db.get_bind().dialect.name == "postgresql":
+        _insert_order_graph(db, db_order, events=[created_event])
+    else:
+        # Databases without data-modifying CTEs (SQLite in tests) use the unit of work
+        db.add(db_order)
+        _insert_order_events(db, [created_event])
+    
+    if idempotency_key is not None:
+        # Server-generated timestamps must be set before the response is serialized
+        db.flush()
+        idempotency_key.order_id = order_id
+        idempotency_key.response_status = 201
+        idempotency_key.response_body = schemas.OrderResponse.model_validate(db_order).model_dump(mode="json")
     
     db.commit()
-    db.refresh(db_order)
+    invalidate_orders_count_cache()
     
     return db_order
 
 
+
+# Idempotency keys for order creation
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+
+
+def get_idempotency_key(db: Session, key: str) -> Optional[models.IdempotencyKey]:
+    """The committed, unexpired record of key, without locking it"""
+    return db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.key == key,
+        models.IdempotencyKey.expires_at >= datetime.now(timezone.utc)
+    ).first()
+
+
+def claim_idempotency_key(
+    db: Session,
+    key: str,
+    request_hash: str
+) -> Tuple[models.IdempotencyKey, bool]:
+    """
+    Claim key for the current request, or return the request that already holds it.
+
+    Returns (record, claimed). The claim is an INSERT ... ON CONFLICT on the
+    primary key inside the caller's transaction. A concurrent request with
+    the same key blocks on that row until the first transaction finishes,
+    then sees its stored response. Expired keys are claimed again.
+    """
+    table = models.IdempotencyKey.__table__
+    now = datetime.now(timezone.utc)
+    dialect_insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    statement = dialect_insert(table).values(
+        key=key,
+        request_hash=request_hash,
+        expires_at=now + IDEMPOTENCY_KEY_TTL
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.key],
+        set_={
+            "request_hash": statement.excluded.request_hash,
+            "order_id": None,
+            "response_status": None,
+            "response_body": None,
+            "created_at": func.current_timestamp(),
+            "expires_at": statement.excluded.expires_at,
+        },
+        where=table.c.expires_at < now
+    ).returning(table.c.key)
+
+    claimed = db.execute(statement).first() is not None
+    record = db.get(models.IdempotencyKey, key, populate_existing=True)
+    return record, claimed
+
+
+def delete_expired_idempotency_keys(db: Session, batch_size: int = 1000) -> int:
+    """Delete expired idempotency keys in small batches to keep locks short. Returns the number deleted."""
+    table = models.IdempotencyKey.__table__
+    deleted = 0
+    while True:
+        expired = select(table.c.key).where(
+            table.c.expires_at < datetime.now(timezone.utc)
+        ).limit(batch_size).scalar_subquery()
+        result = db.execute(table.delete().where(table.c.key.in_(expired)))
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+# Everything OrderResponse serializes. Many-to-one refs are joined into the order row;
+# items come from a second SELECT ... WHERE order_id IN, so a large order is not
+# multiplied into one wide joined row per item.
+ORDER_DETAIL_OPTIONS = [
+    selectinload(models.Order.items),
+    joinedload(models.Order.shipping_address),
+    joinedload(models.Order.payment_detail).joinedload(models.PaymentDetail.payment_method_ref),
+    joinedload(models.Order.status_ref),
+    joinedload(models.Order.delivery_method_ref),
+]
+
+
 def get_order(db: Session, order_id: uuid.UUID) -> Optional[models.Order]:
-    return db.query(models.Order).options(
-        joinedload(models.Order.items),
-        joinedload(models.Order.shipping_address),
-        joinedload(models.Order.payment_detail),
-        joinedload(models.Order.status_ref),
-        joinedload(models.Order.delivery_method_ref)
-    ).filter(models.Order.id == order_id).first()
+    """Get an order with its details, falling back to the cold archive"""
+    order = db.query(models.Order).options(*ORDER_DETAIL_OPTIONS).filter(
+        models.Order.id == order_id
+    ).first()
+    if order is None:
+        order = archive.load_order(db, order_id=order_id)
+    return order
 
 
 def get_order_by_number(db: Session, order_number: str) -> Optional[models.Order]:
-    return db.query(models.Order).options(
-        joinedload(models.Order.items),
-        joinedload(models.Order.shipping_address),
-        joinedload(models.Order.payment_detail),
-        joinedload(models.Order.status_ref),
-        joinedload(models.Order.delivery_method_ref)
-    ).filter(models.Order.order_number == order_number).first()
+    """Get an order by number with its details, falling back to the cold archive"""
+    order = db.query(models.Order).options(*ORDER_DETAIL_OPTIONS).filter(
+        models.Order.order_number == order_number
+    ).first()
+    if order is None:
+        order = archive.load_order(db, order_number=order_number)
+    return order
 
 
-def get_orders(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def _escape_like(value: str) -> str:
+    """Treat % and _ in user input literally"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filter_orders(
+    query,
     search: Optional[str] = None,
     status_id: Optional[uuid.UUID] = None,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None
-) -> List[models.Order]:
-    query = db.query(models.Order).options(
-        joinedload(models.Order.status_ref)
-    )
-
-    # Apply filters
+):
     if search:
+        # One ILIKE per column so each can use its own trigram index (BitmapOr)
+        pattern = f"%{_escape_like(search)}%"
         query = query.filter(
             or_(
-                models.Order.order_number.ilike(f"%{search}%"),
-                models.Order.customer_name.ilike(f"%{search}%"),
-                models.Order.customer_email.ilike(f"%{search}%")
+                models.Order.order_number.ilike(pattern, escape="\\"),
+                models.Order.customer_name.ilike(pattern, escape="\\"),
+                models.Order.customer_email.ilike(pattern, escape="\\")
             )
         )
     if status_id:
@@ -179,7 +402,65 @@ def get_orders(
     if date_to:
         query = query.filter(models.Order.created_at <= date_to)
     
-    return query.order_by(desc(models.Order.created_at)).offset(skip).limit(limit).all()
+    return query
+
+
+def encode_order_cursor(order: models.Order) -> str:
+    """Encode the (created_at, id) position of an order as an opaque cursor."""
+    payload = json.dumps({"created_at": order.created_at.isoformat(), "id": str(order.id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_order_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Decode a cursor produced by encode_order_cursor, raises ValueError if it is malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload["created_at"]), uuid.UUID(payload["id"])
+    except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def get_orders(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    status_id: Optional[uuid.UUID] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None
+) -> List[models.Order]:
+    """
+    List orders newest first.
+
+    With a cursor the page starts right after the order it points to and
+    skip is ignored, so deep pages cost the same as the first one. Rows are
+    ordered by (created_at DESC, id) to match idx_order_status_created and
+    idx_order_created.
+    """
+    query = _filter_orders(
+        db.query(models.Order).options(joinedload(models.Order.status_ref)),
+        search=search,
+        status_id=status_id,
+        date_from=date_from,
+        date_to=date_to
+    )
+
+    if cursor:
+        cursor_created_at, cursor_id = decode_order_cursor(cursor)
+        # created_at <= x gives the index scan its start key, the OR drops rows up to the cursor
+        query = query.filter(
+            models.Order.created_at <= cursor_created_at,
+            or_(
+                models.Order.created_at < cursor_created_at,
+                models.Order.id > cursor_id
+            )
+        )
+        skip = 0
+
+    return query.order_by(
+        desc(models.Order.created_at), models.Order.id
+    ).offset(skip).limit(limit).all()
 
 
 def get_orders_count(
@@ -189,28 +470,209 @@ def get_orders_count(
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None
 ) -> int:
-    query = db.query(func.count(models.Order.id))
-    
     # Apply same filters as get_orders
-    if search:
+    return _filter_orders(
+        db.query(func.count(models.Order.id)),
+        search=search,
+        status_id=status_id,
+        date_from=date_from,
+        date_to=date_to
+    ).scalar()
+
+
+
+def get_orders_with_total(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    status_id: Optional[uuid.UUID] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> Tuple[List[models.Order], Optional[int]]:
+    """
+    Fetch a page of orders and the filtered total in one query via count(*) OVER().
+
+    The window is evaluated before OFFSET/LIMIT, so every row carries the
+    full count. Returns None as the total when the page is empty.
+    """
+    query = _filter_orders(
+        db.query(models.Order, func.count().over()).options(joinedload(models.Order.status_ref)),
+        search=search,
+        status_id=status_id,
+        date_from=date_from,
+        date_to=date_to
+    )
+    rows = query.order_by(
+        desc(models.Order.created_at), models.Order.id
+    ).offset(skip).limit(limit).all()
+    if not rows:
+        return [], None
+    return [order for order, _ in rows], rows[0][1]
+
+
+def _customer_filter(email: Optional[str] = None, phone: Optional[str] = None):
+    if email is not None:
+        return models.Order.customer_email_normalized == models.normalize_customer_email(email)
+    return models.Order.customer_phone_normalized == models.normalize_customer_phone(phone)
+
+
+def get_orders_by_customer(
+    db: Session,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[models.Order]:
+    """
+    Orders of one customer newest first, by email or phone.
+
+    Only the summary columns are loaded, all of which are in
+    idx_order_customer_email_lookup / idx_order_customer_phone_lookup, so
+    Postgres answers from the index without visiting the table. status_ref
+    comes from the reference cache. Archived orders are not included.
+    """
+    query = db.query(models.Order).options(
+        load_only(models.Order.created_at, *(getattr(models.Order, name) for name in models.ORDER_SUMMARY_INCLUDE))
+    ).filter(_customer_filter(email, phone))
+
+    if cursor:
+        cursor_created_at, cursor_id = decode_order_cursor(cursor)
         query = query.filter(
+            models.Order.created_at <= cursor_created_at,
             or_(
-                models.Order.order_number.ilike(f"%{search}%"),
-                models.Order.customer_name.ilike(f"%{search}%"),
-                models.Order.customer_email.ilike(f"%{search}%")
+                models.Order.created_at < cursor_created_at,
+                models.Order.id > cursor_id
             )
         )
-    
-    if status_id:
-        query = query.filter(models.Order.status_id == status_id)
-    
-    if date_from:
-        query = query.filter(models.Order.created_at >= date_from)
-    
-    if date_to:
-        query = query.filter(models.Order.created_at <= date_to)
-    
-    return query.scalar()
+
+    orders = query.order_by(desc(models.Order.created_at), models.Order.id).limit(limit).all()
+    for order in orders:
+        set_committed_value(order, "status_ref", reference_cache.order_status_by_id(db, order.status_id))
+    return orders
+
+
+def get_orders_by_customer_count(db: Session, email: Optional[str] = None, phone: Optional[str] = None) -> int:
+    return db.query(func.count(models.Order.id)).filter(_customer_filter(email, phone)).scalar()
+
+
+ORDER_EXPORT_BATCH_SIZE = int(os.getenv("ORDER_EXPORT_BATCH_SIZE", "1000"))
+
+
+def stream_orders(
+    db: Session,
+    search: Optional[str] = None,
+    status_id: Optional[uuid.UUID] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    batch_size: int = ORDER_EXPORT_BATCH_SIZE
+) -> Iterator[List[models.Order]]:
+    """
+    Yield all matching orders oldest first in batches of batch_size.
+
+    Orders are read through a server-side cursor (yield_per), each batch
+    comes with its items and payment loaded by one IN query per relation.
+    Takes the same filters as get_orders. Orders are expunged after every
+    batch, so memory stays flat however many orders match.
+    """
+    query = _filter_orders(
+        db.query(models.Order).options(
+            selectinload(models.Order.items),
+            selectinload(models.Order.payment_detail)
+        ),
+        search=search,
+        status_id=status_id,
+        date_from=date_from,
+        date_to=date_to
+    ).order_by(models.Order.created_at, models.Order.id)
+
+    result = db.execute(query.statement.execution_options(yield_per=batch_size))
+    try:
+        for batch in result.scalars().partitions():
+            yield batch
+            # Cascades to items and payment; expunge_all would invalidate the open result
+            for order in batch:
+                db.expunge(order)
+    finally:
+        result.close()
+
+
+def estimate_orders_count(db: Session) -> Optional[int]:
+    """
+    Return the planner's row estimate for the whole orders table.
+
+    Only meaningful for unfiltered lists. Returns None when the estimate is
+    not available: non-Postgres databases or partitions never analyzed.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    # The partitioned parent has no statistics of its own, sum its partitions
+    estimate = db.execute(text(
+        "SELECT sum(c.reltuples)::bigint FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'orders'::regclass AND c.reltuples >= 0"
+    )).scalar()
+    return estimate
+
+
+ORDER_COUNT_CACHE_TTL = float(os.getenv("ORDER_COUNT_CACHE_TTL", "30"))
+ORDER_COUNT_CACHE_SIZE = 1024
+
+# Filter tuple -> (expires_at, count); shared by all requests of this worker
+_orders_count_cache: Dict[tuple, Tuple[float, int]] = {}
+_orders_count_cache_lock = threading.Lock()
+
+
+def invalidate_orders_count_cache() -> None:
+    with _orders_count_cache_lock:
+        _orders_count_cache.clear()
+
+
+def get_orders_count_cached(
+    db: Session,
+    search: Optional[str] = None,
+    status_id: Optional[uuid.UUID] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> int:
+    """
+    get_orders_count with results kept for ORDER_COUNT_CACHE_TTL seconds.
+
+    Order writes in this worker clear the cache, writes in other workers
+    become visible once the entry expires.
+    """
+    key = (search, status_id, date_from, date_to)
+    now = time.monotonic()
+    with _orders_count_cache_lock:
+        cached = _orders_count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    count = get_orders_count(db, search=search, status_id=status_id, date_from=date_from, date_to=date_to)
+    with _orders_count_cache_lock:
+        if len(_orders_count_cache) >= ORDER_COUNT_CACHE_SIZE:
+            for stale_key in [k for k, (expires_at, _) in _orders_count_cache.items() if expires_at <= now]:
+                del _orders_count_cache[stale_key]
+            if len(_orders_count_cache) >= ORDER_COUNT_CACHE_SIZE:
+                _orders_count_cache.clear()
+        _orders_count_cache[key] = (now + ORDER_COUNT_CACHE_TTL, count)
+    return count
+
+def _status_changed_event(
+    db: Session,
+    order_id: uuid.UUID,
+    order_number: str,
+    previous_status_id: uuid.UUID,
+    status_id: uuid.UUID,
+    actor_details: Optional[str]
+) -> Dict[str, Any]:
+    previous_status = reference_cache.order_status_by_id(db, previous_status_id)
+    new_status = reference_cache.order_status_by_id(db, status_id)
+    return _order_event("order.status_changed", order_id, {
+        "order_number": order_number,
+        "status": new_status.code if new_status else None,
+        "previous_status": previous_status.code if previous_status else None,
+        "actor_details": actor_details,
+    })
 
 
 def update_order_status(
@@ -218,146 +680,323 @@ def update_order_status(
     order_id: uuid.UUID,
     status_update: schemas.OrderStatusUpdate
 ) -> Optional[models.Order]:
-    db_order = db.query(models.Order).filter(models.Order.id == order_id).first()
-    if not db_order:
+    # Update order status in a single UPDATE ... RETURNING instead of SELECT + UPDATE + refresh.
+    # Postgres reads the locked subquery before the update, so it returns the previous status
+    locked = select(models.Order.id, models.Order.created_at, models.Order.status_id).where(
+        models.Order.id == order_id
+    ).with_for_update().subquery()
+    row = db.execute(
+        update(models.Order)
+        .where(models.Order.id == locked.c.id, models.Order.created_at == locked.c.created_at)
+        .values(status_id=status_update.status_id, updated_at=func.current_timestamp())
+        .returning(models.Order, locked.c.status_id),
+        execution_options={"synchronize_session": False}
+    ).first()
+    if not row:
         return None
-    
-    # Update order status
-    old_status_id = db_order.status_id
-    db_order.status_id = status_update.status_id
-    db_order.updated_at = func.current_timestamp()
+    db_order, previous_status_id = row
     
     # Create status history entry
     db_status_history = models.OrderStatusHistory(
         order_id=order_id,
+        order_created_at=db_order.created_at,
         status_id=status_update.status_id,
         actor_details=status_update.actor_details,
         notes=status_update.notes
     )
     db.add(db_status_history)
+    _insert_order_events(db, [
+        _status_changed_event(db, order_id, db_order.order_number, previous_status_id,
+                              status_update.status_id, status_update.actor_details)
+    ])
     
     db.commit()
-    db.refresh(db_order)
+    invalidate_orders_count_cache()
     
     return db_order
 
 
+
+# Order status code -> codes a bulk update may move it to
+ORDER_STATUS_TRANSITIONS = {
+    "NEW": {"PENDING_PAYMENT", "PROCESSING", "CANCELLED"},
+    "PENDING_PAYMENT": {"PROCESSING", "CANCELLED"},
+    "PROCESSING": {"SHIPPED", "CANCELLED"},
+    "SHIPPED": {"DELIVERED"},
+    "DELIVERED": set(),
+    "CANCELLED": set(),
+}
+
+
+def bulk_update_order_status(
+    db: Session,
+    bulk_update: schemas.BulkOrderStatusUpdate
+) -> List[Dict[str, Any]]:
+    """
+    Move many orders to one status in a single transaction.
+
+    Orders whose current status allows the transition are locked in id order
+    and updated by one UPDATE ... FROM ... RETURNING, their history entries
+    and outbox events are written by one multi-row INSERT each. Returns an outcome per requested
+    order, in request order.
+    """
+    target = reference_cache.order_status_by_id(db, bulk_update.status_id)
+    if target is None:
+        raise ValueError("Order status not found")
+    allowed_from = []
+    for code, targets in ORDER_STATUS_TRANSITIONS.items():
+        order_status = reference_cache.order_status_by_code(db, code)
+        if order_status and target.code in targets:
+            allowed_from.append(order_status.id)
+
+    order_ids = list(dict.fromkeys(bulk_update.order_ids))
+    previous_status_ids: Dict[uuid.UUID, uuid.UUID] = {}
+    if allowed_from:
+        locked = select(models.Order.id, models.Order.created_at, models.Order.status_id).where(
+            models.Order.id.in_(order_ids),
+            models.Order.status_id.in_(allowed_from)
+        ).order_by(models.Order.id).with_for_update().subquery()
+        # locked.c.status_id is the status before the update on Postgres
+        updated = db.execute(
+            update(models.Order)
+            .where(models.Order.id == locked.c.id, models.Order.created_at == locked.c.created_at)
+            .values(status_id=target.id, updated_at=func.current_timestamp())
+            .returning(models.Order.id, models.Order.created_at, models.Order.order_number, locked.c.status_id),
+            execution_options={"synchronize_session": False}
+        ).all()
+        previous_status_ids = {order_id: status_id for order_id, _, _, status_id in updated}
+        created_ats = {order_id: created_at for order_id, created_at, _, _ in updated}
+        order_numbers = {order_id: order_number for order_id, _, order_number, _ in updated}
+
+    if previous_status_ids:
+        db.execute(insert(models.OrderStatusHistory), [
+            {
+                "id": uuid.uuid4(),
+                "order_id": order_id,
+                "order_created_at": created_ats[order_id],
+                "status_id": target.id,
+                "actor_details": bulk_update.actor_details,
+                "notes": bulk_update.notes,
+            }
+            for order_id in previous_status_ids
+        ])
+        _insert_order_events(db, [
+            _status_changed_event(db, order_id, order_numbers[order_id], status_id,
+                                  target.id, bulk_update.actor_details)
+            for order_id, status_id in previous_status_ids.items()
+        ])
+
+    # Orders that were not updated are only read to report why
+    remaining = [order_id for order_id in order_ids if order_id not in previous_status_ids]
+    current_status_ids = dict(db.execute(
+        select(models.Order.id, models.Order.status_id).where(models.Order.id.in_(remaining))
+    ).all()) if remaining else {}
+    db.commit()
+    if previous_status_ids:
+        invalidate_orders_count_cache()
+
+    results = []
+    for order_id in order_ids:
+        if order_id in previous_status_ids:
+            outcome, status_id = "updated", previous_status_ids[order_id]
+        elif order_id in current_status_ids:
+            status_id = current_status_ids[order_id]
+            outcome = "unchanged" if status_id == target.id else "invalid_transition"
+        else:
+            outcome, status_id = "not_found", None
+        previous_status = reference_cache.order_status_by_id(db, status_id) if status_id else None
+        results.append({
+            "order_id": order_id,
+            "outcome": outcome,
+            "previous_status": previous_status.code if previous_status else None,
+        })
+    return results
+
+
 def get_order_status_history(db: Session, order_id: uuid.UUID) -> List[models.OrderStatusHistory]:
-    return db.query(models.OrderStatusHistory).options(
+    history = db.query(models.OrderStatusHistory).options(
         joinedload(models.OrderStatusHistory.status_ref)
     ).filter(
         models.OrderStatusHistory.order_id == order_id
     ).order_by(models.OrderStatusHistory.changed_at).all()
+    if not history:
+        # Every live order has at least its creation entry, an empty history may be archived
+        archived_order = archive.load_order(db, order_id=order_id)
+        if archived_order is not None:
+            history = sorted(archived_order.status_history, key=lambda entry: entry.changed_at)
+    return history
+
+
+def get_order_status_histories(
+    db: Session,
+    order_ids: List[uuid.UUID]
+) -> Dict[uuid.UUID, List[models.OrderStatusHistory]]:
+    """
+    Status histories of many orders, oldest entry first.
+
+    Live histories come from one query over idx_status_history_order_changed,
+    orders found nowhere are left out. Archived orders are read from the
+    archive one by one.
+    """
+    histories: Dict[uuid.UUID, List[models.OrderStatusHistory]] = {}
+    entries = db.query(models.OrderStatusHistory).options(
+        joinedload(models.OrderStatusHistory.status_ref)
+    ).filter(
+        models.OrderStatusHistory.order_id.in_(order_ids)
+    ).order_by(models.OrderStatusHistory.order_id, models.OrderStatusHistory.changed_at).all()
+    for entry in entries:
+        histories.setdefault(entry.order_id, []).append(entry)
+
+    missing = [order_id for order_id in order_ids if order_id not in histories]
+    if missing:
+        archived_ids = db.scalars(
+            select(models.ArchivedOrder.order_id).where(models.ArchivedOrder.order_id.in_(missing))
+        ).all()
+        for order_id in archived_ids:
+            archived_order = archive.load_order(db, order_id=order_id)
+            if archived_order is not None:
+                histories[order_id] = sorted(archived_order.status_history, key=lambda entry: entry.changed_at)
+        # Live orders without any history entry still get an empty one
+        missing = [order_id for order_id in missing if order_id not in histories]
+        if missing:
+            for order_id in db.scalars(select(models.Order.id).where(models.Order.id.in_(missing))):
+                histories[order_id] = []
+    return histories
+
+
+def order_exists(db: Session, order_id: uuid.UUID) -> bool:
+    """Whether an order exists, live or archived, without loading it"""
+    return db.scalar(select(
+        select(models.Order.id).where(models.Order.id == order_id).exists()
+        | select(models.ArchivedOrder.order_id).where(models.ArchivedOrder.order_id == order_id).exists()
+    ))
 
 
 # Initialize reference data
-def init_reference_data(db: Session):
-    """Initialize reference data if not exists"""
-    
-    # Order statuses
+# Built-in reference rows with fixed ids. Bump REFERENCE_SEED_VERSION after adding rows here;
+# existing rows are never overwritten, changing them needs a migration.
+REFERENCE_SEED_VERSION = 1
 
-    statuses = [
-        {
-            "id": uuid.UUID("f7661699-0081-4b93-b227-f51c2a188936"),
-            "code": "NEW",
-            "name": "Новый",
-            "description": "Заказ создан"
-        },
-        {
-            "id": uuid.UUID("d5ee11b3-2dc2-4eeb-81fd-ebeeb7fa35cd"),
-            "code": "PENDING_PAYMENT",
-            "name": "Ожидает оплаты",
-            "description": "Заказ ожидает подтверждения оплаты"
-        },
-        {
-            "id": uuid.UUID("e87d2783-d80f-4a42-a7e4-a7302f6b7510"),
-            "code": "PROCESSING",
-            "name": "В обработке",
-            "description": "Заказ принят к обработке"
-        },
-        {
-            "id": uuid.UUID("823f3c37-200e-4a7c-9466-84ea031e3af3"),
-            "code": "SHIPPED",
-            "name": "Отправлен",
-            "description": "Заказ отправлен"
-        },
-        {
-            "id": uuid.UUID("823d75db-b9c6-4f58-a2f0-1bbc294cc910"),
-            "code": "DELIVERED",
-            "name": "Доставлен",
-            "description": "Заказ доставлен"
-        },
-        {
-            "id": uuid.UUID("0a455718-3182-4366-a857-94ada249ed11"),
-            "code": "CANCELLED",
-            "name": "Отменен",
-            "description": "Заказ отменен"
-        },
-    ]
-    
-    for status_data in statuses:
-        existing = get_order_status_by_code(db, status_data["code"])
-        if not existing:
-            db_status = models.OrderStatus(**status_data)
-            db.add(db_status)
-    
-    # Delivery methods
-    delivery_methods = [
-        {
-            "id": uuid.UUID("fad12742-f0f9-4873-952e-3bd25cfdc562"),
-            "code": "PICKUP_STORE",
-            "name": "Самовывоз из магазина",
-            "description": "Самовывоз из пункта выдачи"
-        },
-        {
-            "id": uuid.UUID("3898bb05-83dd-473f-ad5b-3a80ae68b5e0"),
-            "code": "PICKUP_POST",
-            "name": "Самовывоз из почтового отделения",
-            "description": "Самовывоз из ближайшего отделения"
-        },
-        {
-            "id": uuid.UUID("7cd59a83-1d98-450b-abef-b55a9838d3e3"),
-            "code": "COURIER_HOME",
-            "name": "Доставка курьером на дом",
-            "description": "Курьерская доставка по адресу"
-        },
-    ]
-    
-    for method_data in delivery_methods:
-        existing = get_delivery_method_by_code(db, method_data["code"])
-        if not existing:
-            db_method = models.DeliveryMethod(**method_data)
-            db.add(db_method)
-
-    # Payment methods
-    payment_methods = [
-        {
-            "id": uuid.UUID("7ed3c963-8440-4b57-9ca5-f80e8b150b74"),
-            "code": "CASH",
-            "name": "Наличные",
-            "description": "Оплата наличными при получении"
-        },
-        {
-            "id": uuid.UUID("d9dceffc-29d6-41e8-b861-2f5daf5a498b"),
-            "code": "CARD",
-            "name": "Картой",
-            "description": "Оплата банковской картой"
-        },
-        {
-            "id": uuid.UUID("2cba9518-21a4-4e4d-9dbb-b395cc10a40c"),
-            "code": "ONLINE",
-            "name": "Онлайн",
-            "description": "Онлайн-оплата на сайте"
-        },
-    ]
-    
-    for method_data in payment_methods:
-        existing = get_payment_method_by_code(db, method_data["code"])
-        if not existing:
-            db_method = models.PaymentMethod(**method_data)
-            db.add(db_method)
-    
+ORDER_STATUSES = [
+    {
+        "id": uuid.UUID("f7661699-0081-4b93-b227-f51c2a188936"),
+        "code": "NEW",
+        "name": "Новый",
+        "description": "Заказ создан"
+    },
+    {
+        "id": uuid.UUID("d5ee11b3-2dc2-4eeb-81fd-ebeeb7fa35cd"),
+        "code": "PENDING_PAYMENT",
+        "name": "Ожидает оплаты",
+        "description": "Заказ ожидает подтверждения оплаты"
+    },
+    {
+        "id": uuid.UUID("e87d2783-d80f-4a42-a7e4-a7302f6b7510"),
+        "code": "PROCESSING",
+        "name": "В обработке",
+        "description": "Заказ принят к обработке"
+    },
+    {
+        "id": uuid.UUID("823f3c37-200e-4a7c-9466-84ea031e3af3"),
+        "code": "SHIPPED",
+        "name": "Отправлен",
+        "description": "Заказ отправлен"
+    },
+    {
+        "id": uuid.UUID("823d75db-b9c6-4f58-a2f0-1bbc294cc910"),
+        "code": "DELIVERED",
+        "name": "Доставлен",
+        "description": "Заказ доставлен"
+    },
+    {
+        "id": uuid.UUID("0a455718-3182-4366-a857-94ada249ed11"),
+        "code": "CANCELLED",
+        "name": "Отменен",
+        "description": "Заказ отменен"
+    },
+]
+
+DELIVERY_METHODS = [
+    {
+        "id": uuid.UUID("fad12742-f0f9-4873-952e-3bd25cfdc562"),
+        "code": "PICKUP_STORE",
+        "name": "Самовывоз из магазина",
+        "description": "Самовывоз из пункта выдачи"
+    },
+    {
+        "id": uuid.UUID("3898bb05-83dd-473f-ad5b-3a80ae68b5e0"),
+        "code": "PICKUP_POST",
+        "name": "Самовывоз из почтового отделения",
+        "description": "Самовывоз из ближайшего отделения"
+    },
+    {
+        "id": uuid.UUID("7cd59a83-1d98-450b-abef-b55a9838d3e3"),
+        "code": "COURIER_HOME",
+        "name": "Доставка курьером на дом",
+        "description": "Курьерская доставка по адресу"
+    },
+]
+
+PAYMENT_METHODS = [
+    {
+        "id": uuid.UUID("7ed3c963-8440-4b57-9ca5-f80e8b150b74"),
+        "code": "CASH",
+        "name": "Наличные",
+        "description": "Оплата наличными при получении"
+    },
+    {
+        "id": uuid.UUID("d9dceffc-29d6-41e8-b861-2f5daf5a498b"),
+        "code": "CARD",
+        "name": "Картой",
+        "description": "Оплата банковской картой"
+    },
+    {
+        "id": uuid.UUID("2cba9518-21a4-4e4d-9dbb-b395cc10a40c"),
+        "code": "ONLINE",
+        "name": "Онлайн",
+        "description": "Онлайн-оплата на сайте"
+    },
+]
+
+REFERENCE_DATA = [
+    (models.OrderStatus, ORDER_STATUSES),
+    (models.DeliveryMethod, DELIVERY_METHODS),
+    (models.PaymentMethod, PAYMENT_METHODS),
+]
+
+
+def _reference_seed_version(db: Session) -> int:
+    return db.scalar(select(func.max(models.ReferenceDataSeed.version))) or 0
+
+
+def init_reference_data(db: Session) -> bool:
+    """
+    Insert the built-in statuses and methods unless this seed version is already applied.
+
+    Once seeded, startup costs a single SELECT. Otherwise workers booting
+    together queue on an advisory lock: the first one writes each table with
+    one INSERT ... ON CONFLICT DO NOTHING and records the version, the others
+    find the version when they get the lock and leave. Schema changes are
+    Alembic's job, the tables must exist. Returns True if this call seeded.
+    """
+    if _reference_seed_version(db) >= REFERENCE_SEED_VERSION:
+        return False
+    is_sqlite = db.get_bind().dialect.name == "sqlite"
+    if not is_sqlite:
+        db.execute(select(func.pg_advisory_xact_lock(func.hashtext("init_reference_data"))))
+        # Each statement takes a new snapshot, so this sees a seed committed while we waited
+        if _reference_seed_version(db) >= REFERENCE_SEED_VERSION:
+            db.commit()
+            return False
+
+    dialect_insert = sqlite_insert if is_sqlite else pg_insert
+    for model, rows in REFERENCE_DATA:
+        db.execute(dialect_insert(model).values(rows).on_conflict_do_nothing())
+    db.execute(
+        dialect_insert(models.ReferenceDataSeed).values(version=REFERENCE_SEED_VERSION).on_conflict_do_nothing()
+    )
     db.commit()
+    return True
 
 
 # Get all reference data functions
@@ -381,12 +1020,12 @@ def create_order_with_codes(db: Session, order_data: schemas.OrderCreateWithMeth
     """Create order using delivery and payment method codes instead of UUIDs"""
     
     # Get delivery method by code
-    delivery_method = get_delivery_method_by_code(db, order_data.delivery_method_code)
+    delivery_method = reference_cache.delivery_method_by_code(db, order_data.delivery_method_code)
     if not delivery_method:
         raise ValueError(f"Delivery method with code '{order_data.delivery_method_code}' not found")
     
     # Get payment method by code
-    payment_method = get_payment_method_by_code(db, order_data.payment_method_code)
+    payment_method = reference_cache.payment_method_by_code(db, order_data.payment_method_code)
     if not payment_method:
         raise ValueError(f"Payment method with code '{order_data.payment_method_code}' not found")
     
@@ -415,26 +1054,41 @@ def get_all_reference_data(db: Session) -> dict:
     }
 
 
-def get_order_statistics(db: Session) -> dict:
-    """Get order statistics for dashboard"""
-    from sqlalchemy import func
-    
-    # Get total orders count
-    total_orders = db.query(func.count(models.Order.id)).scalar()
-    
-    # Get orders by status counts
+def _count_orders_by_status(db: Session) -> Dict[str, int]:
+    """Count orders per status code with a full scan of orders"""
     status_counts = db.query(
         models.OrderStatus.code,
         func.count(models.Order.id).label('count')
     ).join(
         models.Order, models.OrderStatus.id == models.Order.status_id
     ).group_by(models.OrderStatus.code).all()
-    
-    # Convert to dictionary
-    status_dict = {status_code: count for status_code, count in status_counts}
+    return {status_code: count for status_code, count in status_counts}
+
+
+def _read_order_status_counters(db: Session) -> Dict[str, int]:
+    """Sum the per-status counter shards, O(statuses x shards) regardless of order volume"""
+    counters = db.query(
+        models.OrderStatusCounter.status_id,
+        func.sum(models.OrderStatusCounter.order_count)
+    ).group_by(models.OrderStatusCounter.status_id).all()
+    status_dict = {}
+    for status_id, count in counters:
+        order_status = reference_cache.order_status_by_id(db, status_id)
+        if order_status and count:
+            status_dict[order_status.code] = int(count)
+    return status_dict
+
+
+def get_order_statistics(db: Session) -> dict:
+    """Get order statistics for dashboard"""
+    # Counters are maintained by triggers on Postgres, other databases count live
+    if db.get_bind().dialect.name == "postgresql":
+        status_dict = _read_order_status_counters(db)
+    else:
+        status_dict = _count_orders_by_status(db)
     
     return {
-        "total_orders": total_orders,
+        "total_orders": sum(status_dict.values()),
         "pending_orders": status_dict.get("PENDING_PAYMENT", 0),
         "processing_orders": status_dict.get("PROCESSING", 0), 
         "shipped_orders": status_dict.get("SHIPPED", 0),
@@ -443,3 +1097,307 @@ def get_order_statistics(db: Session) -> dict:
         "new_orders": status_dict.get("NEW", 0),
         "status_breakdown": status_dict
     }
+
+
+# No trigger writes this shard (they use 0 .. ORDER_STATUS_COUNTER_SHARDS - 1), it holds the reconcile corrections
+ORDER_STATUS_COUNTER_CORRECTION_SHARD = models.ORDER_STATUS_COUNTER_SHARDS
+
+
+def reconcile_order_status_counters(db: Session) -> Dict[str, int]:
+    """
+    Correct order_status_counters from a recount of orders and return the drift per status code.
+
+    The counters and the recount are read in one REPEATABLE READ snapshot, in
+    which they agree unless the counters drifted, so order writes carry on
+    while orders are scanned. Only the difference is added, to a shard no
+    trigger writes to. One service process reconciles at a time, the others
+    return an empty drift at once. The session must not be in a transaction
+    yet, the isolation level only applies to a new one.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return {}
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    if not db.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('reconcile_order_status_counters'))")).scalar():
+        db.rollback()
+        return {}
+
+    counter = models.OrderStatusCounter
+    counted = dict(db.query(counter.status_id, func.sum(counter.order_count)).group_by(counter.status_id).all())
+    # Archived orders keep counting, their rows are gone from orders
+    statuses = union_all(
+        select(models.Order.status_id), select(models.ArchivedOrder.status_id)
+    ).subquery()
+    actual = dict(db.execute(
+        select(statuses.c.status_id, func.count()).group_by(statuses.c.status_id)
+    ).all())
+    deltas = {
+        status_id: actual.get(status_id, 0) - int(counted.get(status_id) or 0)
+        for status_id in set(counted) | set(actual)
+    }
+    deltas = {status_id: delta for status_id, delta in sorted(deltas.items()) if delta}
+
+    if deltas:
+        table = counter.__table__
+        statement = pg_insert(table).values([
+            {"status_id": status_id, "shard": ORDER_STATUS_COUNTER_CORRECTION_SHARD, "order_count": delta}
+            for status_id, delta in deltas.items()
+        ])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.status_id, table.c.shard],
+            set_={"order_count": table.c.order_count + statement.excluded.order_count}
+        ))
+    db.commit()
+
+    drift = {}
+    for status_id, delta in deltas.items():
+        order_status = reference_cache.order_status_by_id(db, status_id)
+        drift[order_status.code if order_status else str(status_id)] = delta
+    if drift:
+        logger.warning("Order status counters drifted, corrected by %s", drift)
+    return drift
+
+
+# Order time-series analytics
+ORDER_TIMESERIES_MAX_RANGE = timedelta(days=731)
+
+# group_by value -> (orders/rollups column name, reference lookup by id)
+ORDER_TIMESERIES_GROUPS = {
+    "status": ("status_id", reference_cache.order_status_by_id),
+    "delivery_method": ("delivery_method_id", reference_cache.delivery_method_by_id),
+    "payment_method": ("payment_method_id", reference_cache.payment_method_by_id),
+}
+
+
+def to_utc(moment: datetime) -> datetime:
+    """Aware UTC datetime, naive datetimes are taken as UTC"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def truncate_to_bucket(moment: datetime, granularity: str) -> datetime:
+    """Start of the UTC hour or day containing moment"""
+    moment = to_utc(moment).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _read_order_rollups(
+    db: Session,
+    date_from: datetime,
+    date_to: datetime,
+    granularity: str,
+    group_column: Optional[str]
+) -> List[Tuple[datetime, Optional[uuid.UUID], int, Decimal]]:
+    rollup = models.OrderRollup
+    group = getattr(rollup, group_column) if group_column else literal(None)
+    query = db.query(
+        rollup.bucket,
+        group,
+        func.sum(rollup.order_count),
+        func.sum(rollup.revenue)
+    ).filter(
+        rollup.granularity == granularity,
+        rollup.bucket >= date_from,
+        rollup.bucket < date_to
+    ).group_by(rollup.bucket, *([group] if group_column else []))
+    # Groups whose orders all moved elsewhere are left as zero rows
+    return query.having(func.sum(rollup.order_count) != 0).order_by(rollup.bucket).all()
+
+
+def _aggregate_orders_live(
+    db: Session,
+    date_from: datetime,
+    date_to: datetime,
+    granularity: str,
+    group_column: Optional[str]
+) -> List[Tuple[datetime, Optional[uuid.UUID], int, Decimal]]:
+    order = models.Order
+    rows = db.query(
+        order.created_at,
+        getattr(order, group_column) if group_column else literal(None),
+        order.total_amount
+    ).filter(order.created_at >= date_from, order.created_at < date_to)
+    totals: Dict[Tuple[datetime, Optional[uuid.UUID]], List] = {}
+    for created_at, group_id, total_amount in rows:
+        point = totals.setdefault((truncate_to_bucket(created_at, granularity), group_id), [0, Decimal(0)])
+        point[0] += 1
+        point[1] += total_amount
+    return sorted(
+        ((bucket, group_id, count, revenue) for (bucket, group_id), (count, revenue) in totals.items()),
+        key=lambda point: point[0]
+    )
+
+
+def get_order_timeseries(
+    db: Session,
+    date_from: datetime,
+    date_to: datetime,
+    granularity: str = "day",
+    group_by: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Order count and revenue per bucket in [date_from, date_to), optionally per group.
+
+    date_from is rounded down to its bucket. Postgres reads only order_rollups,
+    O(buckets x groups) regardless of order volume; other databases aggregate
+    orders live.
+    """
+    date_from = truncate_to_bucket(date_from, granularity)
+    date_to = to_utc(date_to)
+    group_column, lookup = ORDER_TIMESERIES_GROUPS[group_by] if group_by else (None, None)
+
+    if db.get_bind().dialect.name == "postgresql":
+        rows = _read_order_rollups(db, date_from, date_to, granularity, group_column)
+    else:
+        rows = _aggregate_orders_live(db, date_from, date_to, granularity, group_column)
+
+    points = []
+    for bucket, group_id, order_count, revenue in rows:
+        reference = lookup(db, group_id) if lookup and group_id else None
+        points.append({
+            "bucket": bucket,
+            "group": reference.code if reference else None,
+            "order_count": int(order_count),
+            "revenue": revenue,
+        })
+    return points
+
+
+def rebuild_order_rollups(
+    db: Session,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> int:
+    """
+    Recompute order_rollups from orders and archived orders, return the number of rollup rows written.
+
+    The range is widened to whole UTC days, the whole table is rebuilt when
+    no bound is given. The EXCLUSIVE lock holds concurrent order writes in
+    their rollup trigger until the rebuild commits.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return 0
+    rollup = models.OrderRollup
+    start = end = None
+    if date_from is not None:
+        start = truncate_to_bucket(date_from, "day")
+    if date_to is not None:
+        end = truncate_to_bucket(date_to, "day")
+        if end < to_utc(date_to):
+            end += timedelta(days=1)
+
+    def in_range(created_at):
+        conditions = []
+        if start is not None:
+            conditions.append(created_at >= start)
+        if end is not None:
+            conditions.append(created_at < end)
+        return conditions
+
+    orders = union_all(*(
+        select(source.created_at, source.status_id, source.delivery_method_id,
+               source.payment_method_id, source.total_amount).where(*in_range(source.created_at))
+        for source in (models.Order, models.ArchivedOrder)
+    )).subquery()
+
+    db.execute(text("LOCK TABLE order_rollups IN EXCLUSIVE MODE"))
+    db.execute(rollup.__table__.delete().where(*in_range(rollup.bucket)))
+
+    granularities = values(column("granularity", models.OrderRollup.granularity.type), name="g").data(
+        [(granularity,) for granularity in models.ORDER_ROLLUP_GRANULARITIES]
+    )
+    # A literal, not a bind parameter, so the GROUP BY expression matches the selected one
+    bucket = func.date_trunc(granularities.c.granularity, orders.c.created_at, literal_column("'UTC'"))
+    group = (granularities.c.granularity, bucket, orders.c.status_id, orders.c.delivery_method_id,
+             orders.c.payment_method_id)
+    result = db.execute(rollup.__table__.insert().from_select(
+        ["granularity", "bucket", "status_id", "delivery_method_id", "payment_method_id",
+         "shard", "order_count", "revenue"],
+        select(*group, literal(0), func.count(), func.sum(orders.c.total_amount))
+        .select_from(orders)
+        .join(granularities, literal(True))
+        .group_by(*group)
+    ))
+    db.commit()
+    return result.rowcount
+
+
+# Best sellers
+def _read_product_sales(db: Session, day_from: date, limit: int) -> List[Tuple[uuid.UUID, int, Decimal]]:
+    sales = models.ProductSalesDaily
+    units = func.sum(sales.units)
+    # Products whose orders were all cancelled are left as zero rows
+    return db.query(sales.product_id, units, func.sum(sales.revenue)).filter(
+        sales.day >= day_from
+    ).group_by(sales.product_id).having(units > 0).order_by(desc(units), sales.product_id).limit(limit).all()
+
+
+def _aggregate_product_sales_live(db: Session, day_from: date, limit: int) -> List[Tuple[uuid.UUID, int, Decimal]]:
+    item = models.OrderItem
+    units = func.sum(item.quantity)
+    cancelled = reference_cache.order_status_by_code(db, "CANCELLED")
+    query = db.query(item.product_id, units, func.sum(item.subtotal_amount)).join(
+        models.Order, models.Order.id == item.order_id
+    ).filter(models.Order.created_at >= datetime.combine(day_from, datetime.min.time(), timezone.utc))
+    if cancelled:
+        query = query.filter(models.Order.status_id != cancelled.id)
+    return query.group_by(item.product_id).order_by(desc(units), item.product_id).limit(limit).all()
+
+
+def get_top_products(
+    db: Session,
+    days: int,
+    limit: int,
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Best selling products by units over the last days UTC days, today included.
+
+    Cancelled orders do not count. Postgres reads only product_sales_daily,
+    O(days x products sold); other databases aggregate order_items live.
+    """
+    day_from = truncate_to_bucket(now or datetime.now(timezone.utc), "day").date() - timedelta(days=days - 1)
+    if db.get_bind().dialect.name == "postgresql":
+        rows = _read_product_sales(db, day_from, limit)
+    else:
+        rows = _aggregate_product_sales_live(db, day_from, limit)
+
+    return [
+        {
+            "product_id": product_id,
+            "units": int(units),
+            "revenue": revenue,
+            "units_per_day": round(int(units) / days, 2),
+        }
+        for product_id, units, revenue in rows
+    ]
+
+
+# Monthly partitions of orders
+ORDER_PARTITION_MONTHS_AHEAD = int(os.getenv("ORDER_PARTITION_MONTHS_AHEAD", str(models.ORDER_PARTITION_MONTHS_AHEAD)))
+
+
+def create_order_partitions(
+    db: Session,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> int:
+    """
+    Create the missing monthly orders partitions covering [date_from, date_to].
+
+    Defaults to the current month through ORDER_PARTITION_MONTHS_AHEAD months
+    ahead, which the service keeps in place on a schedule. Returns the number
+    of partitions created.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return 0
+    now = datetime.now(timezone.utc)
+    first_month = to_utc(date_from or now).date()
+    last_month = to_utc(date_to or now + timedelta(days=31 * ORDER_PARTITION_MONTHS_AHEAD)).date()
+    created = db.execute(select(func.create_order_partitions(first_month, last_month))).scalar()
+    db.commit()
+    if created:
+        logger.info("Created %d orders partitions up to %s", created, last_month.strftime("%Y-%m"))
+    return created
@@ -0,0 +1,105 @@
+"""
+Order export for accounting as CSV or NDJSON.
+
+Both formats are produced incrementally from crud.stream_orders batches,
+one encoded chunk per batch, so a response can stream any number of
+orders. CSV has one line per order item with the order and payment
+columns repeated, an order without items still gets one line. NDJSON has
+one line per order with its items nested.
+"""
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+from sqlalchemy.orm import Session
+
+from . import models, reference_cache
+
+ORDER_EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+CSV_COLUMNS = [
+    "order_id", "order_number", "created_at", "status", "customer_name", "customer_phone",
+    "customer_email", "delivery_method", "total_amount", "currency",
+    "payment_method", "payment_status", "payment_amount", "paid_at", "transaction_id",
+    "product_id", "product_name", "price", "quantity", "subtotal_amount",
+]
+
+
+def _code(reference) -> str:
+    return reference.code if reference else ""
+
+
+def _order_fields(db: Session, order: models.Order) -> Dict[str, Any]:
+    return {
+        "order_id": str(order.id),
+        "order_number": order.order_number,
+        "created_at": order.created_at.isoformat(),
+        "status": _code(reference_cache.order_status_by_id(db, order.status_id)),
+        "customer_name": order.customer_name,
+        "customer_phone": order.customer_phone,
+        "customer_email": order.customer_email,
+        "delivery_method": _code(reference_cache.delivery_method_by_id(db, order.delivery_method_id)),
+        "total_amount": str(order.total_amount),
+        "currency": order.currency,
+    }
+
+
+def _payment_fields(db: Session, payment: models.PaymentDetail) -> Dict[str, Any]:
+    if payment is None:
+        return {"payment_method": None, "payment_status": None, "payment_amount": None,
+                "paid_at": None, "transaction_id": None}
+    return {
+        "payment_method": _code(reference_cache.payment_method_by_id(db, payment.payment_method_id)),
+        "payment_status": payment.payment_status_code,
+        "payment_amount": str(payment.amount),
+        "paid_at": payment.paid_at.isoformat() if payment.paid_at else None,
+        "transaction_id": payment.transaction_id,
+    }
+
+
+def _item_fields(item: models.OrderItem) -> Dict[str, Any]:
+    return {
+        "product_id": str(item.product_id),
+        "product_name": item.product_snapshot_name,
+        "price": str(item.product_snapshot_price),
+        "quantity": item.quantity,
+        "subtotal_amount": str(item.subtotal_amount),
+    }
+
+
+def iter_csv(db: Session, batches: Iterable[List[models.Order]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for batch in batches:
+        for order in batch:
+            fields = {**_order_fields(db, order), **_payment_fields(db, order.payment_detail)}
+            for item in order.items or [None]:
+                writer.writerow({**fields, **_item_fields(item)} if item else fields)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iter_ndjson(db: Session, batches: Iterable[List[models.Order]]) -> Iterator[bytes]:
+    for batch in batches:
+        lines = []
+        for order in batch:
+            record = _order_fields(db, order)
+            record["payment"] = _payment_fields(db, order.payment_detail) if order.payment_detail else None
+            record["items"] = [_item_fields(item) for item in order.items]
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        yield "".join(lines).encode()
+
+
+ORDER_EXPORT_WRITERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+}
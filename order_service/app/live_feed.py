@@ -0,0 +1,152 @@
+"""
+Live order events for Server-Sent Events clients.
+
+The order_outbox insert trigger sends every order event to the
+order_events channel when its transaction commits. Each service process
+keeps one LISTEN connection, read from the event loop, and fans the
+events out to the queues of its connected clients, so the database sees
+one listener per process however many admins are watching.
+
+Every event is formatted as an SSE message once and shared by all
+subscribers. A client whose queue fills up is disconnected and can
+reconnect; events are not replayed.
+
+The same connection listens on reference_cache.REFERENCE_DATA_CHANNEL and
+reloads this process's reference data when another process asks for it,
+and after every reconnect in case a request was missed meanwhile.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Optional, Set
+
+from . import reference_cache
+from .database import engine, SessionLocal
+from .models import ORDER_EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+ORDER_FEED_QUEUE_SIZE = int(os.getenv("ORDER_FEED_QUEUE_SIZE", "1000"))
+ORDER_FEED_HEARTBEAT = float(os.getenv("ORDER_FEED_HEARTBEAT", "15"))
+ORDER_FEED_RECONNECT_DELAY = 5
+
+
+def format_event(payload: str) -> str:
+    """An SSE message for one order_events notification"""
+    event = json.loads(payload)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+def reload_reference_data() -> None:
+    db = SessionLocal()
+    try:
+        reference_cache.load(db)
+    except Exception:
+        logger.exception("Failed to reload reference data")
+    finally:
+        db.close()
+
+
+class OrderFeed:
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.connection = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.listened_before = False
+
+    def subscribe(self) -> asyncio.Queue:
+        """A queue of SSE messages, None once the subscriber has been dropped"""
+        queue = asyncio.Queue(maxsize=ORDER_FEED_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def _drop(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def publish(self, message: str) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A client that cannot keep up is dropped instead of buffering without bound
+                self._drop(queue)
+
+    async def start(self) -> None:
+        """Start listening, only Postgres has LISTEN/NOTIFY"""
+        if engine.dialect.name != "postgresql":
+            logger.info("Live order feed is disabled on %s", engine.dialect.name)
+            return
+        self.loop = asyncio.get_running_loop()
+        self._connect()
+
+    async def stop(self) -> None:
+        """Stop listening and end every open stream"""
+        self._close()
+        self.loop = None
+        for queue in list(self.subscribers):
+            self._drop(queue)
+
+    def _connect(self) -> None:
+        if self.loop is None:
+            return
+        try:
+            # A dedicated connection, taken out of the pool for good. Once detached the
+            # pool proxy no longer knows its driver connection, only dbapi_connection.
+            pooled = engine.raw_connection()
+            pooled.detach()
+            connection = pooled.dbapi_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {ORDER_EVENTS_CHANNEL}")
+                cursor.execute(f"LISTEN {reference_cache.REFERENCE_DATA_CHANNEL}")
+        except Exception:
+            logger.exception("Failed to listen for order events, retrying in %ds", ORDER_FEED_RECONNECT_DELAY)
+            self.loop.call_later(ORDER_FEED_RECONNECT_DELAY, self._connect)
+            return
+        self.connection = connection
+        self.loop.add_reader(connection.fileno(), self._read)
+        logger.info("Listening for order events")
+        if self.listened_before:
+            self.loop.run_in_executor(None, reload_reference_data)
+        self.listened_before = True
+
+    def _close(self) -> None:
+        if self.connection is None:
+            return
+        try:
+            self.loop.remove_reader(self.connection.fileno())
+            self.connection.close()
+        except Exception:
+            logger.debug("Error closing the order events connection", exc_info=True)
+        self.connection = None
+
+    def _read(self) -> None:
+        connection = self.connection
+        try:
+            connection.poll()
+        except Exception:
+            logger.exception("Lost the order events connection, reconnecting in %ds", ORDER_FEED_RECONNECT_DELAY)
+            self._close()
+            self.loop.call_later(ORDER_FEED_RECONNECT_DELAY, self._connect)
+            return
+        while connection.notifies:
+            notify = connection.notifies.pop(0)
+            if notify.channel == reference_cache.REFERENCE_DATA_CHANNEL:
+                self.loop.run_in_executor(None, reload_reference_data)
+                continue
+            try:
+                message = format_event(notify.payload)
+            except (ValueError, KeyError):
+                logger.error("Malformed order event notification: %.200s", notify.payload)
+                continue
+            self.publish(message)
+
+
+order_feed = OrderFeed()
@@ -1,17 +1,21 @@
+import asyncio
 import logging
-from fastapi import FastAPI
+import os
+import time
+from fastapi import FastAPI, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from .api import orders
-from .database import engine, get_db
-from . import models, crud
+from .database import get_db, SessionLocal
+from . import crud, reference_cache, archive, outbox, live_feed, product_prices, top_products
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# The schema is managed by Alembic (alembic upgrade head), the service does not create tables
 
 app = FastAPI(
     title="Order Service API",
@@ -36,15 +40,29 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(archive.ArchiveUnavailable)
+async def archive_unavailable_handler(request: Request, exc: archive.ArchiveUnavailable):
+    # Raised by every read that falls back to the cold archive
+    logger.error("%s", exc)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "This order is archived and the archive is not available right now"}
+    )
+
+
 async def initialize_reference_data():
     """Initialize reference data on startup"""
     try:
         logger.info("Initializing reference data...")
+        started = time.perf_counter()
         db = next(get_db())
         
         # Initialize reference data
-        crud.init_reference_data(db)
-        logger.info("Reference data initialization completed successfully")
+        seeded = crud.init_reference_data(db)
+        reference_cache.load(db)
+        logger.info("Reference data initialization completed in %.1f ms (%s)",
+                    (time.perf_counter() - started) * 1000,
+                    f"seeded version {crud.REFERENCE_SEED_VERSION}" if seeded else "already seeded")
         
         db.close()
         
@@ -53,10 +71,129 @@ async def initialize_reference_data():
         raise
 
 
+IDEMPOTENCY_CLEANUP_INTERVAL = int(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL", "3600"))
+ORDER_STATS_RECONCILE_INTERVAL = int(os.getenv("ORDER_STATS_RECONCILE_INTERVAL", "86400"))
+ORDER_PARTITION_MAINTENANCE_INTERVAL = int(os.getenv("ORDER_PARTITION_MAINTENANCE_INTERVAL", "86400"))
+ORDER_ARCHIVE_INTERVAL = int(os.getenv("ORDER_ARCHIVE_INTERVAL", "86400"))
+ORDER_OUTBOX_INTERVAL = float(os.getenv("ORDER_OUTBOX_INTERVAL", "1"))
+ORDER_OUTBOX_PRUNE_INTERVAL = int(os.getenv("ORDER_OUTBOX_PRUNE_INTERVAL", "86400"))
+order_event_sinks = outbox.sinks_from_config()
+background_tasks = set()
+
+
+def purge_expired_idempotency_keys():
+    db = SessionLocal()
+    try:
+        deleted = crud.delete_expired_idempotency_keys(db)
+        if deleted:
+            logger.info(f"Deleted {deleted} expired idempotency keys")
+    except Exception:
+        logger.exception("Failed to delete expired idempotency keys")
+    finally:
+        db.close()
+
+
+def reconcile_order_stats():
+    db = SessionLocal()
+    try:
+        crud.reconcile_order_status_counters(db)
+    except Exception:
+        logger.exception("Failed to reconcile order status counters")
+    finally:
+        db.close()
+
+
+def create_order_partitions():
+    db = SessionLocal()
+    try:
+        crud.create_order_partitions(db)
+    except Exception:
+        logger.exception("Failed to create orders partitions")
+    finally:
+        db.close()
+
+
+def archive_old_orders():
+    db = SessionLocal()
+    try:
+        archive.archive_orders(db)
+    except Exception:
+        logger.exception("Failed to archive old orders")
+    finally:
+        db.close()
+
+
+def refresh_top_products():
+    db = SessionLocal()
+    try:
+        top_products.refresh(db)
+    except Exception:
+        logger.exception("Failed to refresh top products")
+    finally:
+        db.close()
+
+
+def dispatch_order_events():
+    db = SessionLocal()
+    try:
+        outbox.dispatch_events(db, order_event_sinks)
+    except Exception:
+        logger.exception("Failed to dispatch order events")
+    finally:
+        db.close()
+
+
+def prune_order_events():
+    db = SessionLocal()
+    try:
+        deleted = outbox.prune_events(db, order_event_sinks)
+        if deleted:
+            logger.info(f"Pruned {deleted} old order events")
+    except Exception:
+        logger.exception("Failed to prune order events")
+    finally:
+        db.close()
+
+
+async def run_periodically(interval: float, job):
+    """Run a blocking maintenance job in the thread pool every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(job)
+
+
+def start_background_task(coroutine):
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
+    # A relative ORDER_ARCHIVE_DIR fails here rather than on the first archived order read
+    archive.validate_config()
     await initialize_reference_data()
+    await run_in_threadpool(create_order_partitions)
+    await run_in_threadpool(refresh_top_products)
+    start_background_task(run_periodically(IDEMPOTENCY_CLEANUP_INTERVAL, purge_expired_idempotency_keys))
+    start_background_task(run_periodically(ORDER_STATS_RECONCILE_INTERVAL, reconcile_order_stats))
+    start_background_task(run_periodically(ORDER_PARTITION_MAINTENANCE_INTERVAL, create_order_partitions))
+    if archive.ORDER_ARCHIVE_DIR:
+        start_background_task(run_periodically(ORDER_ARCHIVE_INTERVAL, archive_old_orders))
+    if order_event_sinks:
+        start_background_task(run_periodically(ORDER_OUTBOX_INTERVAL, dispatch_order_events))
+    # Without sinks this is what empties order_outbox
+    start_background_task(run_periodically(ORDER_OUTBOX_PRUNE_INTERVAL, prune_order_events))
+    start_background_task(run_periodically(top_products.TOP_PRODUCTS_REFRESH_INTERVAL, refresh_top_products))
+    await live_feed.order_feed.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """End open order event streams and close pooled connections to the product service"""
+    await live_feed.order_feed.stop()
+    product_prices.catalog.close()
 
 
 # Include routers
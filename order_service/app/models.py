@@ -1,11 +1,20 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Boolean, Integer, DECIMAL, Index, text
+from sqlalchemy import Column, String, Date, DateTime, Text, ForeignKey, ForeignKeyConstraint, Boolean, Integer, BigInteger, DECIMAL, Index, Identity, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
+import re
 import uuid
 from .database import Base
 
+# The triggers, functions and partitions on these tables exist only in the Alembic
+# migrations. create_all builds the plain tables, which only the SQLite tests use.
 
-class OrderStatus(Base):
+
+class EagerDefaultsMixin:
+    """Fetch server-generated columns via INSERT/UPDATE ... RETURNING instead of a follow-up SELECT"""
+    __mapper_args__ = {"eager_defaults": True}
+
+
+class OrderStatus(EagerDefaultsMixin, Base):
     __tablename__ = "order_statuses"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -20,7 +29,7 @@ class OrderStatus(Base):
     status_history = relationship("OrderStatusHistory", back_populates="status_ref")
 
 
-class DeliveryMethod(Base):
+class DeliveryMethod(EagerDefaultsMixin, Base):
     __tablename__ = "delivery_methods"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -35,7 +44,7 @@ class DeliveryMethod(Base):
     orders = relationship("Order", back_populates="delivery_method_ref")
 
 
-class PaymentMethod(Base):
+class PaymentMethod(EagerDefaultsMixin, Base):
     __tablename__ = "payment_methods"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -50,16 +59,52 @@ class PaymentMethod(Base):
     payment_details = relationship("PaymentDetail", back_populates="payment_method_ref")
 
 
-class Order(Base):
+def normalize_customer_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def normalize_customer_phone(phone: str) -> str:
+    """Digits only, with the domestic 8 prefix of an 11-digit number replaced by 7"""
+    digits = re.sub(r"\D", "", phone)
+    if len(digits) == 11 and digits.startswith("8"):
+        digits = "7" + digits[1:]
+    return digits
+
+
+# Everything OrderSummaryResponse needs, stored in the customer lookup indexes for index-only scans
+ORDER_SUMMARY_INCLUDE = [
+    'order_number', 'customer_name', 'customer_email', 'total_amount', 'currency', 'status_id', 'updated_at'
+]
+
+
+class Order(EagerDefaultsMixin, Base):
     __tablename__ = "orders"
     __table_args__ = (
-        Index('idx_order_status', 'status_id'),
+        # Keyset pagination on (created_at DESC, id), with and without a status filter
+        Index('idx_order_status_created', 'status_id', text('created_at DESC'), 'id'),
+        Index('idx_order_created', text('created_at DESC'), 'id'),
         Index('idx_order_user', 'user_id'),
         Index('idx_order_number', 'order_number'),
+        # Trigram indexes serve the ILIKE '%...%' search in crud.get_orders
+        Index('idx_order_number_trgm', 'order_number',
+              postgresql_using='gin', postgresql_ops={'order_number': 'gin_trgm_ops'}),
+        Index('idx_order_customer_name_trgm', 'customer_name',
+              postgresql_using='gin', postgresql_ops={'customer_name': 'gin_trgm_ops'}),
+        Index('idx_order_customer_email_trgm', 'customer_email',
+              postgresql_using='gin', postgresql_ops={'customer_email': 'gin_trgm_ops'}),
+        # Order history of one customer for crud.get_orders_by_customer, newest first
+        Index('idx_order_customer_email_lookup', 'customer_email_normalized', text('created_at DESC'), 'id',
+              postgresql_include=ORDER_SUMMARY_INCLUDE),
+        Index('idx_order_customer_phone_lookup', 'customer_phone_normalized', text('created_at DESC'), 'id',
+              postgresql_include=ORDER_SUMMARY_INCLUDE),
+        # Monthly partitions, see migration e5b2c8d4f1a7. The partition key has to be part of
+        # every unique constraint, so order_numbers keeps order_number unique and rows that
+        # point at orders carry its created_at for a (id, created_at) foreign key.
+        {'postgresql_partition_by': 'RANGE (created_at)'},
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    order_number = Column(String(50), unique=True, nullable=False, index=True)
+    order_number = Column(String(50), nullable=False, index=True)
     user_id = Column(UUID(as_uuid=True), nullable=True)  # For registered users
     status_id = Column(UUID(as_uuid=True), ForeignKey("order_statuses.id"), nullable=False)
     total_amount = Column(DECIMAL(12, 2), nullable=False)
@@ -67,12 +112,22 @@ class Order(Base):
     customer_name = Column(String(255), nullable=False)
     customer_phone = Column(String(50), nullable=False)
     customer_email = Column(String(255), nullable=False)
+    # Lookup keys for the customer order history, derived from the contact fields on insert
+    customer_phone_normalized = Column(String(50), nullable=False, default=lambda context: normalize_customer_phone(
+        context.get_current_parameters()["customer_phone"]))
+    customer_email_normalized = Column(String(255), nullable=False, default=lambda context: normalize_customer_email(
+        context.get_current_parameters()["customer_email"]))
     delivery_method_id = Column(UUID(as_uuid=True), ForeignKey("delivery_methods.id"), nullable=False)
+    # Copy of payment_details.payment_method_id so the rollup triggers see it on orders
+    payment_method_id = Column(UUID(as_uuid=True), ForeignKey("payment_methods.id"), nullable=True)
     shipping_address_id = Column(UUID(as_uuid=True), ForeignKey("shipping_addresses.id", ondelete="SET NULL"), nullable=True)
     customer_notes = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'))
+    created_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'), primary_key=True)
     updated_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
 
+    # The table key is (id, created_at) for partitioning, orders are still identified by id alone
+    __mapper_args__ = {**EagerDefaultsMixin.__mapper_args__, "primary_key": [id]}
+
     # Relationships
     status_ref = relationship("OrderStatus", back_populates="orders")
     delivery_method_ref = relationship("DeliveryMethod", back_populates="orders")
@@ -82,14 +137,17 @@ class Order(Base):
     status_history = relationship("OrderStatusHistory", back_populates="order", cascade="all, delete-orphan")
 
 
-class OrderItem(Base):
+class OrderItem(EagerDefaultsMixin, Base):
     __tablename__ = "order_items"
     __table_args__ = (
         Index('idx_order_item_order', 'order_id'),
+        ForeignKeyConstraint(['order_id', 'order_created_at'], ['orders.id', 'orders.created_at'], ondelete="CASCADE"),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(UUID(as_uuid=True), nullable=False)
+    # The order's partition key, the foreign key to partitioned orders needs all of (id, created_at)
+    order_created_at = Column(DateTime(timezone=True), nullable=False, server_default=text('CURRENT_TIMESTAMP'))
     product_id = Column(UUID(as_uuid=True), nullable=False)  # Reference to product service
     product_snapshot_name = Column(String(255), nullable=False)
     product_snapshot_price = Column(DECIMAL(10, 2), nullable=False)
@@ -102,7 +160,7 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
 
 
-class ShippingAddress(Base):
+class ShippingAddress(EagerDefaultsMixin, Base):
     __tablename__ = "shipping_addresses"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -121,15 +179,18 @@ class ShippingAddress(Base):
     order = relationship("Order", back_populates="shipping_address", uselist=False)
 
 
-class OrderStatusHistory(Base):
+class OrderStatusHistory(EagerDefaultsMixin, Base):
     __tablename__ = "order_status_history"
     __table_args__ = (
-        Index('idx_status_history_order', 'order_id'),
+        # Serves per-order history in changed_at order without a sort
+        Index('idx_status_history_order_changed', 'order_id', 'changed_at'),
         Index('idx_status_history_status', 'status_id'),
+        ForeignKeyConstraint(['order_id', 'order_created_at'], ['orders.id', 'orders.created_at'], ondelete="CASCADE"),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(UUID(as_uuid=True), nullable=False)
+    order_created_at = Column(DateTime(timezone=True), nullable=False, server_default=text('CURRENT_TIMESTAMP'))
     status_id = Column(UUID(as_uuid=True), ForeignKey("order_statuses.id"), nullable=False)
     changed_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'))
     actor_details = Column(Text)
@@ -140,11 +201,23 @@ class OrderStatusHistory(Base):
     status_ref = relationship("OrderStatus", back_populates="status_history")
 
 
-class PaymentDetail(Base):
+class ReferenceDataSeed(Base):
+    """A version of the built-in statuses and methods applied by crud.init_reference_data"""
+    __tablename__ = "reference_data_seeds"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    applied_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'))
+
+
+class PaymentDetail(EagerDefaultsMixin, Base):
     __tablename__ = "payment_details"
+    __table_args__ = (
+        ForeignKeyConstraint(['order_id', 'order_created_at'], ['orders.id', 'orders.created_at'], ondelete="CASCADE"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), unique=True, nullable=False)
+    order_id = Column(UUID(as_uuid=True), unique=True, nullable=False)
+    order_created_at = Column(DateTime(timezone=True), nullable=False, server_default=text('CURRENT_TIMESTAMP'))
     payment_method_id = Column(UUID(as_uuid=True), ForeignKey("payment_methods.id"), nullable=False)
     payment_provider = Column(String(100))
     transaction_id = Column(String(255), unique=True)
@@ -159,3 +232,187 @@ class PaymentDetail(Base):
     # Relationships
     order = relationship("Order", back_populates="payment_detail")
     payment_method_ref = relationship("PaymentMethod", back_populates="payment_details")
+
+
+class IdempotencyKey(EagerDefaultsMixin, Base):
+    """Stored outcome of a POST /orders request, replayed when the client retries with the same key"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index('idx_idempotency_key_expires', 'expires_at'),
+    )
+
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    order_id = Column(UUID(as_uuid=True), nullable=True)  # orders.id, not enforced on the partitioned table
+    response_status = Column(Integer)  # NULL while the first request is still running
+    response_body = Column(JSONB)
+    created_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'))
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class OrderOutboxEvent(Base):
+    """
+    Order event waiting to be delivered by app/outbox.py.
+
+    Written in the same transaction as the change it describes and deleted
+    once every sink has accepted it, so the table only holds the backlog.
+    Without sinks events are pruned after ORDER_OUTBOX_RETENTION_DAYS.
+    """
+    __tablename__ = "order_outbox"
+
+    # Integer on SQLite, where only INTEGER PRIMARY KEY autoincrements
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), Identity(), primary_key=True)  # delivery order
+    event_type = Column(String(50), nullable=False)  # 'order.created', 'order.status_changed'
+    order_id = Column(UUID(as_uuid=True), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'))
+    attempts = Column(Integer, nullable=False, server_default=text('0'))
+    last_error = Column(Text)
+    delivered_to = Column(JSONB, nullable=False, server_default=text("'[]'"))  # names of the sinks that accepted it
+
+
+class OrderOutboxDeadLetter(Base):
+    """
+    Order event given up on after ORDER_OUTBOX_MAX_ATTEMPTS failed deliveries.
+
+    Moved out of order_outbox so later events are delivered. Kept for
+    inspection and manual replay, with the sinks that did accept it, for
+    ORDER_OUTBOX_RETENTION_DAYS.
+    """
+    __tablename__ = "order_outbox_dead_letters"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)  # order_outbox id
+    event_type = Column(String(50), nullable=False)
+    order_id = Column(UUID(as_uuid=True), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(Text)
+    delivered_to = Column(JSONB, nullable=False)
+    failed_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'))
+
+
+# The order_outbox_notify trigger (migration b2e6c9a4d8f3) sends every outbox event to
+# LISTEN sessions on this channel. Postgres delivers notifications on commit only.
+ORDER_EVENTS_CHANNEL = "order_events"
+
+
+class ArchivedOrder(Base):
+    """
+    Index of orders moved to the cold archive by app/archive.py.
+
+    The order itself is a line in a gzip block of a segment file in
+    ORDER_ARCHIVE_DIR. The status, methods and amount are kept here so the
+    status counters and rollups can still be rebuilt.
+    """
+    __tablename__ = "archived_orders"
+    __table_args__ = (
+        Index('idx_archived_order_number', 'order_number'),
+    )
+
+    order_id = Column(UUID(as_uuid=True), primary_key=True)
+    order_number = Column(String(50), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    status_id = Column(UUID(as_uuid=True), ForeignKey("order_statuses.id"), nullable=False)
+    delivery_method_id = Column(UUID(as_uuid=True), ForeignKey("delivery_methods.id"), nullable=False)
+    payment_method_id = Column(UUID(as_uuid=True), ForeignKey("payment_methods.id"), nullable=True)
+    total_amount = Column(DECIMAL(12, 2), nullable=False)
+    segment = Column(String(255), nullable=False)  # file name within ORDER_ARCHIVE_DIR
+    block_offset = Column(BigInteger, nullable=False)
+    block_length = Column(Integer, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'))
+
+
+class OrderNumber(Base):
+    """
+    Every order number issued, archived orders included.
+
+    Partitioned orders can only keep order_number unique per partition. An
+    AFTER INSERT trigger on orders (migration b8e1f4a9c2d7) adds each new
+    number here, so a duplicate fails the insert on this primary key.
+    """
+    __tablename__ = "order_numbers"
+
+    order_number = Column(String(50), primary_key=True)
+    order_id = Column(UUID(as_uuid=True), nullable=False)
+
+
+class OrderStatusCounter(Base):
+    """
+    Number of orders per status, kept current by statement-level triggers on orders.
+
+    The triggers come from migration b7f2a9d3e8c1. Each status has up to
+    ORDER_STATUS_COUNTER_SHARDS rows, chosen by backend pid, so concurrent
+    checkouts do not queue on a single counter row. The count of a status is
+    the sum over its shards.
+    """
+    __tablename__ = "order_status_counters"
+
+    status_id = Column(UUID(as_uuid=True), ForeignKey("order_statuses.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    order_count = Column(BigInteger, nullable=False, default=0)
+
+
+# The mod(pg_backend_pid(), 8) of the counter triggers
+ORDER_STATUS_COUNTER_SHARDS = 8
+
+# Deletes made by the archive job set this for their transaction; archived
+# orders keep counting in order_status_counters and order_rollups
+ORDER_ARCHIVING_SETTING = "order_service.archiving"
+
+
+class OrderRollup(Base):
+    """
+    Order count and revenue per hour or day, status, delivery and payment method.
+
+    Kept current by statement-level triggers on orders (migration
+    c4d8e1f6a2b9), like the status counters, so the analytics endpoint never
+    scans orders. Buckets are date_trunc in UTC. Each group has up to 8 rows
+    chosen by backend pid; the totals of a group are the sum over its shards.
+    """
+    __tablename__ = "order_rollups"
+    __table_args__ = (
+        # payment_method_id is NULL for orders without payment details
+        Index('uq_order_rollup_group', 'granularity', 'bucket', 'status_id', 'delivery_method_id',
+              'payment_method_id', 'shard', unique=True, postgresql_nulls_not_distinct=True),
+    )
+
+    id = Column(BigInteger, Identity(), primary_key=True)
+    granularity = Column(String(8), nullable=False)  # 'hour' or 'day'
+    bucket = Column(DateTime(timezone=True), nullable=False)
+    status_id = Column(UUID(as_uuid=True), ForeignKey("order_statuses.id"), nullable=False)
+    delivery_method_id = Column(UUID(as_uuid=True), ForeignKey("delivery_methods.id"), nullable=False)
+    payment_method_id = Column(UUID(as_uuid=True), ForeignKey("payment_methods.id"), nullable=True)
+    shard = Column(Integer, nullable=False)
+    order_count = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(DECIMAL(16, 2), nullable=False, default=0)
+
+
+ORDER_ROLLUP_GRANULARITIES = ("hour", "day")
+
+
+class ProductSalesDaily(Base):
+    """
+    Units sold and revenue per product and UTC day of the order, cancelled orders excluded.
+
+    Kept current by statement-level triggers (migration a6d4f2c8e1b3) on
+    order_items (new and removed lines) and on orders (orders entering or
+    leaving CANCELLED), so best seller lists never scan order_items. Sharded
+    by backend pid like order_rollups; a product's totals for a day are the
+    sum over its shards.
+    """
+    __tablename__ = "product_sales_daily"
+    __table_args__ = (
+        Index('uq_product_sales_daily', 'day', 'product_id', 'shard', unique=True),
+    )
+
+    id = Column(BigInteger, Identity(), primary_key=True)
+    day = Column(Date, nullable=False)
+    product_id = Column(UUID(as_uuid=True), nullable=False)
+    shard = Column(Integer, nullable=False)
+    units = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(DECIMAL(16, 2), nullable=False, default=0)
+
+
+# Monthly partitions kept ahead of the clock by crud.create_order_partitions
+ORDER_PARTITION_MONTHS_AHEAD = 3
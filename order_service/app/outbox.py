@@ -0,0 +1,220 @@
+"""
+Delivery of order events from the order_outbox table.
+
+crud writes an order_outbox row in the same transaction as every order
+creation and status change, so an event exists exactly when its change
+was committed. dispatch_events() drains the table in id order: a batch is
+locked with FOR UPDATE SKIP LOCKED, handed to every sink and deleted in
+the same transaction. Several service instances can dispatch at once
+without blocking each other.
+
+Delivery is at least once. Each event records in delivered_to the sinks
+that accepted it. When a sink fails, the batch stays in the table with
+attempts and last_error updated, and the next run sends it again only to
+the sinks that have not accepted it yet. After ORDER_OUTBOX_MAX_ATTEMPTS
+failed runs an event moves to order_outbox_dead_letters, so one event a
+sink keeps rejecting does not hold back the ones after it. Consumers
+deduplicate by event id.
+
+A sink is any object with a name, unique among the sinks and stable across
+restarts, and send(events), which raises when the batch was not accepted.
+ORDER_OUTBOX_SINKS configures the built-in ones as a comma separated list
+of http(s) callback URLs and file: paths. Without sinks nothing is
+dispatched: the rows still feed the admin live feed, whose NOTIFY fires
+on their INSERT, and prune_events() deletes them after
+ORDER_OUTBOX_RETENTION_DAYS. Dead letters are kept that long as well.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+ORDER_OUTBOX_SINKS = os.getenv("ORDER_OUTBOX_SINKS", "")
+ORDER_OUTBOX_BATCH_SIZE = int(os.getenv("ORDER_OUTBOX_BATCH_SIZE", "500"))
+ORDER_OUTBOX_HTTP_TIMEOUT = float(os.getenv("ORDER_OUTBOX_HTTP_TIMEOUT", "10"))
+ORDER_OUTBOX_MAX_ATTEMPTS = int(os.getenv("ORDER_OUTBOX_MAX_ATTEMPTS", "10"))
+ORDER_OUTBOX_RETENTION_DAYS = int(os.getenv("ORDER_OUTBOX_RETENTION_DAYS", "7"))
+
+
+class HttpSink:
+    """POST each batch as {"events": [...]} to a callback URL, any non-2xx response fails it"""
+
+    def __init__(self, url: str, timeout: float = ORDER_OUTBOX_HTTP_TIMEOUT):
+        self.name = url
+        self.url = url
+        # One client per sink keeps the connection to the callback open between batches
+        self.client = httpx.Client(timeout=timeout)
+
+    def send(self, events: List[Dict[str, Any]]) -> None:
+        self.client.post(self.url, json={"events": events}).raise_for_status()
+
+
+class FileSink:
+    """Append each batch to a file as NDJSON, fsynced before the batch counts as delivered"""
+
+    def __init__(self, path: str):
+        self.name = f"file:{path}"
+        self.path = path
+
+    def send(self, events: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n" for event in events)
+        with open(self.path, "ab") as sink_file:
+            sink_file.write(lines.encode())
+            sink_file.flush()
+            os.fsync(sink_file.fileno())
+
+
+def sinks_from_config(config: str = ORDER_OUTBOX_SINKS) -> List[Any]:
+    """Build sinks from a comma separated list of http(s) URLs and file: paths"""
+    sinks = []
+    for target in filter(None, (part.strip() for part in config.split(","))):
+        if target.startswith(("http://", "https://")):
+            sinks.append(HttpSink(target))
+        elif target.startswith("file:"):
+            sinks.append(FileSink(target[len("file:"):]))
+        else:
+            raise ValueError(f"Unsupported order outbox sink: {target}")
+    return sinks
+
+
+def _event(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "type": row.event_type,
+        "order_id": str(row.order_id),
+        "created_at": row.created_at.isoformat(),
+        "payload": row.payload,
+    }
+
+
+def dispatch_batch(
+    db: Session,
+    sinks: List[Any],
+    batch_size: int = ORDER_OUTBOX_BATCH_SIZE,
+    max_attempts: int = ORDER_OUTBOX_MAX_ATTEMPTS
+) -> int:
+    """
+    Deliver the oldest unlocked events to every sink that has not accepted them yet.
+
+    Events every sink has accepted are deleted. The others are kept with
+    attempts incremented, or dead-lettered once they reach max_attempts,
+    and the first sink error is raised after the commit. Returns how many
+    events were delivered to all sinks.
+    """
+    outbox = models.OrderOutboxEvent.__table__
+    rows = db.execute(
+        select(outbox).order_by(outbox.c.id).limit(batch_size).with_for_update(skip_locked=True)
+    ).all()
+    if not rows:
+        db.commit()
+        return 0
+
+    delivered_to = {row.id: set(row.delivered_to) for row in rows}
+    error = None
+    for sink in sinks:
+        pending = [row for row in rows if sink.name not in delivered_to[row.id]]
+        if not pending:
+            continue
+        try:
+            sink.send([_event(row) for row in pending])
+        except Exception as e:
+            logger.warning("Order outbox sink %s failed: %s", sink.name, e)
+            error = error or e
+            continue
+        for row in pending:
+            delivered_to[row.id].add(sink.name)
+
+    sink_names = {sink.name for sink in sinks}
+    delivered = [row.id for row in rows if sink_names <= delivered_to[row.id]]
+    failed = [row for row in rows if not sink_names <= delivered_to[row.id]]
+    if delivered:
+        db.execute(delete(outbox).where(outbox.c.id.in_(delivered)))
+    if failed:
+        last_error = str(error)[:1000]
+        db.execute(
+            update(outbox).where(outbox.c.id == bindparam("event_id"))
+            .values(attempts=outbox.c.attempts + 1, last_error=last_error,
+                    delivered_to=bindparam("sinks_done")),
+            [{"event_id": row.id, "sinks_done": sorted(delivered_to[row.id])} for row in failed]
+        )
+        dead = [row.id for row in failed if row.attempts + 1 >= max_attempts]
+        if dead:
+            columns = ["id", "event_type", "order_id", "payload", "created_at", "attempts", "last_error", "delivered_to"]
+            db.execute(insert(models.OrderOutboxDeadLetter.__table__).from_select(
+                columns, select(*(outbox.c[column] for column in columns)).where(outbox.c.id.in_(dead))
+            ))
+            db.execute(delete(outbox).where(outbox.c.id.in_(dead)))
+            logger.error("Moved %d order events to the dead letters after %d attempts: %s",
+                         len(dead), max_attempts, last_error)
+    db.commit()
+    if error is not None:
+        raise error
+    return len(delivered)
+
+
+def dispatch_events(
+    db: Session,
+    sinks: List[Any],
+    batch_size: int = ORDER_OUTBOX_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    max_attempts: int = ORDER_OUTBOX_MAX_ATTEMPTS
+) -> int:
+    """
+    Deliver batches until the outbox is drained or max_batches were sent.
+
+    With no sinks nothing is sent and the events stay in the table. A
+    failing sink stops the run with its exception. Returns the number of
+    events delivered.
+    """
+    if not sinks:
+        return 0
+    dispatched = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count = dispatch_batch(db, sinks, batch_size, max_attempts)
+        dispatched += count
+        batches += 1
+        if count < batch_size:
+            break
+    return dispatched
+
+
+def prune_events(
+    db: Session,
+    sinks: List[Any],
+    retention_days: int = ORDER_OUTBOX_RETENTION_DAYS,
+    batch_size: int = 1000
+) -> int:
+    """
+    Delete dead letters older than retention_days, and outbox events too when there are no sinks.
+
+    With sinks configured pending events are left to dispatch_events(),
+    which delivers or dead-letters them. Deletes in small batches to keep
+    locks short. Returns the number of rows deleted.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    dead_letters = models.OrderOutboxDeadLetter.__table__
+    targets = [(dead_letters, dead_letters.c.failed_at)]
+    if not sinks:
+        outbox = models.OrderOutboxEvent.__table__
+        targets.append((outbox, outbox.c.created_at))
+
+    deleted = 0
+    for table, timestamp in targets:
+        while True:
+            expired = select(table.c.id).where(timestamp < cutoff).limit(batch_size).scalar_subquery()
+            result = db.execute(delete(table).where(table.c.id.in_(expired)))
+            db.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+    return deleted
@@ -0,0 +1,142 @@
+"""
+Checkout price verification against the product service.
+
+Clients send the name and price of every line item as they saw them, and
+create_order used to store those as they were. verify_order_items() looks
+all products of an order up in one POST /api/v1/products/prices and
+rejects the order when a product is unknown or its name or price differs.
+
+Lookups go through one process-wide keep-alive client, so a checkout
+normally costs a single request on an already open connection. Carts with
+more products than one lookup accepts are looked up in several. Answers
+are cached per product for PRODUCT_PRICE_CACHE_TTL seconds; a price
+change in the catalog is enforced at checkout after at most that long.
+When the product service cannot be reached the order is refused with
+ProductServiceUnavailable rather than accepted unverified.
+
+Verification is off when PRODUCT_SERVICE_URL is not set.
+"""
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from uuid import UUID
+
+import httpx
+
+from . import schemas
+
+PRODUCT_SERVICE_URL = os.getenv("PRODUCT_SERVICE_URL", "")
+PRODUCT_PRICE_CACHE_TTL = float(os.getenv("PRODUCT_PRICE_CACHE_TTL", "5"))
+PRODUCT_PRICE_CACHE_SIZE = 10000
+PRODUCT_SERVICE_TIMEOUT = float(os.getenv("PRODUCT_SERVICE_TIMEOUT", "2"))
+PRODUCT_SERVICE_CONNECT_TIMEOUT = float(os.getenv("PRODUCT_SERVICE_CONNECT_TIMEOUT", "0.5"))
+# ProductPriceLookup.product_ids max_length in the product service
+PRODUCT_PRICE_LOOKUP_BATCH_SIZE = 500
+
+
+class ProductServiceUnavailable(Exception):
+    """The product service did not answer a price lookup"""
+
+
+class ProductPrice(NamedTuple):
+    name: str
+    price: Decimal
+
+
+class PriceCatalog:
+    def __init__(self, base_url: str = PRODUCT_SERVICE_URL, ttl: float = PRODUCT_PRICE_CACHE_TTL):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.client: Optional[httpx.Client] = None
+        # Product id -> (expires_at, price); shared by all requests of this worker
+        self.cache: Dict[UUID, tuple] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.base_url)
+
+    def _client(self) -> httpx.Client:
+        with self.lock:
+            if self.client is None:
+                self.client = httpx.Client(
+                    base_url=self.base_url,
+                    timeout=httpx.Timeout(PRODUCT_SERVICE_TIMEOUT, connect=PRODUCT_SERVICE_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+                )
+            return self.client
+
+    def _fetch(self, product_ids: List[UUID]) -> Dict[UUID, ProductPrice]:
+        try:
+            response = self._client().post(
+                "/api/v1/products/prices",
+                json={"product_ids": [str(product_id) for product_id in product_ids]}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise ProductServiceUnavailable(f"Product price lookup failed: {e}") from e
+        return {
+            UUID(product["id"]): ProductPrice(product["name"], Decimal(str(product["current_price"])))
+            for product in response.json()
+        }
+
+    def lookup(self, product_ids: Iterable[UUID]) -> Dict[UUID, ProductPrice]:
+        """Current name and price of the products, unknown products are left out"""
+        now = time.monotonic()
+        prices = {}
+        missing = []
+        with self.lock:
+            for product_id in dict.fromkeys(product_ids):
+                cached = self.cache.get(product_id)
+                if cached and cached[0] > now:
+                    prices[product_id] = cached[1]
+                else:
+                    missing.append(product_id)
+        if not missing:
+            return prices
+
+        fetched = {}
+        for start in range(0, len(missing), PRODUCT_PRICE_LOOKUP_BATCH_SIZE):
+            fetched.update(self._fetch(missing[start:start + PRODUCT_PRICE_LOOKUP_BATCH_SIZE]))
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            if len(self.cache) + len(fetched) > PRODUCT_PRICE_CACHE_SIZE:
+                self.cache.clear()
+            for product_id, price in fetched.items():
+                self.cache[product_id] = (expires_at, price)
+        prices.update(fetched)
+        return prices
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.cache.clear()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+
+
+catalog = PriceCatalog()
+
+
+def verify_order_items(order_items: List[schemas.OrderItemCreate], price_catalog: PriceCatalog = catalog) -> None:
+    """Raise ValueError when a line item does not match the product catalog"""
+    if not price_catalog.enabled or not order_items:
+        return
+    prices = price_catalog.lookup(item.product_id for item in order_items)
+    for item in order_items:
+        current = prices.get(item.product_id)
+        if current is None:
+            raise ValueError(f"Product {item.product_id} not found")
+        if item.product_snapshot_price != current.price:
+            raise ValueError(
+                f"Price of product {item.product_id} is {current.price}, not {item.product_snapshot_price}"
+            )
+        if item.product_snapshot_name != current.name:
+            raise ValueError(
+                f"Name of product {item.product_id} is {current.name!r}, not {item.product_snapshot_name!r}"
+            )
@@ -0,0 +1,136 @@
+"""
+Process-wide cache of order statuses, delivery methods and payment methods.
+
+Reference rows change maybe once a year but are read on every checkout and
+list request. They are loaded once into an immutable snapshot that is
+swapped atomically on reload, so lookups never touch the database and need
+no locking. The JSON bodies of the reference endpoints are rendered at load
+time together with an ETag derived from their content.
+
+Cached ORM objects are detached. Attach them to a session with
+db.merge(obj, load=False), which does not query, before using them in
+relationships.
+
+Every process holds its own snapshot. reload_everywhere() reloads this one
+and, on Postgres, sends a notification on REFERENCE_DATA_CHANNEL that the
+LISTEN connection of live_feed turns into a reload in every other process.
+"""
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+logger = logging.getLogger(__name__)
+
+
+def _render(schema, rows) -> Tuple[bytes, str]:
+    body = TypeAdapter(List[schema]).dump_json(
+        [schema.model_validate(row) for row in rows]
+    )
+    return body, f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+
+class ReferenceData:
+    """Snapshot of all reference rows with code/id indexes and rendered endpoint bodies"""
+
+    def __init__(
+        self,
+        statuses: List[models.OrderStatus],
+        delivery_methods: List[models.DeliveryMethod],
+        payment_methods: List[models.PaymentMethod],
+    ):
+        self.statuses_by_code = {row.code: row for row in statuses}
+        self.statuses_by_id = {row.id: row for row in statuses}
+        self.delivery_methods_by_code = {row.code: row for row in delivery_methods}
+        self.delivery_methods_by_id = {row.id: row for row in delivery_methods}
+        self.payment_methods_by_code = {row.code: row for row in payment_methods}
+        self.payment_methods_by_id = {row.id: row for row in payment_methods}
+        # Endpoint name -> (JSON body, ETag)
+        self.responses: Dict[str, Tuple[bytes, str]] = {
+            "statuses": _render(schemas.OrderStatusResponse, statuses),
+            "delivery_methods": _render(schemas.DeliveryMethodResponse, delivery_methods),
+            "payment_methods": _render(schemas.PaymentMethodResponse, payment_methods),
+        }
+
+
+REFERENCE_DATA_CHANNEL = "reference_data"
+
+_snapshot: Optional[ReferenceData] = None
+_load_lock = threading.Lock()
+
+
+def load(db: Session) -> ReferenceData:
+    """Read all reference rows through db and replace the cached snapshot."""
+    statuses = db.query(models.OrderStatus).order_by(models.OrderStatus.name).all()
+    delivery_methods = db.query(models.DeliveryMethod).order_by(models.DeliveryMethod.name).all()
+    payment_methods = db.query(models.PaymentMethod).order_by(models.PaymentMethod.name).all()
+    for row in (*statuses, *delivery_methods, *payment_methods):
+        db.expunge(row)
+
+    global _snapshot
+    _snapshot = ReferenceData(statuses, delivery_methods, payment_methods)
+    logger.info("Loaded reference data: %d statuses, %d delivery methods, %d payment methods",
+                len(statuses), len(delivery_methods), len(payment_methods))
+    return _snapshot
+
+
+def get(db: Session) -> ReferenceData:
+    """Return the cached snapshot, loading it through db on first use or after invalidate()."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    with _load_lock:
+        if _snapshot is not None:
+            return _snapshot
+        return load(db)
+
+
+def reload_everywhere(db: Session) -> ReferenceData:
+    """Reload the snapshot here and tell the other service processes to reload theirs."""
+    snapshot = load(db)
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_notify(REFERENCE_DATA_CHANNEL, "reload")))
+        db.commit()
+    return snapshot
+
+
+def invalidate() -> None:
+    """Drop the snapshot, the next lookup reloads it from the database."""
+    global _snapshot
+    _snapshot = None
+
+
+def order_status_by_code(db: Session, code: str) -> Optional[models.OrderStatus]:
+    return get(db).statuses_by_code.get(code)
+
+
+def order_status_by_id(db: Session, status_id: UUID) -> Optional[models.OrderStatus]:
+    return get(db).statuses_by_id.get(status_id)
+
+
+def delivery_method_by_code(db: Session, code: str) -> Optional[models.DeliveryMethod]:
+    return get(db).delivery_methods_by_code.get(code)
+
+
+def delivery_method_by_id(db: Session, method_id: UUID) -> Optional[models.DeliveryMethod]:
+    return get(db).delivery_methods_by_id.get(method_id)
+
+
+def payment_method_by_code(db: Session, code: str) -> Optional[models.PaymentMethod]:
+    return get(db).payment_methods_by_code.get(code)
+
+
+def payment_method_by_id(db: Session, method_id: UUID) -> Optional[models.PaymentMethod]:
+    return get(db).payment_methods_by_id.get(method_id)
+
+
+def response(db: Session, name: str) -> Tuple[bytes, str]:
+    """Return the precomputed (JSON body, ETag) of a reference endpoint."""
+    return get(db).responses[name]
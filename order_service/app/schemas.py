@@ -186,6 +186,26 @@ class OrderStatusUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+class BulkOrderStatusUpdate(BaseModel):
+    order_ids: List[UUID4] = Field(..., min_length=1, max_length=1000)
+    status_id: UUID4
+    actor_details: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class BulkOrderStatusResult(BaseModel):
+    order_id: UUID4
+    # updated, unchanged (already in the status), invalid_transition or not_found
+    outcome: str
+    previous_status: Optional[str] = None  # status code before the request, None when not found
+
+
+class BulkOrderStatusResponse(BaseModel):
+    status: str
+    updated: int
+    results: List[BulkOrderStatusResult]
+
+
 class Order(OrderBase):
     id: UUID4
     order_number: str
@@ -349,6 +369,15 @@ class OrderStatusHistoryResponse(BaseModel):
         from_attributes = True
 
 
+class OrderStatusHistoryBatchRequest(BaseModel):
+    order_ids: List[UUID4] = Field(..., min_length=1, max_length=500)
+
+
+class OrderStatusHistoryBatchItem(BaseModel):
+    order_id: UUID4
+    history: List[OrderStatusHistoryResponse]
+
+
 class OrderResponse(BaseModel):
     id: UUID4
     order_number: str
@@ -397,3 +426,33 @@ class PaginatedOrdersResponse(BaseModel):
     total: int
     skip: int
     limit: int
+    next_cursor: Optional[str] = None  # pass as ?cursor= to fetch the next page, None on the last page
+    total_is_estimate: bool = False
+
+
+class OrderTimeseriesPoint(BaseModel):
+    bucket: datetime  # start of the UTC hour or day
+    group: Optional[str] = None  # status, delivery or payment method code when grouped
+    order_count: int
+    revenue: Decimal
+
+
+class OrderTimeseriesResponse(BaseModel):
+    granularity: str
+    group_by: Optional[str] = None
+    date_from: datetime
+    date_to: datetime
+    points: List[OrderTimeseriesPoint]
+
+
+class TopProduct(BaseModel):
+    product_id: UUID4
+    units: int
+    revenue: Decimal
+    units_per_day: float  # sales velocity over the window
+
+
+class TopProductsResponse(BaseModel):
+    days: int
+    refreshed_at: datetime  # rankings are recomputed on a schedule, not per request
+    products: List[TopProduct]
@@ -0,0 +1,68 @@
+"""
+Process-wide cache of the best selling products over the last 7 and 30 days.
+
+Rankings come from the product_sales_daily rollup and are recomputed by a
+background job every TOP_PRODUCTS_REFRESH_INTERVAL seconds, so requests
+never query the database. Each refresh builds a new immutable snapshot of
+the top TOP_PRODUCTS_MAX_LIMIT products per window and swaps it in
+atomically, like reference_cache; shorter lists are prefixes of it.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+TOP_PRODUCTS_WINDOWS = (7, 30)
+TOP_PRODUCTS_MAX_LIMIT = 100
+TOP_PRODUCTS_REFRESH_INTERVAL = float(os.getenv("TOP_PRODUCTS_REFRESH_INTERVAL", "300"))
+
+
+class TopProducts:
+    """Ranked best sellers per window as of refreshed_at"""
+
+    def __init__(self, refreshed_at: datetime, rankings: Dict[int, List[Dict]]):
+        self.refreshed_at = refreshed_at
+        self.rankings = rankings
+
+
+_snapshot: Optional[TopProducts] = None
+_load_lock = threading.Lock()
+
+
+def refresh(db: Session) -> TopProducts:
+    """Recompute every window through db and replace the cached snapshot."""
+    refreshed_at = datetime.now(timezone.utc)
+    rankings = {
+        days: crud.get_top_products(db, days, TOP_PRODUCTS_MAX_LIMIT, now=refreshed_at)
+        for days in TOP_PRODUCTS_WINDOWS
+    }
+
+    global _snapshot
+    _snapshot = TopProducts(refreshed_at, rankings)
+    logger.debug("Refreshed top products: %s",
+                 ", ".join(f"{days}d {len(products)}" for days, products in rankings.items()))
+    return _snapshot
+
+
+def get(db: Session) -> TopProducts:
+    """Return the cached snapshot, computing it through db on first use or after invalidate()."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    with _load_lock:
+        if _snapshot is not None:
+            return _snapshot
+        return refresh(db)
+
+
+def invalidate() -> None:
+    """Drop the snapshot, the next request recomputes it from the database."""
+    global _snapshot
+    _snapshot = None
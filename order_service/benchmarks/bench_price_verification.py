@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Checkout latency added by price verification for 20-item carts.
+
+Times product_prices.verify_order_items(), which is all create_order adds,
+with the price cache cold (one batched lookup per checkout, as after every
+PRODUCT_PRICE_CACHE_TTL) and warm, next to one lookup per item for
+comparison. Fails when the cold p99 is not below BENCH_P99_BUDGET_MS.
+
+With PRODUCT_SERVICE_URL set, the first CART_SIZE products of that product
+service are used. Otherwise an in-process stub serves the lookups, which
+measures the client side: connection reuse, JSON and the comparison.
+
+    PRODUCT_SERVICE_URL=http://localhost:8000 python benchmarks/bench_price_verification.py
+"""
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+
+from app import product_prices, schemas
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "2000"))
+CART_SIZE = int(os.getenv("BENCH_CART_SIZE", "20"))
+P99_BUDGET_MS = float(os.getenv("BENCH_P99_BUDGET_MS", "5"))
+
+
+class StubProductService(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, Nagle would hold the body for a delayed ACK
+    disable_nagle_algorithm = True
+    products = {}
+
+    def do_POST(self):
+        lookup = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        body = json.dumps([
+            self.products[product_id] for product_id in lookup["product_ids"] if product_id in self.products
+        ]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    StubProductService.products = {
+        str(product_id): {"id": str(product_id), "name": f"Лампа-лофт {i}", "current_price": "3460.00", "version": 1}
+        for i, product_id in enumerate(uuid.uuid4() for _ in range(CART_SIZE))
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubProductService)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", list(StubProductService.products.values())
+
+
+def cart(products):
+    return [
+        schemas.OrderItemCreate(
+            product_id=product["id"],
+            product_snapshot_name=product["name"],
+            product_snapshot_price=Decimal(str(product["current_price"])),
+            quantity=1,
+        )
+        for product in products
+    ]
+
+
+def run(label, call):
+    call()
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(f"{label:<28} p50 {statistics.median(timings) * 1000:6.3f} ms  p99 {p99:6.3f} ms")
+    return p99
+
+
+def main():
+    base_url = product_prices.PRODUCT_SERVICE_URL
+    if base_url:
+        products = httpx.get(f"{base_url}/api/v1/products/", params={"limit": CART_SIZE}).json()
+    else:
+        base_url, products = start_stub()
+    items = cart(products)
+    catalog = product_prices.PriceCatalog(base_url)
+
+    def cold():
+        catalog.invalidate()
+        product_prices.verify_order_items(items, catalog)
+
+    def per_item():
+        for item in items:
+            catalog._fetch([item.product_id])
+
+    print(f"{len(items)}-item carts against {base_url}, {ITERATIONS} checkouts per run")
+    cold_p99 = run("batched lookup, cold cache", cold)
+    run("batched lookup, warm cache", lambda: product_prices.verify_order_items(items, catalog))
+    run("one lookup per item", per_item)
+    catalog.close()
+
+    if cold_p99 >= P99_BUDGET_MS:
+        sys.exit(f"cold p99 {cold_p99:.3f} ms is over the {P99_BUDGET_MS} ms budget")
+
+
+if __name__ == "__main__":
+    main()
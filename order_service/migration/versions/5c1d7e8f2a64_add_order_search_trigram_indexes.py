@@ -0,0 +1,39 @@
+"""add pg_trgm GIN indexes for order search
+
+Revision ID: 5c1d7e8f2a64
+Revises: 7a4e9c2b1f30
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1d7e8f2a64'
+down_revision: Union[str, None] = '7a4e9c2b1f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = {
+    'idx_order_number_trgm': 'order_number',
+    'idx_order_customer_name_trgm': 'customer_name',
+    'idx_order_customer_email_trgm': 'customer_email',
+}
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for index_name, column in SEARCH_COLUMNS.items():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+                f"ON orders USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name in SEARCH_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
@@ -0,0 +1,41 @@
+"""add composite indexes for keyset pagination of orders
+
+Revision ID: 7a4e9c2b1f30
+Revises: d2162535f210
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4e9c2b1f30'
+down_revision: Union[str, None] = 'd2162535f210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps orders writable while the indexes build, it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_status_created "
+            "ON orders (status_id, created_at DESC, id)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_created "
+            "ON orders (created_at DESC, id)"
+        )
+        # Both are prefixes of the new indexes; idx_order_status only exists on create_all databases
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_orders_created_at")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_order_status")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_created_at ON orders (created_at)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_status ON orders (status_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_order_created")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_order_status_created")
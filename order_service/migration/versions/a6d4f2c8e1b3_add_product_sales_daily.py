@@ -0,0 +1,114 @@
+"""add trigger-maintained product_sales_daily for best seller rankings
+
+Revision ID: a6d4f2c8e1b3
+Revises: e3a7c5b9d1f2
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d4f2c8e1b3'
+down_revision: Union[str, None] = 'e3a7c5b9d1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARDS = 8
+# order_items.product_id is varchar(100) in the migrated schema, checkout only accepts UUIDs
+ARCHIVING_UNSET = "current_setting('order_service.archiving', true) IS DISTINCT FROM 'on'"
+
+UPSERT = f"""
+    INSERT INTO product_sales_daily AS s (day, product_id, shard, units, revenue)
+    SELECT (c.created_at AT TIME ZONE 'UTC')::date, c.product_id, mod(pg_backend_pid(), {SHARDS}),
+           sum(c.sign * c.quantity), sum(c.sign * c.subtotal_amount)
+    FROM changes c
+    GROUP BY 1, 2, 3 ORDER BY 1, 2
+    ON CONFLICT (day, product_id, shard)
+    DO UPDATE SET units = s.units + EXCLUDED.units,
+                  revenue = s.revenue + EXCLUDED.revenue;"""
+
+
+def upgrade() -> None:
+    op.create_table('product_sales_daily',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('units', sa.BigInteger(), nullable=False),
+        sa.Column('revenue', sa.DECIMAL(precision=16, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_product_sales_daily', 'product_sales_daily', ['day', 'product_id', 'shard'], unique=True)
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION product_sales_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            cancelled_id uuid := (SELECT id FROM order_statuses WHERE code = 'CANCELLED');
+        BEGIN
+            IF TG_TABLE_NAME = 'orders' THEN
+                WITH flipped AS (
+                    SELECT n.id, n.created_at, CASE WHEN n.status_id = cancelled_id THEN -1 ELSE 1 END AS sign
+                    FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE (n.status_id = cancelled_id) IS DISTINCT FROM (o.status_id = cancelled_id)
+                ), changes AS (
+                    SELECT f.created_at, i.product_id::uuid, i.quantity, i.subtotal_amount, f.sign
+                    FROM flipped f JOIN order_items i ON i.order_id = f.id
+                ){UPSERT}
+            ELSIF TG_OP = 'INSERT' THEN
+                WITH changes AS (
+                    SELECT o.created_at, i.product_id::uuid, i.quantity, i.subtotal_amount, 1 AS sign
+                    FROM new_rows i JOIN orders o ON o.id = i.order_id
+                    WHERE o.status_id IS DISTINCT FROM cancelled_id
+                ){UPSERT}
+            ELSE
+                WITH changes AS (
+                    SELECT o.created_at, i.product_id::uuid, i.quantity, i.subtotal_amount, -1 AS sign
+                    FROM old_rows i JOIN orders o ON o.id = i.order_id
+                    WHERE o.status_id IS DISTINCT FROM cancelled_id
+                ){UPSERT}
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+    """)
+
+    # Block order and order line writes between the backfill and the triggers going live
+    op.execute("LOCK TABLE orders, order_items IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        INSERT INTO product_sales_daily (day, product_id, shard, units, revenue)
+        SELECT (o.created_at AT TIME ZONE 'UTC')::date, i.product_id::uuid, 0, sum(i.quantity), sum(i.subtotal_amount)
+        FROM order_items i JOIN orders o ON o.id = i.order_id
+        WHERE o.status_id IS DISTINCT FROM (SELECT id FROM order_statuses WHERE code = 'CANCELLED')
+        GROUP BY 1, 2
+    """)
+    op.execute(
+        "CREATE TRIGGER order_items_product_sales_insert AFTER INSERT ON order_items "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION product_sales_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER order_items_product_sales_delete AFTER DELETE ON order_items "
+        "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT "
+        f"WHEN ({ARCHIVING_UNSET}) "
+        "EXECUTE FUNCTION product_sales_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER orders_product_sales_update AFTER UPDATE ON orders "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION product_sales_apply()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS orders_product_sales_update ON orders")
+    op.execute("DROP TRIGGER IF EXISTS order_items_product_sales_delete ON order_items")
+    op.execute("DROP TRIGGER IF EXISTS order_items_product_sales_insert ON order_items")
+    op.execute("DROP FUNCTION IF EXISTS product_sales_apply()")
+    op.drop_index('uq_product_sales_daily', table_name='product_sales_daily')
+    op.drop_table('product_sales_daily')
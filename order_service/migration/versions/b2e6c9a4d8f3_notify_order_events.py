@@ -0,0 +1,42 @@
+"""notify order_events listeners of new order_outbox rows
+
+Revision ID: b2e6c9a4d8f3
+Revises: a8d3f5c1e7b4
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e6c9a4d8f3'
+down_revision: Union[str, None] = 'a8d3f5c1e7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION order_outbox_notify() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('order_events', json_build_object(
+                'id', id, 'type', event_type, 'order_id', order_id, 'created_at', created_at, 'payload', payload
+            )::text)
+            FROM (SELECT * FROM new_rows ORDER BY id) AS events;
+            RETURN NULL;
+        END;
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER order_outbox_notify AFTER INSERT ON order_outbox
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION order_outbox_notify()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS order_outbox_notify ON order_outbox")
+    op.execute("DROP FUNCTION IF EXISTS order_outbox_notify()")
@@ -0,0 +1,95 @@
+"""add trigger-maintained order_status_counters
+
+Revision ID: b7f2a9d3e8c1
+Revises: 9e3b6d4a7c15
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f2a9d3e8c1'
+down_revision: Union[str, None] = '9e3b6d4a7c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARDS = 8
+
+
+def upgrade() -> None:
+    op.create_table('order_status_counters',
+        sa.Column('status_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('order_count', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['status_id'], ['order_statuses.id'], ),
+        sa.PrimaryKeyConstraint('status_id', 'shard')
+    )
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION order_status_counters_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO order_status_counters AS c (status_id, shard, order_count)
+                SELECT status_id, mod(pg_backend_pid(), {SHARDS}), count(*)
+                FROM new_rows GROUP BY status_id ORDER BY status_id
+                ON CONFLICT (status_id, shard) DO UPDATE SET order_count = c.order_count + EXCLUDED.order_count;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO order_status_counters AS c (status_id, shard, order_count)
+                SELECT status_id, mod(pg_backend_pid(), {SHARDS}), -count(*)
+                FROM old_rows GROUP BY status_id ORDER BY status_id
+                ON CONFLICT (status_id, shard) DO UPDATE SET order_count = c.order_count + EXCLUDED.order_count;
+            ELSE
+                INSERT INTO order_status_counters AS c (status_id, shard, order_count)
+                SELECT status_id, mod(pg_backend_pid(), {SHARDS}), sum(delta)
+                FROM (
+                    SELECT n.status_id, 1 AS delta
+                    FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE n.status_id IS DISTINCT FROM o.status_id
+                    UNION ALL
+                    SELECT o.status_id, -1 AS delta
+                    FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE n.status_id IS DISTINCT FROM o.status_id
+                ) changes
+                GROUP BY status_id ORDER BY status_id
+                ON CONFLICT (status_id, shard) DO UPDATE SET order_count = c.order_count + EXCLUDED.order_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+    """)
+
+    # Block order writes between the backfill and the triggers going live
+    op.execute("LOCK TABLE orders IN SHARE ROW EXCLUSIVE MODE")
+    op.execute(
+        "INSERT INTO order_status_counters (status_id, shard, order_count) "
+        "SELECT status_id, 0, count(*) FROM orders GROUP BY status_id"
+    )
+    op.execute(
+        "CREATE TRIGGER orders_status_counters_insert AFTER INSERT ON orders "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION order_status_counters_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER orders_status_counters_update AFTER UPDATE ON orders "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION order_status_counters_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER orders_status_counters_delete AFTER DELETE ON orders "
+        "REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION order_status_counters_apply()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS orders_status_counters_delete ON orders")
+    op.execute("DROP TRIGGER IF EXISTS orders_status_counters_update ON orders")
+    op.execute("DROP TRIGGER IF EXISTS orders_status_counters_insert ON orders")
+    op.execute("DROP FUNCTION IF EXISTS order_status_counters_apply()")
+    op.drop_table('order_status_counters')
@@ -0,0 +1,61 @@
+"""keep order_number unique across the orders partitions with order_numbers
+
+Revision ID: b8e1f4a9c2d7
+Revises: a6d4f2c8e1b3
+Create Date: 2026-10-20 10:00:00.000000
+
+Partitioned orders can only enforce order_number per monthly partition.
+order_numbers holds every number issued, archived orders included, and a
+statement-level AFTER INSERT trigger on orders adds the new ones, so a
+duplicate number fails the insert on its primary key. Archiving deletes
+orders but keeps their numbers taken.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e1f4a9c2d7'
+down_revision: Union[str, None] = 'a6d4f2c8e1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_numbers',
+        sa.Column('order_number', sa.String(length=100), nullable=False),
+        sa.Column('order_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.PrimaryKeyConstraint('order_number')
+    )
+    op.execute("""
+        CREATE OR REPLACE FUNCTION order_numbers_claim() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO order_numbers (order_number, order_id)
+            SELECT order_number, id FROM new_rows;
+            RETURN NULL;
+        END;
+        $$
+    """)
+    # Created before the backfill, its lock on orders keeps new orders out until commit
+    op.execute(
+        "CREATE TRIGGER orders_order_numbers_insert AFTER INSERT ON orders "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION order_numbers_claim()"
+    )
+    # Fails on numbers already duplicated across partitions, those need fixing by hand first
+    op.execute("""
+        INSERT INTO order_numbers (order_number, order_id)
+        SELECT order_number, id FROM orders
+        UNION ALL
+        SELECT order_number, order_id FROM archived_orders
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS orders_order_numbers_insert ON orders")
+    op.execute("DROP FUNCTION IF EXISTS order_numbers_claim()")
+    op.drop_table('order_numbers')
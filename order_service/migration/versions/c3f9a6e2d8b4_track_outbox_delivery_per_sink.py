@@ -0,0 +1,42 @@
+"""track order_outbox delivery per sink and dead-letter undeliverable events
+
+Revision ID: c3f9a6e2d8b4
+Revises: b8e1f4a9c2d7
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f9a6e2d8b4'
+down_revision: Union[str, None] = 'b8e1f4a9c2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('order_outbox', sa.Column(
+        'delivered_to', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'"), nullable=False
+    ))
+    op.create_table('order_outbox_dead_letters',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('order_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('delivered_to', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('failed_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_outbox_dead_letters')
+    op.drop_column('order_outbox', 'delivered_to')
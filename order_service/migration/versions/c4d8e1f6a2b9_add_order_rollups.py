@@ -0,0 +1,131 @@
+"""add trigger-maintained order_rollups for time-series analytics
+
+Revision ID: c4d8e1f6a2b9
+Revises: b7f2a9d3e8c1
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e1f6a2b9'
+down_revision: Union[str, None] = 'b7f2a9d3e8c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARDS = 8
+
+UPSERT = f"""
+    INSERT INTO order_rollups AS r
+        (granularity, bucket, status_id, delivery_method_id, payment_method_id, shard, order_count, revenue)
+    SELECT g.granularity, date_trunc(g.granularity, c.created_at, 'UTC'),
+           c.status_id, c.delivery_method_id, c.payment_method_id,
+           mod(pg_backend_pid(), {SHARDS}), sum(c.sign), sum(c.sign * c.total_amount)
+    FROM changes c CROSS JOIN (VALUES ('hour'), ('day')) AS g (granularity)
+    GROUP BY 1, 2, 3, 4, 5, 6 ORDER BY 1, 2, 3, 4, 5
+    ON CONFLICT (granularity, bucket, status_id, delivery_method_id, payment_method_id, shard)
+    DO UPDATE SET order_count = r.order_count + EXCLUDED.order_count,
+                  revenue = r.revenue + EXCLUDED.revenue;"""
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('payment_method_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key('orders_payment_method_id_fkey', 'orders', 'payment_methods', ['payment_method_id'], ['id'])
+    op.execute(
+        "UPDATE orders o SET payment_method_id = p.payment_method_id "
+        "FROM payment_details p WHERE p.order_id = o.id"
+    )
+
+    op.create_table('order_rollups',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('status_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('delivery_method_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('payment_method_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('order_count', sa.BigInteger(), nullable=False),
+        sa.Column('revenue', sa.DECIMAL(precision=16, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['status_id'], ['order_statuses.id'], ),
+        sa.ForeignKeyConstraint(['delivery_method_id'], ['delivery_methods.id'], ),
+        sa.ForeignKeyConstraint(['payment_method_id'], ['payment_methods.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_order_rollup_group', 'order_rollups',
+                    ['granularity', 'bucket', 'status_id', 'delivery_method_id', 'payment_method_id', 'shard'],
+                    unique=True, postgresql_nulls_not_distinct=True)
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION order_rollups_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                WITH changes AS (
+                    SELECT created_at, status_id, delivery_method_id, payment_method_id, total_amount, 1 AS sign
+                    FROM new_rows
+                ){UPSERT}
+            ELSIF TG_OP = 'DELETE' THEN
+                WITH changes AS (
+                    SELECT created_at, status_id, delivery_method_id, payment_method_id, total_amount, -1 AS sign
+                    FROM old_rows
+                ){UPSERT}
+            ELSE
+                WITH moved AS (
+                    SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE (n.created_at, n.status_id, n.delivery_method_id, n.payment_method_id, n.total_amount)
+                          IS DISTINCT FROM
+                          (o.created_at, o.status_id, o.delivery_method_id, o.payment_method_id, o.total_amount)
+                ), changes AS (
+                    SELECT created_at, status_id, delivery_method_id, payment_method_id, total_amount, 1 AS sign
+                    FROM new_rows WHERE id IN (SELECT id FROM moved)
+                    UNION ALL
+                    SELECT created_at, status_id, delivery_method_id, payment_method_id, total_amount, -1 AS sign
+                    FROM old_rows WHERE id IN (SELECT id FROM moved)
+                ){UPSERT}
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+    """)
+
+    # Block order writes between the backfill and the triggers going live
+    op.execute("LOCK TABLE orders IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        INSERT INTO order_rollups
+            (granularity, bucket, status_id, delivery_method_id, payment_method_id, shard, order_count, revenue)
+        SELECT g.granularity, date_trunc(g.granularity, o.created_at, 'UTC'),
+               o.status_id, o.delivery_method_id, o.payment_method_id, 0, count(*), sum(o.total_amount)
+        FROM orders o CROSS JOIN (VALUES ('hour'), ('day')) AS g (granularity)
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+    op.execute(
+        "CREATE TRIGGER orders_rollups_insert AFTER INSERT ON orders "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION order_rollups_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER orders_rollups_update AFTER UPDATE ON orders "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION order_rollups_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER orders_rollups_delete AFTER DELETE ON orders "
+        "REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION order_rollups_apply()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS orders_rollups_delete ON orders")
+    op.execute("DROP TRIGGER IF EXISTS orders_rollups_update ON orders")
+    op.execute("DROP TRIGGER IF EXISTS orders_rollups_insert ON orders")
+    op.execute("DROP FUNCTION IF EXISTS order_rollups_apply()")
+    op.drop_index('uq_order_rollup_group', table_name='order_rollups')
+    op.drop_table('order_rollups')
+    op.drop_constraint('orders_payment_method_id_fkey', 'orders', type_='foreignkey')
+    op.drop_column('orders', 'payment_method_id')
@@ -0,0 +1,38 @@
+"""add (order_id, changed_at) index for order status history
+
+Revision ID: c7f1a2d9e4b6
+Revises: b2e6c9a4d8f3
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f1a2d9e4b6'
+down_revision: Union[str, None] = 'b2e6c9a4d8f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps history writable while the index builds, it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_status_history_order_changed "
+            "ON order_status_history (order_id, changed_at)"
+        )
+        # Prefix of the new index; idx_status_history_order only exists on create_all databases
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_order_status_history_order_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_status_history_order")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_order_status_history_order_id "
+            "ON order_status_history (order_id)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_status_history_order_changed")
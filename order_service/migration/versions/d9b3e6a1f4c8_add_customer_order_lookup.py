@@ -0,0 +1,66 @@
+"""add normalized customer contact columns and covering lookup indexes
+
+Revision ID: d9b3e6a1f4c8
+Revises: c7f1a2d9e4b6
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b3e6a1f4c8'
+down_revision: Union[str, None] = 'c7f1a2d9e4b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same normalization as models.normalize_customer_email / normalize_customer_phone.
+# customer_email is nullable in the initial migration, such orders get an empty key.
+NORMALIZED_EMAIL = "lower(btrim(coalesce(customer_email, '')))"
+NORMALIZED_PHONE = r"regexp_replace(regexp_replace(customer_phone, '\D', '', 'g'), '^8(\d{10})$', '7\1')"
+
+SUMMARY_INCLUDE = "INCLUDE (order_number, customer_name, customer_email, total_amount, currency, status_id, updated_at)"
+LOOKUP_INDEXES = {
+    "idx_order_customer_email_lookup": f"(customer_email_normalized, created_at DESC, id) {SUMMARY_INCLUDE}",
+    "idx_order_customer_phone_lookup": f"(customer_phone_normalized, created_at DESC, id) {SUMMARY_INCLUDE}",
+}
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('customer_phone_normalized', sa.String(length=50), nullable=True))
+    op.add_column('orders', sa.Column('customer_email_normalized', sa.String(length=255), nullable=True))
+    op.execute(
+        f"UPDATE orders SET customer_email_normalized = {NORMALIZED_EMAIL}, "
+        f"customer_phone_normalized = {NORMALIZED_PHONE}"
+    )
+    op.alter_column('orders', 'customer_phone_normalized', nullable=False)
+    op.alter_column('orders', 'customer_email_normalized', nullable=False)
+
+    # A partitioned index cannot be built CONCURRENTLY. It is created on the parent only,
+    # invalid and empty, then each partition builds its own index concurrently and attaches
+    # it; the parent index becomes valid once every partition has one.
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        partitions = bind.execute(sa.text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'orders'::regclass ORDER BY c.relname"
+        )).scalars().all()
+        for index_name, definition in LOOKUP_INDEXES.items():
+            op.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON ONLY orders {definition}")
+            for partition in partitions:
+                partition_index = f"{partition}_{index_name[len('idx_order_'):]}"
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} {definition}")
+                op.execute(f"ALTER INDEX {index_name} ATTACH PARTITION {partition_index}")
+        # Nothing looks orders up by the raw email any more, search uses the trigram index
+        op.execute("DROP INDEX IF EXISTS ix_orders_customer_email")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_customer_email ON orders (customer_email)")
+    for index_name in LOOKUP_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
+    op.drop_column('orders', 'customer_email_normalized')
+    op.drop_column('orders', 'customer_phone_normalized')
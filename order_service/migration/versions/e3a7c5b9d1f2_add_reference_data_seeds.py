@@ -0,0 +1,30 @@
+"""add reference_data_seeds table for versioned reference data seeding
+
+Revision ID: e3a7c5b9d1f2
+Revises: d9b3e6a1f4c8
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c5b9d1f2'
+down_revision: Union[str, None] = 'd9b3e6a1f4c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reference_data_seeds',
+        sa.Column('version', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('applied_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('version')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reference_data_seeds')
@@ -0,0 +1,165 @@
+"""partition orders by month of created_at
+
+Revision ID: e5b2c8d4f1a7
+Revises: c4d8e1f6a2b9
+Create Date: 2026-10-19 17:00:00.000000
+
+Rebuilds orders as a table partitioned by RANGE (created_at) with one
+partition per UTC month. The table is locked and copied, so run it in a
+maintenance window. Partitions from the oldest order through three months
+ahead are created here, the service creates later ones on a schedule with
+create_order_partitions().
+
+The partition key must be part of every unique constraint: the primary
+key becomes (id, created_at), order_number is only unique per partition
+(migration b8e1f4a9c2d7 adds order_numbers to keep it unique across them),
+and the foreign keys from order_items, payment_details, order_status_history
+and idempotency_keys to orders are dropped. Migration f6c2b8d1e9a3 adds them
+back on (id, created_at), except the one from idempotency_keys. Orders with
+a NULL created_at, possible in databases first built with create_all, take
+their updated_at.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2c8d4f1a7'
+down_revision: Union[str, None] = 'c4d8e1f6a2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# Columns of orders at this revision, copied by name
+ORDER_COLUMNS = [
+    'id', 'order_number', 'user_id', 'status_id', 'total_amount', 'currency',
+    'customer_name', 'customer_phone', 'customer_email', 'delivery_method_id',
+    'shipping_address_id', 'customer_notes', 'created_at', 'updated_at', 'payment_method_id',
+]
+# The partition key, no partition takes NULL
+CREATED_AT = "coalesce(created_at, updated_at, CURRENT_TIMESTAMP)"
+
+REFERENCING_FOREIGN_KEYS = [
+    ('order_items', 'order_items_order_id_fkey', 'ON DELETE CASCADE'),
+    ('payment_details', 'payment_details_order_id_fkey', 'ON DELETE CASCADE'),
+    ('order_status_history', 'order_status_history_order_id_fkey', 'ON DELETE CASCADE'),
+    ('idempotency_keys', 'idempotency_keys_order_id_fkey', 'ON DELETE SET NULL'),
+]
+
+ORDER_FOREIGN_KEYS = [
+    "ALTER TABLE orders ADD CONSTRAINT orders_status_id_fkey "
+    "FOREIGN KEY (status_id) REFERENCES order_statuses (id)",
+    "ALTER TABLE orders ADD CONSTRAINT orders_delivery_method_id_fkey "
+    "FOREIGN KEY (delivery_method_id) REFERENCES delivery_methods (id)",
+    "ALTER TABLE orders ADD CONSTRAINT orders_payment_method_id_fkey "
+    "FOREIGN KEY (payment_method_id) REFERENCES payment_methods (id)",
+    "ALTER TABLE orders ADD CONSTRAINT orders_shipping_address_id_fkey "
+    "FOREIGN KEY (shipping_address_id) REFERENCES shipping_addresses (id)",
+]
+
+ORDER_INDEXES = [
+    "CREATE INDEX idx_order_status_created ON orders (status_id, created_at DESC, id)",
+    "CREATE INDEX idx_order_created ON orders (created_at DESC, id)",
+    "CREATE INDEX ix_orders_order_number ON orders (order_number)",
+    "CREATE INDEX ix_orders_customer_email ON orders (customer_email)",
+    "CREATE INDEX idx_order_number_trgm ON orders USING gin (order_number gin_trgm_ops)",
+    "CREATE INDEX idx_order_customer_name_trgm ON orders USING gin (customer_name gin_trgm_ops)",
+    "CREATE INDEX idx_order_customer_email_trgm ON orders USING gin (customer_email gin_trgm_ops)",
+]
+
+ORDER_TRIGGERS = [
+    "CREATE TRIGGER orders_status_counters_insert AFTER INSERT ON orders "
+    "REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION order_status_counters_apply()",
+    "CREATE TRIGGER orders_status_counters_update AFTER UPDATE ON orders "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION order_status_counters_apply()",
+    "CREATE TRIGGER orders_status_counters_delete AFTER DELETE ON orders "
+    "REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION order_status_counters_apply()",
+    "CREATE TRIGGER orders_rollups_insert AFTER INSERT ON orders "
+    "REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION order_rollups_apply()",
+    "CREATE TRIGGER orders_rollups_update AFTER UPDATE ON orders "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION order_rollups_apply()",
+    "CREATE TRIGGER orders_rollups_delete AFTER DELETE ON orders "
+    "REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION order_rollups_apply()",
+]
+
+
+def _swap_orders_table(partition_by: str) -> None:
+    """Copy orders into a new table created with partition_by and swap it in, without the triggers"""
+    op.execute("LOCK TABLE orders IN ACCESS EXCLUSIVE MODE")
+    for table, constraint, _ in REFERENCING_FOREIGN_KEYS:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}")
+    op.execute("ALTER TABLE orders RENAME TO orders_old")
+    op.execute(f"CREATE TABLE orders (LIKE orders_old INCLUDING DEFAULTS) {partition_by}")
+
+
+def _finish_orders_table(primary_key: str) -> None:
+    """Copy the rows over, drop the old table and rebuild keys, indexes and triggers"""
+    source = [CREATED_AT if column == 'created_at' else column for column in ORDER_COLUMNS]
+    op.execute(f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}) SELECT {', '.join(source)} FROM orders_old")
+    # Takes the old table's triggers, indexes and constraints with it, freeing their names
+    op.execute("DROP TABLE orders_old")
+    op.execute(f"ALTER TABLE orders ADD PRIMARY KEY ({primary_key})")
+    for statement in ORDER_FOREIGN_KEYS + ORDER_INDEXES + ORDER_TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION create_order_partitions(first_month date, last_month date) RETURNS integer
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            month date := date_trunc('month', first_month)::date;
+            partition_name text;
+            created integer := 0;
+        BEGIN
+            -- Serialize concurrent callers, every service instance runs this on a schedule
+            PERFORM pg_advisory_xact_lock(hashtext('create_order_partitions'));
+            WHILE month <= last_month LOOP
+                partition_name := 'orders_' || to_char(month, 'YYYY_MM');
+                IF to_regclass(partition_name) IS NULL THEN
+                    EXECUTE 'CREATE TABLE ' || quote_ident(partition_name) || ' PARTITION OF orders FOR VALUES FROM ('
+                        || quote_literal(to_char(month, 'YYYY-MM-DD') || ' 00:00:00+00') || ') TO ('
+                        || quote_literal(to_char(month + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00') || ')';
+                    -- Unique within the partition only, order_numbers keeps it unique across them
+                    EXECUTE 'CREATE UNIQUE INDEX ' || quote_ident(partition_name || '_order_number_key')
+                        || ' ON ' || quote_ident(partition_name) || ' (order_number)';
+                    created := created + 1;
+                END IF;
+                month := (month + interval '1 month')::date;
+            END LOOP;
+            RETURN created;
+        END;
+        $$
+    """)
+
+    _swap_orders_table("PARTITION BY RANGE (created_at)")
+    op.execute(f"""
+        SELECT create_order_partitions(
+            coalesce((SELECT min({CREATED_AT}) FROM orders_old)::date, current_date),
+            greatest(
+                (SELECT max({CREATED_AT}) FROM orders_old)::date,
+                (current_date + interval '{MONTHS_AHEAD} months')::date
+            )
+        )
+    """)
+    _finish_orders_table("id, created_at")
+
+
+def downgrade() -> None:
+    _swap_orders_table("")
+    _finish_orders_table("id")
+    op.execute("ALTER TABLE orders ADD CONSTRAINT orders_order_number_key UNIQUE (order_number)")
+    for table, constraint, on_delete in REFERENCING_FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+            f"FOREIGN KEY (order_id) REFERENCES orders (id) {on_delete}"
+        )
+    op.execute("DROP FUNCTION IF EXISTS create_order_partitions(date, date)")
@@ -0,0 +1,65 @@
+"""add archived_orders index for the cold order archive
+
+Revision ID: f1c7a3e9b5d2
+Revises: e5b2c8d4f1a7
+Create Date: 2026-10-19 18:00:00.000000
+
+Also recreates the DELETE triggers of the status counters and rollups so
+they skip deletes made by the archive job, archived orders keep counting.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c7a3e9b5d2'
+down_revision: Union[str, None] = 'e5b2c8d4f1a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DELETE_TRIGGERS = {
+    'orders_status_counters_delete': 'order_status_counters_apply',
+    'orders_rollups_delete': 'order_rollups_apply',
+}
+
+
+def _create_delete_triggers(when: str) -> None:
+    for trigger, function in DELETE_TRIGGERS.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON orders")
+        op.execute(
+            f"CREATE TRIGGER {trigger} AFTER DELETE ON orders "
+            f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT {when}"
+            f"EXECUTE FUNCTION {function}()"
+        )
+
+
+def upgrade() -> None:
+    op.create_table('archived_orders',
+        sa.Column('order_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('order_number', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('status_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('delivery_method_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('payment_method_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('total_amount', sa.DECIMAL(precision=12, scale=2), nullable=False),
+        sa.Column('segment', sa.String(length=255), nullable=False),
+        sa.Column('block_offset', sa.BigInteger(), nullable=False),
+        sa.Column('block_length', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['status_id'], ['order_statuses.id'], ),
+        sa.ForeignKeyConstraint(['delivery_method_id'], ['delivery_methods.id'], ),
+        sa.ForeignKeyConstraint(['payment_method_id'], ['payment_methods.id'], ),
+        sa.PrimaryKeyConstraint('order_id')
+    )
+    op.create_index('idx_archived_order_number', 'archived_orders', ['order_number'], unique=False)
+
+    _create_delete_triggers("WHEN (current_setting('order_service.archiving', true) IS DISTINCT FROM 'on') ")
+
+
+def downgrade() -> None:
+    _create_delete_triggers("")
+    op.drop_index('idx_archived_order_number', table_name='archived_orders')
+    op.drop_table('archived_orders')
@@ -0,0 +1,58 @@
+"""restore the foreign keys to partitioned orders on (id, created_at)
+
+Revision ID: f6c2b8d1e9a3
+Revises: c3f9a6e2d8b4
+Create Date: 2026-10-20 12:00:00.000000
+
+Partitioning orders (e5b2c8d4f1a7) dropped the foreign keys to it, since
+its key became (id, created_at). order_items, payment_details and
+order_status_history get an order_created_at column, filled from their
+order, and a composite foreign key with ON DELETE CASCADE again. Rows whose
+order was deleted while there was no foreign key are deleted first, the
+constraint could not be added with them. A child written in its order's
+transaction defaults order_created_at to CURRENT_TIMESTAMP, the value the
+order's created_at gets. idempotency_keys keeps a bare order_id: it only
+caches a response and expires.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c2b8d1e9a3'
+down_revision: Union[str, None] = 'c3f9a6e2d8b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHILD_TABLES = ['order_items', 'payment_details', 'order_status_history']
+
+
+def upgrade() -> None:
+    # Keeps new orders and children out until the keys are in place
+    op.execute("LOCK TABLE orders, order_items, payment_details, order_status_history IN SHARE MODE")
+    # The migrations create orders.created_at without a time zone, create_all with one,
+    # and the referencing column has to match whichever the database has
+    created_at_type = op.get_bind().exec_driver_sql(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = 'orders'::regclass AND attname = 'created_at'"
+    ).scalar()
+    for table in CHILD_TABLES:
+        op.execute(f"ALTER TABLE {table} ADD COLUMN order_created_at {created_at_type}")
+        op.execute(
+            f"UPDATE {table} SET order_created_at = orders.created_at "
+            f"FROM orders WHERE orders.id = {table}.order_id"
+        )
+        op.execute(f"DELETE FROM {table} WHERE order_created_at IS NULL")
+        op.alter_column(table, 'order_created_at', nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+        op.create_foreign_key(
+            f'{table}_order_id_fkey', table, 'orders',
+            ['order_id', 'order_created_at'], ['id', 'created_at'], ondelete='CASCADE'
+        )
+
+
+def downgrade() -> None:
+    for table in CHILD_TABLES:
+        op.drop_constraint(f'{table}_order_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'order_created_at')
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Move old delivered and cancelled orders to the cold archive.
+
+The service also does this every ORDER_ARCHIVE_INTERVAL seconds. Segment
+files are written to ORDER_ARCHIVE_DIR, which must be the absolute path of the
+directory the service reads archived orders from.
+
+    ORDER_ARCHIVE_DIR=/var/lib/orders/archive python scripts/archive_orders.py --days 548
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app import archive
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=archive.ORDER_ARCHIVE_AFTER_DAYS,
+                        help="archive orders created more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=archive.ORDER_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        archived = archive.archive_orders(
+            db,
+            older_than=datetime.now(timezone.utc) - timedelta(days=args.days),
+            batch_size=args.batch_size
+        )
+        print(f"Archived {archived} orders to {archive.ORDER_ARCHIVE_DIR} in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Rebuild the order_rollups table from orders.
+
+Rollups are kept current by triggers on orders; run this after bulk loads
+or edits made with the triggers disabled. Without a range the whole table
+is rebuilt, otherwise only the UTC days overlapping [--from, --to).
+
+    python scripts/backfill_order_rollups.py --from 2025-01-01 --to 2025-02-01
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app import crud
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        rows = crud.rebuild_order_rollups(db, date_from=args.date_from, date_to=args.date_to)
+        print(f"Wrote {rows} rollup rows in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
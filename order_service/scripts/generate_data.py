@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Generate deterministic synthetic orders for scale testing.
+
+Bulk-loads orders with shipping addresses, items, status history and
+payments. Postgres is loaded with COPY, any other database (SQLite) with
+executemany. The same seed and arguments always produce the same rows.
+
+    python scripts/generate_data.py --orders 1000000 --products 5000
+    python scripts/generate_data.py --database-url sqlite:///./scale.db --orders 10000
+
+generate_orders() takes an engine and can be called from pytest fixtures.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from migrate import create_schema
+
+# Shared with product_service/scripts/generate_data.py so that order items
+# point at the products generated there.
+SYNTHETIC_NAMESPACE = uuid.UUID("6f1c8a52-3f0e-4d59-9d0a-3c8e2b7a5f10")
+
+FIRST_NAMES = [
+    "Александр", "Алексей", "Андрей", "Дмитрий", "Иван", "Максим", "Михаил", "Николай",
+    "Сергей", "Павел", "Анна", "Екатерина", "Елена", "Мария", "Наталья", "Ольга",
+    "Светлана", "Татьяна", "Юлия", "Ирина",
+]
+LAST_NAMES = [
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+    "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров",
+]
+CITIES = [
+    ("Москва", "101"), ("Санкт-Петербург", "190"), ("Новосибирск", "630"), ("Екатеринбург", "620"),
+    ("Казань", "420"), ("Нижний Новгород", "603"), ("Челябинск", "454"), ("Самара", "443"),
+    ("Ростов-на-Дону", "344"), ("Уфа", "450"), ("Краснодар", "350"), ("Воронеж", "394"),
+]
+STREETS = [
+    "ул. Ленина", "ул. Пушкина", "пр. Мира", "ул. Гагарина", "ул. Советская", "ул. Садовая",
+    "Невский пр.", "ул. Лесная", "ул. Набережная", "ул. Молодёжная", "ул. Школьная",
+]
+PRODUCT_KINDS = ["Лампа-лофт", "Лампа-бра", "Лампа", "Торшер", "Люстра", "Светильник", "Ночник"]
+EMAIL_DOMAINS = ["mail.ru", "yandex.ru", "gmail.com", "bk.ru", "inbox.ru"]
+
+# Final status -> path through the workflow, with relative weights
+STATUS_PATHS = [
+    (["NEW"], 4),
+    (["NEW", "PENDING_PAYMENT"], 3),
+    (["NEW", "PROCESSING"], 5),
+    (["NEW", "PROCESSING", "SHIPPED"], 8),
+    (["NEW", "PROCESSING", "SHIPPED", "DELIVERED"], 70),
+    (["NEW", "CANCELLED"], 6),
+    (["NEW", "PROCESSING", "CANCELLED"], 4),
+]
+LATIN = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z",
+    "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r",
+    "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "c", "ч": "ch", "ш": "sh", "щ": "sch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+})
+
+
+def synthetic_product_id(index: int) -> uuid.UUID:
+    return uuid.uuid5(SYNTHETIC_NAMESPACE, f"product-{index}")
+
+
+def _reference_ids(db: Session) -> Dict[str, Dict[str, uuid.UUID]]:
+    crud.init_reference_data(db)
+    return {
+        "statuses": {s.code: s.id for s in db.query(models.OrderStatus).all()},
+        "delivery": {m.code: m.id for m in db.query(models.DeliveryMethod).all()},
+        "payment": {m.code: m.id for m in db.query(models.PaymentMethod).all()},
+    }
+
+
+# _to_csv_value and bulk_insert are repeated in each service's generate_data.py on
+# purpose: every service is built into its own image from its own directory, and
+# there is no package shared between them to hold one copy.
+def _to_csv_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+def bulk_insert(conn, table, rows: List[dict]) -> None:
+    """Insert rows with COPY on Postgres and executemany elsewhere."""
+    if not rows:
+        return
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.insert(), rows)
+        return
+
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_to_csv_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+class OrderGenerator:
+    """Produces rows for one order and its dependents from a seeded RNG."""
+
+    def __init__(self, refs: Dict[str, Dict[str, uuid.UUID]], seed: int, products: int, days: int, now: datetime):
+        self.refs = refs
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.products = products
+        self.days = days
+        self.now = now
+        self.paths = [path for path, _ in STATUS_PATHS]
+        self.weights = [weight for _, weight in STATUS_PATHS]
+        self.delivery_codes = sorted(refs["delivery"])
+        self.payment_codes = sorted(refs["payment"])
+        self.catalog = [self._product(index) for index in range(products)]
+
+    @staticmethod
+    def _product(index: int):
+        # Same name and price as product_service/scripts/generate_data.py yields for this index
+        rng = random.Random(index)
+        kind = PRODUCT_KINDS[index % len(PRODUCT_KINDS)]
+        price = Decimal(rng.randrange(990, 25000, 10)).quantize(Decimal("0.01"))
+        return synthetic_product_id(index), f"{kind} №{index}", price
+
+    def order(self, index: int) -> Dict[str, List[dict]]:
+        rng = self.rng
+        order_id = uuid.uuid5(SYNTHETIC_NAMESPACE, f"order-{self.seed}-{index}")
+        created_at = self.now - timedelta(seconds=rng.randrange(self.days * 86400))
+        age = self.now - created_at
+
+        path = rng.choices(self.paths, weights=self.weights)[0]
+        if age < timedelta(days=2):
+            path = path[:2]
+        elif age > timedelta(days=30) and path[-1] in ("PROCESSING", "PENDING_PAYMENT", "NEW"):
+            path = ["NEW", "PROCESSING", "SHIPPED", "DELIVERED"]
+
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        if first_name[-1] in "ая":
+            last_name += "а"
+        customer_name = f"{first_name} {last_name}"
+        customer_phone = f"+79{rng.randrange(10**9):09d}"
+        login = f"{first_name.lower().translate(LATIN)}.{last_name.lower().translate(LATIN)}{rng.randrange(1000)}"
+        customer_email = f"{login}@{rng.choice(EMAIL_DOMAINS)}"
+
+        items = []
+        total_amount = Decimal(0)
+        for position in range(rng.choice((1, 1, 1, 2, 2, 3, 4, 5))):
+            product_id, product_name, price = self.catalog[rng.randrange(self.products)]
+            quantity = rng.choice((1, 1, 1, 2, 3))
+            subtotal = price * quantity
+            total_amount += subtotal
+            items.append({
+                "id": uuid.uuid5(order_id, f"item-{position}"),
+                "order_id": order_id,
+                "order_created_at": created_at,
+                "product_id": product_id,
+                "product_snapshot_name": product_name,
+                "product_snapshot_price": price,
+                "quantity": quantity,
+                "subtotal_amount": subtotal,
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+
+        delivery_code = rng.choice(self.delivery_codes)
+        address = None
+        if delivery_code == "COURIER_HOME":
+            city, postal_prefix = rng.choice(CITIES)
+            address = {
+                "id": uuid.uuid5(order_id, "address"),
+                "recipient_name": customer_name,
+                "recipient_phone": customer_phone,
+                "country": "Россия",
+                "city": city,
+                "street_address": f"{rng.choice(STREETS)}, д. {rng.randrange(1, 200)}",
+                "apartment": str(rng.randrange(1, 400)) if rng.random() < 0.8 else None,
+                "postal_code": f"{postal_prefix}{rng.randrange(1000):03d}",
+                "address_notes": None,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+        history = []
+        changed_at = created_at
+        for step, code in enumerate(path):
+            if step:
+                changed_at += timedelta(minutes=rng.randrange(30, 3 * 24 * 60))
+                changed_at = min(changed_at, self.now)
+            history.append({
+                "id": uuid.uuid5(order_id, f"history-{step}"),
+                "order_id": order_id,
+                "order_created_at": created_at,
+                "status_id": self.refs["statuses"][code],
+                "changed_at": changed_at,
+                "actor_details": "System: Order created" if step == 0 else "admin",
+                "notes": "Order created automatically" if step == 0 else None,
+            })
+
+        payment_code = rng.choice(self.payment_codes)
+        paid = path[-1] in ("SHIPPED", "DELIVERED") or (payment_code != "CASH" and path[-1] == "PROCESSING")
+        payment = {
+            "id": uuid.uuid5(order_id, "payment"),
+            "order_id": order_id,
+            "order_created_at": created_at,
+            "payment_method_id": self.refs["payment"][payment_code],
+            "payment_provider": None if payment_code == "CASH" else "synthetic",
+            "transaction_id": None,
+            "payment_status_code": "PAID" if paid else ("CANCELLED" if path[-1] == "CANCELLED" else "PENDING"),
+            "amount": total_amount,
+            "currency": "RUB",
+            "paid_at": history[-1]["changed_at"] if paid else None,
+            "payment_details_snapshot": None,
+            "created_at": created_at,
+            "updated_at": history[-1]["changed_at"],
+        }
+
+        order = {
+            "id": order_id,
+            "order_number": f"ORD-{created_at:%Y-%m}-{index:08X}",
+            "user_id": None,
+            "status_id": self.refs["statuses"][path[-1]],
+            "total_amount": total_amount,
+            "currency": "RUB",
+            "customer_name": customer_name,
+            "customer_phone": customer_phone,
+            "customer_email": customer_email,
+            "customer_phone_normalized": models.normalize_customer_phone(customer_phone),
+            "customer_email_normalized": models.normalize_customer_email(customer_email),
+            "delivery_method_id": self.refs["delivery"][delivery_code],
+            "payment_method_id": payment["payment_method_id"],
+            "shipping_address_id": address["id"] if address else None,
+            "customer_notes": None,
+            "created_at": created_at,
+            "updated_at": history[-1]["changed_at"],
+        }
+
+        return {
+            "shipping_addresses": [address] if address else [],
+            "orders": [order],
+            "order_items": items,
+            "order_status_history": history,
+            "payment_details": [payment],
+        }
+
+
+def generate_orders(
+    engine: Engine,
+    orders: int,
+    products: int = 1000,
+    seed: int = 42,
+    start: int = 0,
+    days: int = 365,
+    batch_size: int = 5000,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Load `orders` synthetic orders numbered from `start` into the database.
+
+    Each batch is committed separately, so memory stays flat for large runs.
+    Returns the number of orders written.
+    """
+    # Fixed default clock keeps output identical between runs
+    now = now or datetime(2026, 1, 1)
+    with Session(engine) as db:
+        refs = _reference_ids(db)
+        # Backdated orders need their monthly partitions on Postgres
+        crud.create_order_partitions(db, now - timedelta(days=days), now)
+
+    generator = OrderGenerator(refs, seed=seed + start, products=products, days=days, now=now)
+    tables = {table.name: table for table in models.Base.metadata.sorted_tables}
+    insert_order = ["shipping_addresses", "orders", "order_items", "order_status_history", "payment_details"]
+
+    for batch_start in range(start, start + orders, batch_size):
+        batch: Dict[str, List[dict]] = {name: [] for name in insert_order}
+        for index in range(batch_start, min(batch_start + batch_size, start + orders)):
+            for name, rows in generator.order(index).items():
+                batch[name].extend(rows)
+        with engine.begin() as conn:
+            for name in insert_order:
+                bulk_insert(conn, tables[name], batch[name])
+    return orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=1000,
+                        help="number of synthetic products items are drawn from")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=int, default=0,
+                        help="first order index, use to append to an existing data set")
+    parser.add_argument("--days", type=int, default=365, help="spread created_at over this many days")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    create_schema(engine)
+
+    started = time.perf_counter()
+    generate_orders(engine, args.orders, products=args.products, seed=args.seed,
+                    start=args.start, days=args.days, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Generated {args.orders} orders in {elapsed:.1f}s ({args.orders / elapsed:.0f} orders/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Bring a database to the schema the service runs on.
+
+Postgres gets the Alembic migrations, which alone create the triggers,
+functions and partitions. Any other database (SQLite) gets the plain
+tables from create_all, enough for tests and local data generation;
+app.database teaches SQLite the UUID and JSONB column types.
+
+    python scripts/migrate.py --database-url sqlite:///./scale.db
+
+create_schema() takes an engine and can be called from pytest fixtures
+and benchmarks.
+"""
+import argparse
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from app import models
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), '..', 'alembic.ini')
+
+
+def create_schema(engine: Engine) -> None:
+    """Upgrade a Postgres database to the latest revision, create the tables anywhere else"""
+    if engine.dialect.name != "postgresql":
+        models.Base.metadata.create_all(bind=engine)
+        return
+    config = Config(ALEMBIC_INI)
+    with engine.connect() as connection:
+        # Picked up by migration/env.py instead of DATABASE_URL
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+    create_schema(create_engine(args.database_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Correct the order_status_counters table from a recount of orders.
+
+The service also does this every ORDER_STATS_RECONCILE_INTERVAL seconds.
+Run it by hand after bulk edits made with the counter triggers disabled.
+"""
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app import crud
+from app.database import SessionLocal
+
+
+def main():
+    db = SessionLocal()
+    try:
+        drift = crud.reconcile_order_status_counters(db)
+        if drift:
+            print(f"Counters corrected: {drift}")
+        else:
+            print("Counters were already accurate")
+        print(f"Current counts: {crud.get_order_statistics(db)['status_breakdown']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
 from app.database import get_db, Base
-from app import models
+from app import archive, crud, models, outbox, product_prices, top_products
+import json
 import uuid
+from datetime import datetime, timedelta, timezone
 
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_filtering.db"
@@ -25,10 +28,12 @@ client = TestClient(app)
 
 @pytest.fixture(scope="module")
 def setup_test_data():
-    # Create test database
+    # Create test database, dropping what an earlier run left in the file
+    Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
     
-    db = TestingSessionLocal()
+    # The returned objects are used after the session closes, keep their loaded state
+    db = TestingSessionLocal(expire_on_commit=False)
     
     try:
         # Create test statuses
@@ -60,7 +65,9 @@ def setup_test_data():
         db.add_all([status1, status2, delivery_method, payment_method])
         db.commit()
         
-        # Create test orders
+        # Create test orders. Explicit timestamps are stored with microseconds, like the
+        # cursor bounds; SQLite compares the text and CURRENT_TIMESTAMP has none.
+        now = datetime.now(timezone.utc)
         order1 = models.Order(
             id=uuid.uuid4(),
             order_number="ORD-001",
@@ -70,7 +77,8 @@ def setup_test_data():
             status_id=status1.id,
             delivery_method_id=delivery_method.id,
             total_amount=1000.00,
-            currency="RUB"
+            currency="RUB",
+            created_at=now - timedelta(minutes=2)
         )
         
         order2 = models.Order(
@@ -82,7 +90,8 @@ def setup_test_data():
             status_id=status2.id,
             delivery_method_id=delivery_method.id,
             total_amount=2000.00,
-            currency="RUB"
+            currency="RUB",
+            created_at=now - timedelta(minutes=1)
         )
         
         db.add_all([order1, order2])
@@ -140,5 +149,341 @@ def test_pagination(setup_test_data):
     assert data["total"] == 2
     assert data["limit"] == 1
 
+def test_cursor_pagination(setup_test_data):
+    """Test paging with next_cursor"""
+    first = client.get("/api/v1/orders/?limit=1").json()
+    assert first["next_cursor"] is not None
+
+    response = client.get(f"/api/v1/orders/?limit=1&cursor={first['next_cursor']}")
+    assert response.status_code == 200
+    second = response.json()
+    assert len(second["data"]) == 1
+    assert second["data"][0]["id"] != first["data"][0]["id"]
+    assert second["next_cursor"] is None
+
+def test_count_modes(setup_test_data):
+    """Test that every count mode reports the same total"""
+    for count_mode in ("window", "exact", "cached", "estimate"):
+        response = client.get(f"/api/v1/orders/?limit=1&count_mode={count_mode}")
+        assert response.status_code == 200
+        assert response.json()["total"] == 2
+
+def test_count_mode_estimate(setup_test_data, monkeypatch):
+    """Test that unfiltered lists report the planner estimate and fall back to an exact count without one"""
+    # SQLite has no planner statistics, estimate_orders_count returns None
+    response = client.get("/api/v1/orders/?limit=1&count_mode=estimate")
+    assert (response.json()["total"], response.json()["total_is_estimate"]) == (2, False)
+
+    monkeypatch.setattr(crud, "estimate_orders_count", lambda db: 1000)
+    response = client.get("/api/v1/orders/?limit=1&count_mode=estimate")
+    assert (response.json()["total"], response.json()["total_is_estimate"]) == (1000, True)
+
+    # Filtered lists are never estimated
+    response = client.get("/api/v1/orders/?limit=1&count_mode=estimate&status=NEW")
+    assert (response.json()["total"], response.json()["total_is_estimate"]) == (1, False)
+
+def test_statuses_etag(setup_test_data):
+    """Test that reference data is served with an ETag and revalidates to 304"""
+    response = client.get("/api/v1/orders/statuses")
+    assert response.status_code == 200
+    assert {s["code"] for s in response.json()} == {"NEW", "PROCESSING"}
+
+    cached = client.get("/api/v1/orders/statuses", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+def test_invalid_cursor(setup_test_data):
+    """Test that a malformed cursor is rejected"""
+    response = client.get("/api/v1/orders/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+def test_idempotent_order_creation(setup_test_data):
+    """Test that retrying with the same Idempotency-Key returns the first order"""
+    db = TestingSessionLocal()
+    try:
+        delivery_method = db.query(models.DeliveryMethod).first()
+        payment_method = db.query(models.PaymentMethod).first()
+    finally:
+        db.close()
+    order = {
+        "customer_name": "Иван Иванов",
+        "customer_phone": "+79001234567",
+        "customer_email": "ivan@test.com",
+        "delivery_method_id": str(delivery_method.id),
+        "payment_method_id": str(payment_method.id),
+        "order_items": [{
+            "product_id": str(uuid.uuid4()),
+            "product_snapshot_name": "Лампа",
+            "product_snapshot_price": "1000.00",
+            "quantity": 1
+        }]
+    }
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/api/v1/orders/", json=order, headers=headers)
+    assert first.status_code == 201
+    retry = client.post("/api/v1/orders/", json=order, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+
+    changed = client.post("/api/v1/orders/", json={**order, "customer_name": "Петр"}, headers=headers)
+    assert changed.status_code == 422
+
+def test_order_timeseries(setup_test_data):
+    """Test daily order counts and revenue grouped by status"""
+    response = client.get("/api/v1/orders/analytics/timeseries?group_by=status")
+    assert response.status_code == 200
+    points = [p for p in response.json()["points"] if p["group"] == "PROCESSING"]
+    assert sum(p["order_count"] for p in points) == 1
+    assert sum(float(p["revenue"]) for p in points) == 2000.00
+
+    too_long = client.get("/api/v1/orders/analytics/timeseries?date_from=2020-01-01T00:00:00&date_to=2026-01-01T00:00:00")
+    assert too_long.status_code == 400
+
+def test_bulk_status_update(setup_test_data):
+    """Test that a bulk transition reports an outcome for every order"""
+    order1 = setup_test_data["order1"]
+    order2 = setup_test_data["order2"]
+    missing = uuid.uuid4()
+    response = client.post("/api/v1/orders/bulk/status", json={
+        "order_ids": [str(order1.id), str(order2.id), str(missing)],
+        "status_id": str(setup_test_data["status2"].id)
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 1
+    assert [r["outcome"] for r in data["results"]] == ["updated", "unchanged", "not_found"]
+
+    history = client.get(f"/api/v1/orders/{order1.id}/history").json()
+    assert history[-1]["status_ref"]["code"] == "PROCESSING"
+
+def test_export_ndjson(setup_test_data):
+    """Test that the export streams one line per order and applies the list filters"""
+    response = client.get("/api/v1/orders/export?format=ndjson&search=ORD-002")
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == 1
+    assert '"order_number":"ORD-002"' in lines[0]
+
+def test_batch_status_history(setup_test_data):
+    """Test that histories of many orders come back together and unknown orders are left out"""
+    order_ids = [str(setup_test_data["order1"].id), str(uuid.uuid4()), str(setup_test_data["order2"].id)]
+    response = client.post("/api/v1/orders/history/batch", json={"order_ids": order_ids})
+    assert response.status_code == 200
+    assert [h["order_id"] for h in response.json()] == [order_ids[0], order_ids[2]]
+
+    missing = client.get(f"/api/v1/orders/{order_ids[1]}/history")
+    assert missing.status_code == 404
+
+def test_orders_by_customer(setup_test_data):
+    """Test that a customer's orders are found by normalized email or phone"""
+    response = client.get("/api/v1/orders/by-customer?email=%20Ivan@Test.com")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == len(data["data"]) > 0
+    assert all(order["customer_email"] == "ivan@test.com" for order in data["data"])
+
+    by_phone = client.get("/api/v1/orders/by-customer", params={"phone": "8 (900) 123-45-67"}).json()
+    assert [order["id"] for order in by_phone["data"]] == [order["id"] for order in data["data"]]
+
+    assert client.get("/api/v1/orders/by-customer").status_code == 400
+
+def test_checkout_price_verification(setup_test_data):
+    """Test that line items whose price differs from the product service are rejected"""
+    product_id = uuid.uuid4()
+    lookups = []
+
+    def product_service(request):
+        lookups.append(request)
+        return httpx.Response(200, json=[
+            {"id": str(product_id), "name": "Лампа", "current_price": "1000.00", "version": 1}
+        ])
+
+    db = TestingSessionLocal()
+    try:
+        delivery_method = db.query(models.DeliveryMethod).first()
+        payment_method = db.query(models.PaymentMethod).first()
+    finally:
+        db.close()
+    order = {
+        "customer_name": "Иван Иванов",
+        "customer_phone": "+79001234567",
+        "customer_email": "ivan@test.com",
+        "delivery_method_id": str(delivery_method.id),
+        "payment_method_id": str(payment_method.id),
+        "order_items": [{
+            "product_id": str(product_id),
+            "product_snapshot_name": "Лампа",
+            "product_snapshot_price": "1.00",
+            "quantity": 20
+        }]
+    }
+    catalog = product_prices.catalog
+    catalog.base_url = "http://product-api"
+    catalog.client = httpx.Client(base_url=catalog.base_url, transport=httpx.MockTransport(product_service))
+    try:
+        tampered = client.post("/api/v1/orders/", json=order)
+        assert tampered.status_code == 400
+        order["order_items"][0]["product_snapshot_price"] = "1000.00"
+        assert client.post("/api/v1/orders/", json=order).status_code == 201
+        assert len(lookups) == 1
+
+        # More products than one lookup takes are looked up in batches, not refused
+        many = [uuid.uuid4() for _ in range(product_prices.PRODUCT_PRICE_LOOKUP_BATCH_SIZE + 1)]
+        catalog.lookup(many)
+        assert [len(json.loads(request.content)["product_ids"]) for request in lookups[1:]] == \
+            [product_prices.PRODUCT_PRICE_LOOKUP_BATCH_SIZE, 1]
+    finally:
+        catalog.close()
+        catalog.invalidate()
+        catalog.base_url = ""
+
+def test_top_products(setup_test_data):
+    """Test that best sellers are ranked by units sold and served from the cache"""
+    best, second = uuid.uuid4(), uuid.uuid4()
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            models.OrderItem(order_id=order.id, order_created_at=order.created_at,
+                             product_id=product_id, product_snapshot_name="Лампа",
+                             product_snapshot_price=10, quantity=quantity, subtotal_amount=10 * quantity)
+            for order, product_id, quantity in [
+                (setup_test_data["order1"], best, 700),
+                (setup_test_data["order2"], best, 700),
+                (setup_test_data["order2"], second, 500),
+            ]
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    top_products.invalidate()
+    response = client.get("/api/v1/orders/analytics/top-products?days=7&limit=2")
+    assert response.status_code == 200
+    assert "max-age" in response.headers["cache-control"]
+    products = response.json()["products"]
+    assert [product["product_id"] for product in products] == [str(best), str(second)]
+    assert products[0]["units"] == 1400
+    assert products[0]["units_per_day"] == 200
+
+    assert client.get("/api/v1/orders/analytics/top-products?days=14").status_code == 400
+
+class RecordingSink:
+    def __init__(self, name, failures=0):
+        self.name = name
+        self.failures = failures
+        self.received = []
+
+    def send(self, events):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError(f"{self.name} is down")
+        self.received.extend(event["id"] for event in events)
+
+
+def test_outbox_failing_sink(setup_test_data):
+    """Test that a failing sink is retried alone and dead-lettered after max_attempts"""
+    db = TestingSessionLocal()
+    try:
+        db.query(models.OrderOutboxEvent).delete()
+        db.add_all([
+            models.OrderOutboxEvent(event_type="order.created", order_id=uuid.uuid4(), payload={"n": n})
+            for n in range(3)
+        ])
+        db.commit()
+        event_ids = [event.id for event in db.query(models.OrderOutboxEvent).order_by(models.OrderOutboxEvent.id)]
+
+        # No sinks configured: nothing is sent and nothing is dropped
+        assert outbox.dispatch_events(db, []) == 0
+        assert db.query(models.OrderOutboxEvent).count() == 3
+
+        healthy, flaky = RecordingSink("healthy"), RecordingSink("flaky", failures=1)
+        with pytest.raises(RuntimeError):
+            outbox.dispatch_events(db, [healthy, flaky], batch_size=2)
+        first = db.get(models.OrderOutboxEvent, event_ids[0])
+        assert (first.attempts, first.delivered_to) == (1, ["healthy"])
+        assert first.last_error == "flaky is down"
+
+        assert outbox.dispatch_events(db, [healthy, flaky], batch_size=2) == 3
+        assert healthy.received == event_ids
+        assert flaky.received == event_ids
+        assert db.query(models.OrderOutboxEvent).count() == 0
+
+        # SQLite hands out the deleted ids again
+        db.expunge_all()
+        db.add_all([
+            models.OrderOutboxEvent(event_type="order.created", order_id=uuid.uuid4(), payload={"n": n})
+            for n in range(3, 5)
+        ])
+        db.commit()
+        stuck, later = [event.id for event in db.query(models.OrderOutboxEvent).order_by(models.OrderOutboxEvent.id)]
+        rejecting = RecordingSink("rejecting", failures=2)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                outbox.dispatch_events(db, [rejecting], batch_size=1, max_attempts=2)
+        dead = db.get(models.OrderOutboxDeadLetter, stuck)
+        assert (dead.attempts, dead.last_error) == (2, "rejecting is down")
+
+        # The dead-lettered event no longer holds back the one after it
+        assert outbox.dispatch_events(db, [rejecting], batch_size=1, max_attempts=2) == 1
+        assert rejecting.received == [later]
+    finally:
+        db.close()
+
+
+def test_archived_order_without_archive(setup_test_data, tmp_path, monkeypatch):
+    """Test that an archived order answers 503, not 500, when its segment cannot be read"""
+    order_id = uuid.uuid4()
+    db = TestingSessionLocal()
+    try:
+        db.add(models.ArchivedOrder(
+            order_id=order_id, order_number="ORD-ARCHIVED", created_at=datetime.now(timezone.utc),
+            status_id=setup_test_data["status1"].id, delivery_method_id=setup_test_data["order1"].delivery_method_id,
+            total_amount=100, segment="orders-missing.ndjson.gz", block_offset=0, block_length=10
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    monkeypatch.setattr(archive, "ORDER_ARCHIVE_DIR", "")
+    assert client.get(f"/api/v1/orders/{order_id}").status_code == 503
+    monkeypatch.setattr(archive, "ORDER_ARCHIVE_DIR", str(tmp_path))
+    assert client.get("/api/v1/orders/number/ORD-ARCHIVED").status_code == 503
+    assert client.get(f"/api/v1/orders/{uuid.uuid4()}").status_code == 404
+
+    monkeypatch.setattr(archive, "ORDER_ARCHIVE_DIR", "archive")
+    with pytest.raises(ValueError):
+        archive.validate_config()
+
+
+def test_outbox_prune(setup_test_data):
+    """Test that old dead letters are pruned, and old outbox events only when there are no sinks"""
+    db = TestingSessionLocal()
+    try:
+        db.query(models.OrderOutboxEvent).delete()
+        db.query(models.OrderOutboxDeadLetter).delete()
+        now = datetime.now(timezone.utc)
+        old, recent = now - timedelta(days=10), now - timedelta(days=1)
+        db.add_all([
+            models.OrderOutboxEvent(event_type="order.created", order_id=uuid.uuid4(), payload={}, created_at=created_at)
+            for created_at in (old, recent)
+        ])
+        db.add_all([
+            models.OrderOutboxDeadLetter(id=id, event_type="order.created", order_id=uuid.uuid4(), payload={},
+                                         attempts=10, delivered_to=[], failed_at=failed_at)
+            for id, failed_at in ((1, old), (2, recent))
+        ])
+        db.commit()
+
+        # Sinks deliver or dead-letter pending events, so only the old dead letter goes
+        assert outbox.prune_events(db, [RecordingSink("healthy")], retention_days=7) == 1
+        assert db.query(models.OrderOutboxEvent).count() == 2
+        assert [dead.id for dead in db.query(models.OrderOutboxDeadLetter)] == [2]
+
+        assert outbox.prune_events(db, [], retention_days=7, batch_size=1) == 1
+        assert [event.created_at.date() for event in db.query(models.OrderOutboxEvent)] == [recent.date()]
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     pytest.main([__file__])
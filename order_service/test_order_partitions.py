@@ -0,0 +1,104 @@
+"""
+Partition pruning and foreign key checks for the monthly orders partitions.
+
+Needs a Postgres scale database, see conftest.py. Synthetic orders are
+spread over 2025, one partition per month.
+"""
+from datetime import datetime, timezone
+
+import uuid
+
+import pytest
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import crud, models
+
+
+def plan_nodes(db: Session, query) -> list:
+    """All nodes of the EXPLAIN plan of query"""
+    compiled = query.statement.compile(db.get_bind())
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    nodes, pending = [], [plan[0]["Plan"]]
+    while pending:
+        node = pending.pop()
+        nodes.append(node)
+        pending.extend(node.get("Plans", []))
+    return nodes
+
+
+def scanned_partitions(db: Session, query) -> set:
+    """Names of the orders partitions the planner keeps for query"""
+    return {
+        node["Relation Name"] for node in plan_nodes(db, query)
+        if node.get("Relation Name", "").startswith("orders_")
+    }
+
+
+@pytest.fixture
+def scale_db(scale_db_engine, synthetic_orders):
+    with Session(scale_db_engine) as db:
+        yield db
+
+
+def test_newest_first_list_reads_partitions_in_order(scale_db):
+    query = scale_db.query(models.Order).order_by(
+        models.Order.created_at.desc(), models.Order.id
+    ).limit(100)
+    # Partitions are appended newest first, so the limit stops after the latest one has enough rows
+    assert "Sort" not in {node["Node Type"] for node in plan_nodes(scale_db, query)}
+
+
+def test_date_filtered_list_scans_one_partition(scale_db):
+    query = crud._filter_orders(
+        scale_db.query(models.Order),
+        date_from=datetime(2025, 6, 1, tzinfo=timezone.utc),
+        date_to=datetime(2025, 6, 30, tzinfo=timezone.utc)
+    ).order_by(models.Order.created_at.desc(), models.Order.id).limit(100)
+    assert scanned_partitions(scale_db, query) == {"orders_2025_06"}
+
+
+def test_date_filtered_count_scans_matching_partitions(scale_db):
+    query = crud._filter_orders(
+        scale_db.query(models.Order.id),
+        date_from=datetime(2025, 3, 15, tzinfo=timezone.utc),
+        date_to=datetime(2025, 4, 15, tzinfo=timezone.utc)
+    )
+    assert scanned_partitions(scale_db, query) == {"orders_2025_03", "orders_2025_04"}
+
+
+def test_status_stats_do_not_scan_orders(scale_db):
+    query = scale_db.query(models.OrderStatusCounter.status_id)
+    assert scanned_partitions(scale_db, query) == set()
+
+
+def test_count_estimate_sums_the_partitions(scale_db):
+    # The partitioned parent has no reltuples of its own, only its analyzed partitions do
+    scale_db.execute(text("ANALYZE orders"))
+    scale_db.commit()
+    # Exact while a partition fits in ANALYZE's sample, close to it beyond that
+    count = scale_db.query(models.Order).count()
+    assert abs(crud.estimate_orders_count(scale_db) - count) <= count * 0.05
+
+
+def test_deleting_an_order_deletes_its_rows(scale_db):
+    order = scale_db.query(models.Order).order_by(models.Order.created_at).first()
+    scale_db.execute(delete(models.Order).where(models.Order.id == order.id))
+    try:
+        for model in (models.OrderItem, models.PaymentDetail, models.OrderStatusHistory):
+            remaining = scale_db.scalar(select(func.count()).where(model.order_id == order.id))
+            assert remaining == 0, model.__tablename__
+    finally:
+        scale_db.rollback()
+
+
+def test_rows_need_an_existing_order(scale_db):
+    order = scale_db.query(models.Order).first()
+    # Right id, wrong partition key: no such order
+    with pytest.raises(IntegrityError):
+        scale_db.execute(insert(models.OrderStatusHistory).values(
+            id=uuid.uuid4(), order_id=order.id, order_created_at=datetime(2000, 1, 1, tzinfo=timezone.utc),
+            status_id=order.status_id
+        ))
+    scale_db.rollback()
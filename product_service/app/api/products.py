@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Response, status, UploadFile, File
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 import os
 import shutil
 from pathlib import Path
 import uuid
 from PIL import Image
-from app import schemas, crud, models
+from app import schemas, crud, models, catalog_snapshot
 from app.database import SessionLocal
 
 router = APIRouter()
@@ -27,37 +27,82 @@ def get_db():
     finally:
         db.close()
 
+def _etag(db_product: models.Product) -> str:
+    return f'"{db_product.version}"'
+
+def _parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Return the product version required by If-Match, or None for an unconditional update"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
 @router.post("/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
-def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
+def create_product(product: schemas.ProductCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_product = crud.get_product_by_sku(db, product.sku)
     if db_product:
         raise HTTPException(status_code=400, detail="SKU already registered")
-    return crud.create_product(db, product)
+    db_product = crud.create_product(db, product)
+    background_tasks.add_task(catalog_snapshot.refresh_product_shard, db_product.id)
+    return db_product
+
+@router.post("/bulk-update", response_model=schemas.ProductBulkUpdateResult)
+def bulk_update_products(bulk: schemas.ProductBulkUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Update price and/or stock of all products matching the filter in one transaction"""
+    product_ids = crud.bulk_update_products(db, bulk)
+    background_tasks.add_task(
+        catalog_snapshot.refresh_shards,
+        [catalog_snapshot.shard_key(product_id) for product_id in product_ids]
+    )
+    return schemas.ProductBulkUpdateResult(updated_count=len(product_ids), product_ids=product_ids)
+
+@router.post("/prices", response_model=List[schemas.ProductPrice])
+def read_product_prices(lookup: schemas.ProductPriceLookup, db: Session = Depends(get_db)):
+    """Current name and price of many products at once, used by checkout to verify line items"""
+    return crud.get_product_prices(db, lookup.product_ids)
 
 @router.get("/", response_model=List[schemas.Product])
 def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     return crud.get_products(db, skip=skip, limit=limit)
 
 @router.get("/{product_id}", response_model=schemas.Product)
-def read_product(product_id: UUID, db: Session = Depends(get_db)):
+def read_product(product_id: UUID, response: Response, db: Session = Depends(get_db)):
     db_product = crud.get_product(db, product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    response.headers["ETag"] = _etag(db_product)
     return db_product
 
 @router.put("/{product_id}", response_model=schemas.Product)
-def update_product(product_id: UUID, updates: schemas.ProductUpdate, db: Session = Depends(get_db)):
-    db_product = crud.get_product(db, product_id)
+def update_product(
+    product_id: UUID,
+    updates: schemas.ProductUpdate,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    db_product = crud.update_product(db, product_id, updates, expected_version=_parse_if_match(if_match))
     if db_product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return crud.update_product(db, db_product, updates)
+        if crud.get_product(db, product_id) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=412, detail="Product was modified by another request")
+    response.headers["ETag"] = _etag(db_product)
+    background_tasks.add_task(catalog_snapshot.refresh_product_shard, product_id)
+    return db_product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(product_id: UUID, db: Session = Depends(get_db)):
+def delete_product(product_id: UUID, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_product = crud.get_product(db, product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     crud.delete_product(db, db_product)
+    background_tasks.add_task(catalog_snapshot.refresh_product_shard, product_id)
     return None
 
 @router.post("/upload-image", status_code=status.HTTP_201_CREATED)
@@ -0,0 +1,193 @@
+"""
+Static catalog snapshot publisher.
+
+Writes the product catalog as precompressed JSON shards into the assets
+directory shared with the client app's nginx, so catalog reads are served
+as static files and never reach uvicorn or Postgres.
+
+Products are sharded by the first hex digit of their UUID, which gives 16
+stable shards, each a contiguous range of the primary key index. A product
+write only rebuilds the shard it belongs to, and every file is replaced
+atomically. nginx serves the .gz variants with gzip_static; the stock
+nginx image has no brotli module, so no .br files are written.
+"""
+import contextlib
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR = Path(os.getenv("CATALOG_SNAPSHOT_DIR", "/usr/share/nginx/html/assets/catalog"))
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT_ENABLED", "true").lower() == "true"
+
+SHARD_KEYS = "0123456789abcdef"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".catalog.lock"
+
+
+@contextlib.contextmanager
+def _catalog_lock() -> Iterator[None]:
+    """
+    Exclusive lock on the catalog directory across threads and worker processes.
+
+    Every publish reads products and writes shards and the manifest while
+    holding it, so a refresh that started later can never be overwritten by
+    an older product list. flock locks belong to the open file, so threads
+    of one process exclude each other as well.
+    """
+    with open(CATALOG_DIR / LOCK_NAME, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def shard_key(product_id: UUID) -> str:
+    """Return the shard a product belongs to."""
+    return str(product_id)[0]
+
+
+def shard_bounds(key: str) -> Tuple[UUID, Optional[UUID]]:
+    """Return the [lower, upper) id range of a shard, upper is None for the last one."""
+    index = SHARD_KEYS.index(key)
+    lower = UUID(key + "0" * 31)
+    upper = UUID(SHARD_KEYS[index + 1] + "0" * 31) if index + 1 < len(SHARD_KEYS) else None
+    return lower, upper
+
+
+def shard_filename(key: str) -> str:
+    return f"products-{key}.json"
+
+
+def _write_atomic(path: Path, payload: bytes) -> None:
+    """Write bytes to a temp file in the target directory and rename it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(payload)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _write_variants(path: Path, payload: bytes) -> None:
+    """Write .gz before the plain file so nginx never pairs a fresh .json with a stale variant."""
+    _write_atomic(path.with_name(path.name + ".gz"), gzip.compress(payload, compresslevel=9, mtime=0))
+    _write_atomic(path, payload)
+
+
+def _serialize_products(products: Iterable[models.Product]) -> List[dict]:
+    return [
+        schemas.Product.model_validate(product).model_dump(mode="json")
+        for product in sorted(products, key=lambda p: str(p.id))
+    ]
+
+
+def _encode(document: dict) -> bytes:
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _read_manifest() -> Dict[str, dict]:
+    manifest_path = CATALOG_DIR / MANIFEST_NAME
+    try:
+        return json.loads(manifest_path.read_bytes()).get("shards", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_manifest(shards: Dict[str, dict]) -> None:
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "shards": dict(sorted(shards.items())),
+    }
+    _write_variants(CATALOG_DIR / MANIFEST_NAME, _encode(manifest))
+
+
+def _write_shard(key: str, products: Iterable[models.Product]) -> dict:
+    items = _serialize_products(products)
+    payload = _encode({"shard": key, "products": items})
+    _write_variants(CATALOG_DIR / shard_filename(key), payload)
+    return {
+        "file": shard_filename(key),
+        "count": len(items),
+        "etag": hashlib.sha256(payload).hexdigest()[:16],
+    }
+
+
+def publish_all(db: Session) -> None:
+    """Rebuild every shard and the manifest from the database."""
+    CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    with _catalog_lock():
+        grouped: Dict[str, List[models.Product]] = {key: [] for key in SHARD_KEYS}
+        for product in db.query(models.Product).yield_per(500):
+            grouped[shard_key(product.id)].append(product)
+        shards = {key: _write_shard(key, products) for key, products in grouped.items()}
+        _write_manifest(shards)
+    logger.info("Published catalog snapshot: %d products in %d shards",
+                sum(s["count"] for s in shards.values()), len(shards))
+
+
+def publish_shard(db: Session, key: str) -> None:
+    """Rebuild a single shard from the database and update its manifest entry."""
+    CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    with _catalog_lock():
+        # Queried under the lock, the last refresh to write is the last to read.
+        # A range on id, unlike a text prefix match, is answered from the primary key index.
+        lower, upper = shard_bounds(key)
+        query = db.query(models.Product).filter(models.Product.id >= lower)
+        if upper is not None:
+            query = query.filter(models.Product.id < upper)
+        products = query.populate_existing().all()
+        shards = _read_manifest()
+        shards[key] = _write_shard(key, products)
+        _write_manifest(shards)
+
+
+def refresh_shards(keys: Iterable[str], db: Optional[Session] = None) -> None:
+    """
+    Rebuild the given shards.
+
+    Meant to run as a background task after product writes, so it opens its
+    own session when none is given and never propagates errors to the caller.
+    """
+    if not CATALOG_SNAPSHOT_ENABLED:
+        return
+
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        for key in sorted(set(keys)):
+            publish_shard(db, key)
+    except Exception:
+        logger.exception("Failed to refresh catalog shards %s", sorted(set(keys)))
+    finally:
+        if own_session:
+            db.close()
+
+
+def refresh_product_shard(product_id: UUID, db: Optional[Session] = None) -> None:
+    """Rebuild the shard that contains product_id."""
+    refresh_shards([shard_key(product_id)], db=db)
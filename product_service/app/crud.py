@@ -1,4 +1,6 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import Integer, Row, cast, func, select, update
+from sqlalchemy.dialects.postgresql import JSONB
 from app import models, schemas
 from typing import List, Optional
 from uuid import UUID
@@ -16,16 +18,78 @@ def create_product(db: Session, product: schemas.ProductCreate) -> models.Produc
     db_product = models.Product(**product.dict())
     db.add(db_product)
     db.commit()
-    db.refresh(db_product)
     return db_product
 
-def update_product(db: Session, db_product: models.Product, updates: schemas.ProductUpdate) -> models.Product:
-    for field, value in updates.dict(exclude_unset=True).items():
-        setattr(db_product, field, value)
+def update_product(
+    db: Session,
+    product_id: UUID,
+    updates: schemas.ProductUpdate,
+    expected_version: Optional[int] = None
+) -> Optional[models.Product]:
+    """
+    Apply updates with a single conditional UPDATE ... RETURNING and bump the version.
+
+    Returns None when no row matched: either the product does not exist or,
+    with expected_version, it was changed by someone else in the meantime.
+    """
+    stmt = update(models.Product).where(models.Product.id == product_id)
+    if expected_version is not None:
+        stmt = stmt.where(models.Product.version == expected_version)
+    stmt = (
+        stmt.values(**updates.dict(exclude_unset=True), version=models.Product.version + 1)
+        .returning(models.Product)
+        .execution_options(synchronize_session=False)
+    )
+    db_product = db.scalars(stmt).first()
     db.commit()
-    db.refresh(db_product)
     return db_product
 
 def delete_product(db: Session, db_product: models.Product) -> None:
     db.delete(db_product)
     db.commit()
+
+def _bulk_value_expression(operation: schemas.ProductBulkOperation):
+    column = getattr(models.Product, operation.field)
+    if operation.op == "set":
+        expression = operation.value
+    elif operation.op == "percent":
+        expression = column * (1 + operation.value / 100)
+    else:
+        expression = column + operation.value
+
+    if operation.field == "stock_quantity":
+        return func.greatest(cast(func.round(expression), Integer), 0)
+    return func.greatest(func.round(expression, 2), 0)
+
+def bulk_update_products(db: Session, bulk: schemas.ProductBulkUpdate) -> List[UUID]:
+    """Apply price/stock operations to every matching product in one UPDATE ... RETURNING"""
+    conditions = []
+    if bulk.filter.skus:
+        conditions.append(models.Product.sku.in_(bulk.filter.skus))
+    if bulk.filter.attributes:
+        conditions.append(cast(models.Product.attributes, JSONB).contains(bulk.filter.attributes))
+    if bulk.filter.min_price is not None:
+        conditions.append(models.Product.current_price >= bulk.filter.min_price)
+    if bulk.filter.max_price is not None:
+        conditions.append(models.Product.current_price <= bulk.filter.max_price)
+
+    values = {operation.field: _bulk_value_expression(operation) for operation in bulk.operations}
+    values["version"] = models.Product.version + 1
+
+    stmt = (
+        update(models.Product)
+        .where(*conditions)
+        .values(**values)
+        .returning(models.Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    product_ids = db.execute(stmt).scalars().all()
+    db.commit()
+    return product_ids
+
+def get_product_prices(db: Session, product_ids: List[UUID]) -> List[Row]:
+    """Name, price and version of the given products in one query, unknown ids are left out"""
+    return db.execute(
+        select(models.Product.id, models.Product.name, models.Product.current_price, models.Product.version)
+        .where(models.Product.id.in_(product_ids))
+    ).all()
@@ -1,6 +1,11 @@
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import products
+from app import catalog_snapshot
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Product Management Microservice")
 
@@ -14,6 +19,20 @@ app.add_middleware(
 
 app.include_router(products.router, prefix="/api/v1/products", tags=["products"])
 
+
+@app.on_event("startup")
+def publish_catalog_snapshot():
+    """Publish a full static catalog snapshot so nginx has fresh shards after a restart"""
+    if not catalog_snapshot.CATALOG_SNAPSHOT_ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        catalog_snapshot.publish_all(db)
+    except Exception:
+        logger.exception("Failed to publish catalog snapshot on startup")
+    finally:
+        db.close()
+
 # Add health check endpoint
 @app.get("/health")
 async def health_check():
@@ -1,10 +1,12 @@
-from sqlalchemy import Column, String, Text, Integer, DECIMAL, JSON, DateTime, func
+from sqlalchemy import Column, String, Text, Integer, DECIMAL, JSON, DateTime, func, text
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from app.database import Base
 
 class Product(Base):
     __tablename__ = "products"
+    # Fetch server-generated timestamps via INSERT/UPDATE ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     name = Column(String(255), nullable=False, index=True)
@@ -15,5 +17,7 @@ class Product(Base):
     stock_quantity = Column(Integer, nullable=False, default=0)
     image_url = Column(String(512), nullable=True)
     attributes = Column(JSON, nullable=True)
+    # Bumped on every update, exposed as the ETag for If-Match on PUT
+    version = Column(Integer, nullable=False, default=1, server_default=text('1'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field, UUID4, condecimal
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, UUID4, condecimal, model_validator
+from typing import Optional, Dict, Any, List, Literal
+from decimal import Decimal
 from datetime import datetime
 
 class ProductBase(BaseModel):
@@ -23,6 +24,7 @@ class ProductUpdate(ProductBase):
 
 class ProductInDB(ProductBase):
     id: UUID4
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -31,3 +33,47 @@ class ProductInDB(ProductBase):
 
 class Product(ProductInDB):
     pass
+
+class ProductBulkFilter(BaseModel):
+    skus: Optional[List[str]] = None
+    attributes: Optional[Dict[str, Any]] = None
+    min_price: Optional[condecimal(max_digits=10, decimal_places=2, ge=0)] = None
+    max_price: Optional[condecimal(max_digits=10, decimal_places=2, ge=0)] = None
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        if not (self.skus or self.attributes or self.min_price is not None or self.max_price is not None):
+            raise ValueError("At least one filter criterion is required")
+        return self
+
+class ProductBulkOperation(BaseModel):
+    field: Literal["current_price", "stock_quantity"]
+    op: Literal["set", "percent", "delta"]
+    value: Decimal
+
+class ProductBulkUpdate(BaseModel):
+    filter: ProductBulkFilter
+    operations: List[ProductBulkOperation] = Field(..., min_length=1)
+
+    @model_validator(mode="after")
+    def check_unique_fields(self):
+        fields = [operation.field for operation in self.operations]
+        if len(fields) != len(set(fields)):
+            raise ValueError("Each field may only be updated by one operation")
+        return self
+
+class ProductBulkUpdateResult(BaseModel):
+    updated_count: int
+    product_ids: List[UUID4]
+
+class ProductPriceLookup(BaseModel):
+    product_ids: List[UUID4] = Field(..., min_length=1, max_length=500)
+
+class ProductPrice(BaseModel):
+    id: UUID4
+    name: str
+    current_price: Decimal
+    version: int
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Generate deterministic synthetic products for scale testing.
+
+Postgres is loaded with COPY, any other database (SQLite) with
+executemany. The same seed and arguments always produce the same rows,
+and product ids, names and prices line up with the order items produced
+by order_service/scripts/generate_data.py.
+
+    python scripts/generate_data.py --products 100000
+
+generate_products() takes an engine and can be called from pytest fixtures.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from app import models
+from app.database import Base
+
+# Shared with order_service/scripts/generate_data.py
+SYNTHETIC_NAMESPACE = uuid.UUID("6f1c8a52-3f0e-4d59-9d0a-3c8e2b7a5f10")
+
+PRODUCT_KINDS = ["Лампа-лофт", "Лампа-бра", "Лампа", "Торшер", "Люстра", "Светильник", "Ночник"]
+LAMP_TYPES = {
+    "Лампа-лофт": "Настольная",
+    "Лампа-бра": "Настенная",
+    "Лампа": "Настольная",
+    "Торшер": "Напольная",
+    "Люстра": "Потолочная",
+    "Светильник": "Потолочная",
+    "Ночник": "Настольная",
+}
+MOUNTING_TYPES = {
+    "Настольная": "На основании",
+    "Настенная": "Настенный кронштейн",
+    "Напольная": "На основании",
+    "Потолочная": "Потолочное крепление",
+}
+STYLES = ["Лофт", "Минимализм", "Классика", "Скандинавский", "Хай-тек", "Прованс", "Модерн"]
+COLORS = ["Черный матовый", "Белый", "Бронзовый", "Хром", "Золотой", "Серый", "Медный"]
+MATERIALS = ["Металл, сталь", "Металл, стекло", "Металл, пластик", "Дерево, ткань", "Латунь, стекло"]
+POWERS = ["25 Вт", "40 Вт", "60 Вт", "10 Вт LED", "30 Вт LED"]
+MANUFACTURERS = ['ООО "Лампочка"', 'ООО "Светотехника"', 'АО "Свет и Дом"', 'ИП Петров']
+IMAGES = [
+    "/assets/images/Лампа-лофт_1_3460.webp", "/assets/images/Лампа-бра_11_9880.webp",
+    "/assets/images/Лампа_18_19690.webp", "/assets/images/Лампа_Белая_10_2990.webp",
+]
+
+
+def synthetic_product_id(index: int) -> uuid.UUID:
+    return uuid.uuid5(SYNTHETIC_NAMESPACE, f"product-{index}")
+
+
+# _to_csv_value and bulk_insert are repeated in each service's generate_data.py on
+# purpose: every service is built into its own image from its own directory, and
+# there is no package shared between them to hold one copy.
+def _to_csv_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+def bulk_insert(conn, table, rows: List[dict]) -> None:
+    """Insert rows with COPY on Postgres and executemany elsewhere."""
+    if not rows:
+        return
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.insert(), rows)
+        return
+
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_to_csv_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def product_row(index: int, seed: int, now: datetime) -> dict:
+    # Name and price depend on the index only, to match synthetic order items
+    rng = random.Random(index)
+    kind = PRODUCT_KINDS[index % len(PRODUCT_KINDS)]
+    price = Decimal(rng.randrange(990, 25000, 10)).quantize(Decimal("0.01"))
+
+    rng = random.Random(f"{seed}-{index}")
+    lamp_type = LAMP_TYPES[kind]
+    style = rng.choice(STYLES)
+    color = rng.choice(COLORS)
+    created_at = now - timedelta(days=rng.randrange(730))
+    return {
+        "id": synthetic_product_id(index),
+        "name": f"{kind} №{index}",
+        "sku": f"SYN-{index:07d}",
+        "description": f"{kind} в стиле «{style}», цвет: {color.lower()}. "
+                       f"Подходит для гостиной, спальни и рабочего кабинета.",
+        "manufacturer_name": rng.choice(MANUFACTURERS),
+        "current_price": price,
+        "stock_quantity": rng.randrange(0, 500),
+        "image_url": rng.choice(IMAGES),
+        "attributes": {
+            "material": rng.choice(MATERIALS),
+            "color": color,
+            "height": f"~{rng.randrange(20, 180)} см",
+            "lamp_type": lamp_type,
+            "mounting_type": MOUNTING_TYPES[lamp_type],
+            "style": style,
+            "power": rng.choice(POWERS),
+            "voltage": "220 В",
+        },
+        "version": 1,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def generate_products(
+    engine: Engine,
+    products: int,
+    seed: int = 42,
+    start: int = 0,
+    batch_size: int = 10000,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Load `products` synthetic products numbered from `start` into the database.
+
+    Each batch is committed separately. Returns the number of products written.
+    """
+    # Fixed default clock keeps output identical between runs
+    now = now or datetime(2026, 1, 1)
+    table = models.Product.__table__
+    for batch_start in range(start, start + products, batch_size):
+        rows = [
+            product_row(index, seed, now)
+            for index in range(batch_start, min(batch_start + batch_size, start + products))
+        ]
+        with engine.begin() as conn:
+            bulk_insert(conn, table, rows)
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=int, default=0,
+                        help="first product index, use to append to an existing data set")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+
+    started = time.perf_counter()
+    generate_products(engine, args.products, seed=args.seed, start=args.start, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Generated {args.products} products in {elapsed:.1f}s ({args.products / elapsed:.0f} products/s)")
+    print("Run scripts/publish_catalog.py to refresh the static catalog snapshot")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Rebuild the static catalog snapshot (all shards and the manifest).
+Run this after bulk data changes made outside the API.
+"""
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import SessionLocal
+from app import catalog_snapshot
+
+
+def publish_catalog():
+    """Publish every catalog shard from the database."""
+    db = SessionLocal()
+    try:
+        catalog_snapshot.publish_all(db)
+        print(f"Catalog snapshot published to {catalog_snapshot.CATALOG_DIR}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    publish_catalog()
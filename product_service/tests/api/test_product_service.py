@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+import pytest
+
+BULK_UPDATE_URL = "/api/v1/products/bulk-update"
+
+
+@pytest.fixture
+def bulk_products(db, make_product, requires_postgres):
+    return {
+        "cheap": make_product(sku="BULB-CHEAP", current_price=Decimal("10.00"), stock_quantity=5,
+                              attributes={"socket": "E27", "color": "warm"}),
+        "dear": make_product(sku="BULB-DEAR", current_price=Decimal("99.99"), stock_quantity=1,
+                             attributes={"socket": "E14"}),
+    }
+
+
+def fetch(client, product):
+    return client.get(f"/api/v1/products/{product.id}").json()
+
+
+def test_bulk_update_rounds_prices_to_cents(client, bulk_products):
+    response = client.post(BULK_UPDATE_URL, json={
+        "filter": {"skus": ["BULB-CHEAP", "BULB-DEAR"]},
+        "operations": [{"field": "current_price", "op": "percent", "value": "-33.333"}],
+    })
+    assert response.status_code == 200
+    assert response.json()["updated_count"] == 2
+    assert Decimal(fetch(client, bulk_products["cheap"])["current_price"]) == Decimal("6.67")
+    assert Decimal(fetch(client, bulk_products["dear"])["current_price"]) == Decimal("66.66")
+
+
+def test_bulk_update_clamps_at_zero(client, bulk_products):
+    response = client.post(BULK_UPDATE_URL, json={
+        "filter": {"skus": ["BULB-CHEAP"]},
+        "operations": [
+            {"field": "current_price", "op": "delta", "value": "-25"},
+            {"field": "stock_quantity", "op": "delta", "value": "-100"},
+        ],
+    })
+    assert response.status_code == 200
+    product = fetch(client, bulk_products["cheap"])
+    assert Decimal(product["current_price"]) == 0
+    assert product["stock_quantity"] == 0
+    assert product["version"] == 2
+
+
+def test_bulk_update_rounds_stock_to_whole_units(client, bulk_products):
+    response = client.post(BULK_UPDATE_URL, json={
+        "filter": {"skus": ["BULB-CHEAP"]},
+        "operations": [{"field": "stock_quantity", "op": "percent", "value": "10"}],
+    })
+    assert response.status_code == 200
+    assert fetch(client, bulk_products["cheap"])["stock_quantity"] == 6  # 5.5 rounds half away from zero
+
+
+def test_bulk_update_filters_by_attributes_and_price(client, bulk_products):
+    response = client.post(BULK_UPDATE_URL, json={
+        "filter": {"attributes": {"socket": "E27"}, "max_price": "50"},
+        "operations": [{"field": "current_price", "op": "set", "value": "12.5"}],
+    })
+    assert response.json()["product_ids"] == [str(bulk_products["cheap"].id)]
+    assert Decimal(fetch(client, bulk_products["dear"])["current_price"]) == Decimal("99.99")
+
+
+def test_bulk_update_rejects_bad_requests(client):
+    # Validation runs before the database, so these need no Postgres
+    assert client.post(BULK_UPDATE_URL, json={
+        "filter": {},
+        "operations": [{"field": "stock_quantity", "op": "set", "value": "1"}],
+    }).status_code == 422
+    assert client.post(BULK_UPDATE_URL, json={
+        "filter": {"skus": ["BULB-CHEAP"]},
+        "operations": [
+            {"field": "stock_quantity", "op": "set", "value": "1"},
+            {"field": "stock_quantity", "op": "delta", "value": "1"},
+        ],
+    }).status_code == 422
+
+
+def test_update_with_current_if_match_bumps_etag(client, make_product):
+    product = make_product()
+    etag = client.get(f"/api/v1/products/{product.id}").headers["ETag"]
+
+    response = client.put(f"/api/v1/products/{product.id}", json={"stock_quantity": 7},
+                          headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["stock_quantity"] == 7
+    assert response.headers["ETag"] == '"2"' != etag
+
+
+def test_update_with_stale_if_match_is_412(client, make_product):
+    product = make_product()
+    assert client.put(f"/api/v1/products/{product.id}", json={"stock_quantity": 7}).status_code == 200
+
+    response = client.put(f"/api/v1/products/{product.id}", json={"stock_quantity": 3},
+                          headers={"If-Match": '"1"'})
+    assert response.status_code == 412
+    assert client.get(f"/api/v1/products/{product.id}").json()["stock_quantity"] == 7
+
+
+def test_update_of_missing_product_is_404_with_or_without_if_match(client):
+    missing = "00000000-0000-4000-8000-000000000000"
+    assert client.put(f"/api/v1/products/{missing}", json={"stock_quantity": 1}).status_code == 404
+    assert client.put(f"/api/v1/products/{missing}", json={"stock_quantity": 1},
+                      headers={"If-Match": '"1"'}).status_code == 404
+
+
+def test_update_with_malformed_if_match_is_400(client, make_product):
+    product = make_product()
+    response = client.put(f"/api/v1/products/{product.id}", json={"stock_quantity": 1},
+                          headers={"If-Match": "not-a-version"})
+    assert response.status_code == 400
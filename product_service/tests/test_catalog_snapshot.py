@@ -0,0 +1,105 @@
+import gzip
+import json
+import multiprocessing
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app import catalog_snapshot
+
+
+def read_json(path):
+    return json.loads(path.read_bytes())
+
+
+def test_publish_all_writes_every_shard_and_manifest(db, make_product, catalog_dir):
+    products = [make_product(id=uuid.UUID(f"{key}{uuid.uuid4().hex[1:]}")) for key in "0af"]
+
+    catalog_snapshot.publish_all(db)
+
+    manifest = read_json(catalog_dir / "manifest.json")
+    assert sorted(manifest["shards"]) == list(catalog_snapshot.SHARD_KEYS)
+    for product in products:
+        key = catalog_snapshot.shard_key(product.id)
+        shard_path = catalog_dir / catalog_snapshot.shard_filename(key)
+        shard = read_json(shard_path)
+        assert [item["id"] for item in shard["products"]] == [str(product.id)]
+        assert manifest["shards"][key]["count"] == 1
+        # The precompressed variant holds the same bytes nginx serves uncompressed
+        assert gzip.decompress((catalog_dir / f"{shard_path.name}.gz").read_bytes()) == shard_path.read_bytes()
+    assert manifest["shards"]["5"]["count"] == 0
+    # Temp files are renamed into place, none are left behind
+    assert not [path for path in catalog_dir.iterdir() if path.name.endswith(".tmp")]
+
+
+def test_publish_shard_updates_only_its_manifest_entry(db, make_product, catalog_dir):
+    make_product(id=uuid.UUID(f"a{uuid.uuid4().hex[1:]}"))
+    catalog_snapshot.publish_all(db)
+    before = read_json(catalog_dir / "manifest.json")["shards"]
+
+    make_product(id=uuid.UUID(f"a{uuid.uuid4().hex[1:]}"))
+    catalog_snapshot.publish_shard(db, "a")
+
+    after = read_json(catalog_dir / "manifest.json")["shards"]
+    assert after["a"]["count"] == 2
+    assert after["a"]["etag"] != before["a"]["etag"]
+    assert {key: entry for key, entry in after.items() if key != "a"} == \
+        {key: entry for key, entry in before.items() if key != "a"}
+
+
+def test_publish_shard_selects_its_id_range(db, make_product, catalog_dir):
+    # The lowest and highest version 4 ids starting with each digit
+    first, last = "{}0000000-0000-4000-8000-000000000000", "{}fffffff-ffff-4fff-bfff-ffffffffffff"
+    for product_id in (last.format("9"), first.format("a"), last.format("a"), first.format("b"), last.format("f")):
+        make_product(id=uuid.UUID(product_id))
+
+    catalog_snapshot.publish_shard(db, "a")
+    catalog_snapshot.publish_shard(db, "f")
+
+    shards = read_json(catalog_dir / "manifest.json")["shards"]
+    assert (shards["a"]["count"], shards["f"]["count"]) == (2, 1)
+    shard = read_json(catalog_dir / catalog_snapshot.shard_filename("a"))
+    assert [item["id"] for item in shard["products"]] == [first.format("a"), last.format("a")]
+
+
+def test_shard_range_uses_the_primary_key_index(db, requires_postgres):
+    lower, upper = catalog_snapshot.shard_bounds("a")
+    # Rules out a sequential scan rather than asking the planner's preference on a tiny table
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = db.execute(
+        text("EXPLAIN SELECT * FROM products WHERE id >= :lower AND id < :upper"),
+        {"lower": lower, "upper": upper}
+    ).scalars().all()
+    db.rollback()
+    assert "Index" in plan[0]
+
+
+def _publish_shard_in_new_process(url, catalog_dir, key):
+    catalog_snapshot.CATALOG_DIR = catalog_dir
+    engine = create_engine(url)
+    with Session(engine) as session:
+        catalog_snapshot.publish_shard(session, key)
+    engine.dispose()
+
+
+def test_shard_refreshes_in_separate_workers_keep_every_manifest_entry(db_engine, make_product, catalog_dir):
+    keys = catalog_snapshot.SHARD_KEYS
+    for key in keys:
+        make_product(id=uuid.UUID(f"{key}{uuid.uuid4().hex[1:]}"))
+    catalog_dir.mkdir()
+    url = db_engine.url.render_as_string(hide_password=False)
+
+    # Like uvicorn workers, each process has its own interpreter state and shares only the directory
+    workers = [
+        multiprocessing.get_context("fork").Process(target=_publish_shard_in_new_process, args=(url, catalog_dir, key))
+        for key in keys
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert all(worker.exitcode == 0 for worker in workers)
+    shards = read_json(catalog_dir / "manifest.json")["shards"]
+    assert {key: entry["count"] for key, entry in shards.items()} == {key: 1 for key in keys}